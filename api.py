@@ -0,0 +1,198 @@
+"""
+api.py - Async HTTP API for the cattle chatbot
+
+Serves the headless ChatEngine to field devices and other services. A single
+process handles many concurrent conversations: HTTP parsing runs on the
+asyncio event loop and each chat turn, database work included, runs on the
+connection's bounded thread pool (ChatEngine.chat_async), so one slow question
+never blocks the others.
+
+Usage:
+    python api.py --host 0.0.0.0 --port 8080
+
+Endpoints:
+    POST /chat    {"message": "Is cow-102 healthy?", "conversation_id": "optional"}
+                  -> {"conversation_id": ..., "answer": ..., "debug": {...}}
+    GET  /health  -> {"status": "ok", "conversations": N}
+    GET  /metrics -> Prometheus text exposition of chat and query latencies
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple, Union
+
+from chatbot.engine import ChatEngine
+from database.connection import DatabaseConnection
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class ConversationStore:
+    """Bounded per-conversation message history, least recently used evicted first"""
+    
+    def __init__(self, max_conversations: int = 10000, max_turns: int = 50):
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+        self._conversations: "OrderedDict[str, deque]" = OrderedDict()
+    
+    def __len__(self):
+        return len(self._conversations)
+    
+    def append(self, conversation_id: str, role: str, content: str) -> int:
+        """Record a message and return the conversation's length"""
+        history = self._conversations.get(conversation_id)
+        if history is None:
+            history = deque(maxlen=self.max_turns * 2)
+            self._conversations[conversation_id] = history
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        self._conversations.move_to_end(conversation_id)
+        history.append({'role': role, 'content': content})
+        return len(history)
+    
+    def history(self, conversation_id: str) -> list:
+        return list(self._conversations.get(conversation_id, ()))
+
+
+class ChatAPIServer:
+    """Minimal asyncio HTTP/1.1 server around a shared ChatEngine"""
+    
+    def __init__(self, engine: ChatEngine = None, max_workers: int = 8):
+        self.engine = engine or ChatEngine(DatabaseConnection(max_workers=max_workers))
+        self.conversations = ConversationStore()
+        self.server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> asyncio.AbstractServer:
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+    
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+    
+    async def chat(self, message: str) -> Dict:
+        """Run one chat turn without blocking the event loop"""
+        result = await self.engine.chat_async(message)
+        return result.to_dict()
+    
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Union[Dict, str]]:
+        if path == '/health':
+            return 200, {'status': 'ok', 'conversations': len(self.conversations)}
+        if path == '/metrics':
+            return 200, metrics.render_prometheus()
+        if path != '/chat':
+            return 404, {'error': f'no route for {path}'}
+        if method != 'POST':
+            return 405, {'error': 'use POST /chat'}
+        
+        try:
+            payload = json.loads(body or b'{}')
+            message = str(payload['message']).strip()
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': 'expected JSON body with a "message" field'}
+        if not message:
+            return 400, {'error': '"message" must not be empty'}
+        
+        conversation_id = str(payload.get('conversation_id') or uuid.uuid4().hex)
+        self.conversations.append(conversation_id, 'user', message)
+        result = await self.chat(message)
+        turns = self.conversations.append(conversation_id, 'assistant', result['answer'])
+        debug = {key: value for key, value in result.items() if key != 'answer'}
+        return 200, {
+            'conversation_id': conversation_id,
+            'answer': result['answer'],
+            'turns': turns,
+            'debug': debug,
+        }
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+                    break
+                
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': 'request body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                
+                status, payload = await self.route(method.upper(), path.split('?', 1)[0], body)
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("Unhandled API error")
+        finally:
+            writer.close()
+    
+    async def respond(self, writer: asyncio.StreamWriter, status: int, payload: Union[Dict, str], keep_alive: bool):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(host: str, port: int, max_workers: int):
+    api = ChatAPIServer(max_workers=max_workers)
+    server = await api.start(host, port)
+    print(f"🐄 Cattle chatbot API listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async HTTP API for the cattle chatbot")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=8, help="Database queries executed in parallel")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        print("\n👋 API stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import streamlit as st
-from chatbot.main_controller import CattleChatbot
 # from config import Config
 
 # Configure Streamlit page
@@ -9,9 +8,11 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-# Initialize chatbot
+# Initialize chatbot (once per server, on first use)
 @st.cache_resource
 def init_chatbot():
+    # Imported here: SQLAlchemy and the chatbot modules load after the page is on screen
+    from chatbot.main_controller import CattleChatbot
     return CattleChatbot()
 
 def main():
@@ -19,9 +20,6 @@ def main():
     st.title("🐄 Cattle Insights Chatbot")
     st.markdown("Ask me about your cattle's health, behavior, location, and accelerometer data!")
     
-    # Initialize chatbot
-    chatbot = init_chatbot()
-    
     # Sidebar with information
     with st.sidebar:
         st.header("📋 How to Use")
@@ -34,18 +32,8 @@ def main():
         - Show me cow-102's accelerometer data
         - What is cow-103's AccX value?
         """)
-        
-        st.header("🎯 Available Cows")
-        # Get available cows
-        try:
-            cows_df = chatbot.db.get_available_cows()
-            if not cows_df.empty:
-                for _, cow in cows_df.iterrows():
-                    st.write(f"🐄 {cow['device_id']} - {cow['cow_name']}")
-            else:
-                st.write("No cows found in database")
-        except Exception as e:
-            st.error(f"Error loading cows: {e}")
+        # Filled in at the end of the run, once the chatbot is loaded
+        cows_panel = st.container()
     
     # Initialize chat history
     if "messages" not in st.session_state:
@@ -72,7 +60,7 @@ def main():
         
         # Generate and display assistant response
         with st.chat_message("assistant"):
-            response = chatbot.chat(prompt)
+            response = init_chatbot().chat(prompt)
             st.markdown(response)
             
             # Add assistant response to chat history
@@ -88,7 +76,7 @@ def main():
         if st.button("🌡️ Check Temperature"):
             sample_question = "What is the temperature of cow-101?"
             st.session_state.messages.append({"role": "user", "content": sample_question})
-            response = chatbot.chat(sample_question)
+            response = init_chatbot().chat(sample_question)
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.rerun()
     
@@ -96,7 +84,7 @@ def main():
         if st.button("🏥 Health Check"):
             sample_question = "Is cow-102 healthy?"
             st.session_state.messages.append({"role": "user", "content": sample_question})
-            response = chatbot.chat(sample_question)
+            response = init_chatbot().chat(sample_question)
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.rerun()
     
@@ -104,7 +92,7 @@ def main():
         if st.button("📊 Accelerometer Data"):
             sample_question = "Show me cow-103's accelerometer data"
             st.session_state.messages.append({"role": "user", "content": sample_question})
-            response = chatbot.chat(sample_question)
+            response = init_chatbot().chat(sample_question)
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.rerun()
     
@@ -117,6 +105,25 @@ def main():
             }
         ]
         st.rerun()
+    
+    # The title and chat history are already rendered while the chatbot loads
+    chatbot = init_chatbot()
+    with cows_panel:
+        st.header("🎯 Available Cows")
+        # Get available cows
+        try:
+            # Served from the in-memory device registry; no query per rerun
+            devices = chatbot.db.devices.devices()
+            if devices:
+                st.write("\n".join(f"- 🐄 {device.device_id} - {device.cow_name}" for device in devices))
+            else:
+                st.write("No cows found in database")
+        except Exception as e:
+            st.error(f"Error loading cows: {e}")
+        
+        stats = chatbot.db.cache_stats()
+        st.caption(f"⚡ Query cache: {stats['hits']} hits, {stats['misses']} misses, "
+                   f"{stats['evictions']} evictions")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+bench_async_chat.py - Chat throughput as the number of concurrent sessions grows
+
+Each simulated session asks a fixed list of questions through
+ChatEngine.chat_async; all sessions share one engine and one bounded SQLite
+thread pool. The result cache is disabled so every turn reaches SQLite.
+
+Usage:
+    python benchmarks/bench_async_chat.py [--sessions 1 2 4 8 16] [--turns 50] [--cows 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_sql_generator import build_database  # noqa: E402
+from chatbot.engine import ChatEngine  # noqa: E402
+from database.connection import DatabaseConnection  # noqa: E402
+
+QUESTIONS = [
+    "What is the temperature of cow-{n}?",
+    "Is cow-{n} healthy?",
+    "What was cow-{n} doing last week?",
+    "Where is cow-{n}?",
+    "Show me cow-{n}'s accelerometer data yesterday",
+    "What is cow-999 doing?",
+]
+
+
+async def run_sessions(engine: ChatEngine, sessions: int, turns: int, cows: int) -> float:
+    async def session(index: int):
+        for turn in range(turns):
+            question = QUESTIONS[turn % len(QUESTIONS)].format(n=100 + (index * 7 + turn) % cows)
+            await engine.chat_async(question)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--turns', type=int, default=50)
+    parser.add_argument('--cows', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, args.cows).dispose()
+        engine = ChatEngine(DatabaseConnection(path, cache_size=0, max_workers=args.workers))
+
+        print(f"📊 {args.turns} turns per session, {args.cows} cows, {args.workers} SQLite workers, "
+              f"{os.cpu_count()} CPUs")
+        baseline = None
+        for sessions in args.sessions:
+            elapsed = asyncio.run(run_sessions(engine, sessions, args.turns, args.cows))
+            throughput = sessions * args.turns / elapsed
+            baseline = baseline or throughput
+            print(f"  {sessions:>3} sessions: {throughput:8.1f} turns/s "
+                  f"({throughput / baseline:4.2f}x vs 1 session)")
+
+
+if __name__ == "__main__":
+    main()
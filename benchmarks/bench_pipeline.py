@@ -0,0 +1,187 @@
+"""
+bench_pipeline.py - Per-stage chat latency percentiles at several herd sizes
+
+Generates (or reuses) a seeded synthetic herd database per size, then runs a
+fixed, seeded mix of questions through the ChatEngine pipeline and times each
+stage separately: process, generate SQL, execute (result cache disabled) and
+respond. p50/p95/p99 per stage and size are printed and written to JSON so a
+later run can be compared against it.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 100x7 1000x14 10000x30] [--questions 500]
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/baseline.json
+
+Sizes are DEVICESxDAYS. Databases are kept in --data-dir (named by their
+parameters) so repeated runs skip generation.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.engine import ChatEngine  # noqa: E402
+from database.connection import DatabaseConnection  # noqa: E402
+from database.synthetic import SyntheticHerd, load_synthetic_data  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+STAGES = ('process', 'generate_sql', 'execute', 'respond', 'total')
+PERCENTILES = (50, 95, 99)
+
+QUESTIONS = [
+    "What is the temperature of cow-{n}?",
+    "Is cow-{n} healthy?",
+    "What was cow-{n} doing last week?",
+    "What was the temperature of cow-{n} yesterday?",
+    "Where is cow-{n}?",
+    "Show me cow-{n}'s accelerometer data in the last hour",
+    "How active was cow-{n} this morning?",
+    "Which cows are within 100 m of cow-{n}?",
+    "Which cows have a fever?",
+    "Any sick cows in the past week?",
+    "Which cows are outside the north paddock?",
+    "Tell me about cow-{n}",
+]
+
+
+def timed_chat(engine: ChatEngine, question: str) -> Dict[str, float]:
+    """Run ChatEngine.chat's four stages, returning each one's duration in ms"""
+    marks = [time.perf_counter()]
+    processed = engine.query_processor.process_query(question)
+    marks.append(time.perf_counter())
+    statement, params = engine.sql_generator.generate_query(processed)
+    marks.append(time.perf_counter())
+    results = engine.db.fetch_rows(statement, params, use_cache=False)
+    marks.append(time.perf_counter())
+    engine.response_generator.generate_response(processed, results, engine.db)
+    marks.append(time.perf_counter())
+    timings = {stage: (end - start) * 1000 for stage, start, end in zip(STAGES, marks, marks[1:])}
+    timings['total'] = (marks[-1] - marks[0]) * 1000
+    return timings
+
+
+def ensure_database(data_dir: str, herd: SyntheticHerd) -> str:
+    """Path of the herd's database, generating it on first use"""
+    name = f"herd-{herd.devices}x{herd.days:g}-i{herd.interval_minutes:g}-s{herd.seed}.db"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        print(f"🐄 Generating {herd.rows:,} readings ({herd.devices:,} cows × {herd.days:g} days)...")
+        stats = load_synthetic_data(path, herd)
+        print(f"   {stats.seconds:.1f}s ({stats.rows_per_second:,.0f} rows/s)")
+    return path
+
+
+def bench_size(path: str, devices: int, questions: int, seed: int, warmup: int = 20) -> Dict:
+    engine = ChatEngine(DatabaseConnection(path, cache_size=0))
+    rng = random.Random(seed)
+    workload = [rng.choice(QUESTIONS).format(n=100 + rng.randrange(devices))
+                for _ in range(questions + warmup)]
+    for question in workload[:warmup]:
+        timed_chat(engine, question)
+    samples = {stage: [] for stage in STAGES}
+    for question in workload[warmup:]:
+        for stage, ms in timed_chat(engine, question).items():
+            samples[stage].append(ms)
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM cattle_inference").fetchone()[0]
+    return {
+        'rows': rows,
+        'stages': {
+            stage: {f'p{p}_ms': round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+            for stage, values in samples.items()
+        },
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Stages whose p95 grew by more than threshold (a fraction) against the baseline"""
+    regressions = []
+    for size, result in current['results'].items():
+        previous = baseline['results'].get(size)
+        if previous is None:
+            continue
+        print(f"\n🔁 {size} vs baseline ({baseline['meta']['revision']}):")
+        for stage in STAGES:
+            old = previous['stages'][stage]['p95_ms']
+            new = result['stages'][stage]['p95_ms']
+            change = (new - old) / old if old else 0.0
+            flag = '⚠️' if change > threshold else '  '
+            print(f"  {flag} {stage:<13} p95 {old:9.3f} → {new:9.3f} ms ({change:+.0%})")
+            if change > threshold:
+                regressions.append(f"{size} {stage}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', nargs='+', default=['100x7', '1000x14'], help="DEVICESxDAYS")
+    parser.add_argument('--interval', type=float, default=30, help="Minutes between readings per cow")
+    parser.add_argument('--questions', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'cattle-bench'))
+    parser.add_argument('--output', help="Result JSON path (default: benchmarks/results/pipeline-<time>.json)")
+    parser.add_argument('--compare', help="Baseline result JSON to compare p95 latencies against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="p95 growth counted as a regression")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpus': os.cpu_count(),
+            'questions': args.questions,
+            'interval_minutes': args.interval,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    for size in args.sizes:
+        devices, days = size.lower().split('x')
+        herd = SyntheticHerd(int(devices), float(days), args.interval, args.seed)
+        path = ensure_database(args.data_dir, herd)
+        result = bench_size(path, herd.devices, args.questions, args.seed)
+        report['results'][size] = result
+        print(f"📊 {size}: {result['rows']:,} readings, {args.questions} questions")
+        for stage in STAGES:
+            percentiles = result['stages'][stage]
+            print(f"  {stage:<13} " + "  ".join(f"p{p} {percentiles[f'p{p}_ms']:8.3f} ms" for p in PERCENTILES))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(report, json.load(handle), args.threshold)
+        if regressions:
+            print(f"\n❌ p95 regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
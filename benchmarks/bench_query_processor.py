@@ -0,0 +1,96 @@
+"""
+bench_query_processor.py - Keyword/intent classification throughput
+
+Classifies a synthetic corpus of logged chat questions with the previous
+per-keyword substring loops and with SimpleQueryProcessor's single-pass
+matcher (one call per question and the process_queries batch API).
+With --nlp-model, also times the batch API with the spaCy fallback for the
+questions the keywords are unsure about, parsed by nlp.pipe.
+
+Usage:
+    python benchmarks/bench_query_processor.py [--questions 100000]
+    python benchmarks/bench_query_processor.py --nlp-model en_core_web_sm --processes 4
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.nlp_parser import get_nlp_parser  # noqa: E402
+from chatbot.query_processor import SimpleQueryProcessor  # noqa: E402
+
+TEMPLATES = [
+    "What is the temperature of cow-{n}?",
+    "Is cow-{n} healthy today?",
+    "What was cow_{n} doing last week?",
+    "Where is cow{n} right now?",
+    "Show me cow-{n}'s accelerometer data from yesterday",
+    "Has cow-{n} been grazing or resting in the past hour?",
+    "Is cow-{n} running a fever? She looked sick this morning and I want to know more",
+    "Give me the latest movement and AccZ values for cow-{n}",
+    "Hello, can you summarise how the herd is going at the moment?",
+]
+
+
+def legacy_process_query(processor: SimpleQueryProcessor, query: str) -> dict:
+    """The previous implementation: lowercase per extractor, loop over every keyword"""
+    match = re.search(processor.cow_pattern, query.lower())
+    cow_id = f"cow-{match.group(1)}" if match else None
+    query_lower = query.lower()
+    metric = next((m for m, keywords in processor.metric_keywords.items()
+                   if any(keyword in query_lower for keyword in keywords)), 'general')
+    query_lower = query.lower()
+    time_context = next((t for t, keywords in processor.time_keywords.items()
+                         if any(keyword in query_lower for keyword in keywords)), 'current')
+    return {'cow_id': cow_id, 'metric': metric, 'time_context': time_context, 'original_query': query}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--nlp-model', default=None, help="Also time the spaCy fallback with this model")
+    parser.add_argument('--processes', type=int, default=1, help="nlp.pipe worker processes")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    corpus = [rng.choice(TEMPLATES).format(n=rng.randint(100, 9999)) for _ in range(args.questions)]
+    processor = SimpleQueryProcessor()
+
+    timings = {}
+    started = time.perf_counter()
+    for question in corpus:
+        legacy_process_query(processor, question)
+    timings['legacy substring loops'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for question in corpus:
+        processor.process_query(question)
+    timings['single-pass matcher'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor.process_queries(corpus)
+    timings['process_queries batch'] = time.perf_counter() - started
+
+    if args.nlp_model:
+        nlp_processor = SimpleQueryProcessor(nlp_parser=get_nlp_parser(args.nlp_model))
+        started = time.perf_counter()
+        nlp_processor.nlp_parser.nlp
+        print(f"🧠 {args.nlp_model} loaded in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        processed = nlp_processor.process_queries(corpus, n_process=args.processes)
+        timings['batch + nlp fallback'] = time.perf_counter() - started
+        unsure = sum(item.get('classifier') == 'nlp' for item in processed)
+        print(f"  {unsure:,} questions reclassified by the NLP parser")
+
+    print(f"📊 {len(corpus):,} questions, {len(processor.keyword_index)} keywords")
+    for label, elapsed in timings.items():
+        print(f"  {label:<24} {len(corpus) / elapsed:>12,.0f} questions/s ({elapsed * 1e6 / len(corpus):5.2f} µs each)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+bench_rollups.py - Week-long summaries from raw readings vs rollup tables
+
+Builds a scratch database with one reading per cow per minute for a week and
+answers "how was cow-N over the last week?" two ways: aggregating every raw
+reading in the window, and SimpleSQLGenerator's summary over the hourly and
+daily rollup buckets.
+
+Usage:
+    python benchmarks/bench_rollups.py [--cows 50] [--questions 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_sql_generator import build_database  # noqa: E402
+from chatbot.sql_generator import SimpleSQLGenerator  # noqa: E402
+
+RAW_SUMMARY = text("""
+    SELECT ci.device_id, cd.cow_name, MAX(ci.timestamp) AS timestamp, COUNT(*) AS readings,
+           AVG(ci.temperature) AS temp_mean, MIN(ci.temperature) AS temp_min,
+           MAX(ci.temperature) AS temp_max, AVG(ci.activity_level) AS activity_mean
+    FROM cattle_inference ci
+    LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
+    WHERE ci.device_id = :cow_id AND ci.timestamp >= :start AND ci.timestamp < :end
+    GROUP BY ci.device_id
+""")
+
+
+def run(cows: int, questions: int):
+    generator = SimpleSQLGenerator()
+    rng = random.Random(42)
+    workload = [
+        {"cow_id": f"cow-{100 + rng.randrange(cows)}", "metric": "general",
+         "time_context": "last_week", "original_query": ""}
+        for _ in range(questions)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        engine = build_database(path, cows, readings_per_cow=7 * 24 * 60, interval_minutes=1)
+        build_seconds = time.perf_counter() - started
+
+        with engine.connect() as conn:
+            readings = conn.execute(text("SELECT COUNT(*) FROM cattle_inference")).scalar()
+            started = time.perf_counter()
+            for processed in workload:
+                start, end = generator.time_bounds(processed['time_context'])
+                conn.execute(RAW_SUMMARY, {'cow_id': processed['cow_id'],
+                                           'start': str(start), 'end': str(end)}).fetchall()
+            raw_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for processed in workload:
+                statement, params = generator.generate_query(processed)
+                conn.execute(statement, params).fetchall()
+            rollup_seconds = time.perf_counter() - started
+
+            params = generator.rollup_bounds(*generator.time_bounds('last_week'))
+            params = {key: str(value) for key, value in params.items()}
+            buckets = conn.execute(text("""
+                SELECT (SELECT COUNT(*) FROM cattle_rollup_daily
+                        WHERE device_id = 'cow-100' AND bucket_start >= :day_start AND bucket_start < :day_end)
+                     + (SELECT COUNT(*) FROM cattle_rollup_hourly
+                        WHERE device_id = 'cow-100' AND ((bucket_start >= :start AND bucket_start < :day_start)
+                                                      OR (bucket_start >= :day_end AND bucket_start < :end)))
+            """), params).scalar()
+        engine.dispose()
+
+    print(f"📊 {readings:,} readings from {cows} cows (built with rollup triggers in {build_seconds:.1f}s)")
+    print(f"  raw readings  {raw_seconds / questions * 1000:8.2f} ms/question "
+          f"({readings // cows:,} rows per cow-week)")
+    print(f"  rollups       {rollup_seconds / questions * 1000:8.2f} ms/question "
+          f"({buckets} buckets per cow-week)")
+    print(f"  speedup       {raw_seconds / rollup_seconds:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cows', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=200)
+    args = parser.parse_args()
+    run(args.cows, args.questions)
+
+
+if __name__ == "__main__":
+    main()
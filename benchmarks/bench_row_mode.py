@@ -0,0 +1,92 @@
+"""
+bench_row_mode.py - DataFrame vs row-mode results for chat-sized queries
+
+Runs the chat path's statements (one per metric and time context, each
+returning at most 10 rows) against a scratch database through
+DatabaseConnection.execute_query, which wraps fetchall() in a DataFrame, and
+through fetch_rows, which returns plain ResultRows. Both run with the result
+cache off and are timed per call; tracemalloc then measures each call's
+peak allocation and the size of the result it returns.
+
+Usage:
+    python benchmarks/bench_row_mode.py [--cows 50] [--calls 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_sql_generator import METRICS, TIME_CONTEXTS, build_database  # noqa: E402
+from chatbot.sql_generator import SimpleSQLGenerator  # noqa: E402
+from database.connection import DatabaseConnection  # noqa: E402
+
+
+def workload(cows: int, calls: int) -> list:
+    generator = SimpleSQLGenerator()
+    rng = random.Random(42)
+    return [
+        generator.generate_query({"cow_id": f"cow-{100 + rng.randrange(cows)}", "metric": rng.choice(METRICS),
+                                  "time_context": rng.choice(TIME_CONTEXTS), "original_query": ""})
+        for _ in range(calls)
+    ]
+
+
+def per_call_us(fetch, queries: list) -> float:
+    started = time.perf_counter()
+    for statement, params in queries:
+        fetch(statement, params, use_cache=False)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def per_call_allocations(fetch, queries: list) -> tuple:
+    """(peak bytes allocated during a call, bytes the returned result keeps alive), averaged"""
+    peaks, kept = [], []
+    tracemalloc.start()
+    for statement, params in queries:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = fetch(statement, params, use_cache=False)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+        kept.append(current - baseline)
+        del result
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks), sum(kept) / len(kept)
+
+
+def run(cows: int, calls: int):
+    queries = workload(cows, calls)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, cows).dispose()
+        db = DatabaseConnection(path)
+        modes = {'DataFrame': db.execute_query, 'ResultRows': db.fetch_rows}
+        for fetch in modes.values():
+            per_call_us(fetch, queries[:200])  # warm the pool and statement caches
+
+        print(f"📊 {calls:,} chat queries over {cows} cows (result cache off)")
+        timings = {}
+        for name, fetch in modes.items():
+            timings[name] = per_call_us(fetch, queries)
+            peak, kept = per_call_allocations(fetch, queries[:500])
+            print(f"  {name:<11} {timings[name]:8.1f} µs/call   "
+                  f"peak {peak / 1024:7.1f} KiB/call   result {kept / 1024:6.1f} KiB")
+        print(f"  speedup     {timings['DataFrame'] / timings['ResultRows']:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cows', type=int, default=50)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.cows, args.calls)
+
+
+if __name__ == "__main__":
+    main()
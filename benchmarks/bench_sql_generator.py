@@ -0,0 +1,134 @@
+"""
+bench_sql_generator.py - Parse/plan cost of interpolated vs prepared chat queries
+
+Runs the same stream of chat questions twice against a scratch database:
+once with the SQL rebuilt per question by string interpolation (new text for
+every cow and timestamp, so SQLite re-parses and re-plans each statement) and
+once with SimpleSQLGenerator's prepared statements and bound parameters.
+
+Usage:
+    python benchmarks/bench_sql_generator.py [--questions 5000] [--cows 50]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.sql_generator import SimpleSQLGenerator  # noqa: E402
+from database.models import cattle_devices, cattle_inference, run_migrations  # noqa: E402
+
+METRICS = ['temperature', 'behavior', 'location', 'accelerometer', 'health', 'general']
+TIME_CONTEXTS = ['current', 'today', 'yesterday', 'last_hour', 'last_week']
+
+
+def build_database(path: str, cows: int, readings_per_cow: int = 200, interval_minutes: float = 30):
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_devices), [
+            {"device_id": f"cow-{100 + i}", "cow_id": f"COW{i:03d}", "cow_name": f"Cow {i}"}
+            for i in range(cows)
+        ])
+        conn.execute(insert(cattle_inference), [
+            {"device_id": f"cow-{100 + i}", "timestamp": now - timedelta(minutes=interval_minutes * j),
+             "predicted_behavior": "grazing", "confidence": 0.9, "temperature": 38.5,
+             "location_lat": 40.71, "location_lng": -74.0, "activity_level": 0.5,
+             "AccX": 0.1, "AccY": 0.2, "AccZ": 1.0, "created_at": now}
+            for i in range(cows) for j in range(readings_per_cow)
+        ])
+    return engine
+
+
+def interpolated_sql(generator: SimpleSQLGenerator, processed: dict) -> str:
+    """The pre-change approach: literals inlined into a fresh SQL string"""
+    sql = generator.get_statement(processed['metric'], processed['time_context'], True).text
+    sql = sql.replace(':cow_id', f"'{processed['cow_id']}'")
+    bounds = generator.time_bounds(processed['time_context'])
+    if bounds:
+        sql = sql.replace(':start', f"'{bounds[0]}'").replace(':end', f"'{bounds[1]}'")
+    return sql
+
+
+def prepared_query(generator: SimpleSQLGenerator, processed: dict):
+    """The same raw-reading statement as interpolated_sql, with bound parameters"""
+    statement = generator.get_statement(processed['metric'], processed['time_context'], True)
+    params = {'cow_id': processed['cow_id']}
+    bounds = generator.time_bounds(processed['time_context'])
+    if bounds:
+        params['start'], params['end'] = bounds
+    return statement, params
+
+
+def run(questions: int, cows: int):
+    generator = SimpleSQLGenerator()
+    rng = random.Random(42)
+    workload = [
+        {"cow_id": f"cow-{100 + rng.randrange(cows)}", "metric": rng.choice(METRICS),
+         "time_context": rng.choice(TIME_CONTEXTS), "original_query": ""}
+        for _ in range(questions)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = build_database(path, cows)
+
+        # SQLite layer: statement parse + plan via the sqlite3 statement cache
+        raw = sqlite3.connect(path)
+        started = time.perf_counter()
+        for processed in workload:
+            raw.execute(interpolated_sql(generator, processed)).fetchall()
+        raw_interpolated = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for processed in workload:
+            statement, params = prepared_query(generator, processed)
+            params = {key: str(value) for key, value in params.items()}
+            raw.execute(statement.text, params).fetchall()
+        raw_prepared = time.perf_counter() - started
+        raw.close()
+
+        # Full chat path: SQLAlchemy compile cache + sqlite3 statement cache
+        with engine.connect() as conn:
+            started = time.perf_counter()
+            for processed in workload:
+                conn.execute(text(interpolated_sql(generator, processed))).fetchall()
+            sa_interpolated = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for processed in workload:
+                statement, params = prepared_query(generator, processed)
+                conn.execute(statement, params).fetchall()
+            sa_prepared = time.perf_counter() - started
+        engine.dispose()
+
+    print(f"📊 {questions} questions, {cows} cows, {len(generator._statements)} prepared statements")
+    for label, interpolated, prepared in (
+        ("sqlite3", raw_interpolated, raw_prepared),
+        ("sqlalchemy", sa_interpolated, sa_prepared),
+    ):
+        per_old = interpolated / questions * 1e6
+        per_new = prepared / questions * 1e6
+        print(f"  {label:<11} interpolated {per_old:8.1f} µs/question | "
+              f"prepared {per_new:8.1f} µs/question | saved {per_old - per_new:8.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--questions', type=int, default=5000)
+    parser.add_argument('--cows', type=int, default=50)
+    args = parser.parse_args()
+    run(args.questions, args.cows)
+
+
+if __name__ == "__main__":
+    main()
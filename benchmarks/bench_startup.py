@@ -0,0 +1,187 @@
+"""
+bench_startup.py - Cold-start cost: imports, ChatEngine construction and first answer
+
+Each repeat runs a fresh interpreter, so nothing is warm but the OS page
+cache and the .pyc files, which is what a restarted edge box sees. Inside
+the child the time to import the chat pipeline, build a ChatEngine and
+answer a first question is measured separately; the parent also times the
+whole process, and an empty interpreter for reference. One extra run under
+python -X importtime breaks the import time down by top-level package and
+records which heavy optional libraries the first answer pulled in.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeats 7] [--question "Is cow-101 healthy?"]
+    python benchmarks/bench_startup.py --compare benchmarks/results/startup-<time>.json
+
+The benchmark works on a temporary copy of the sample database (or of
+--database), so the copy is migrated on the warm-up run and never the
+original.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SAMPLE_DATABASE = os.path.join(ROOT, 'database', 'cattle_monitoring.db')
+STAGES = ('interpreter', 'import', 'construct', 'first_answer', 'process')
+# Libraries the first answer should not need; each costs tens to hundreds of ms to import
+HEAVY_PACKAGES = ('numpy', 'pandas', 'pyarrow', 'streamlit', 'spacy')
+
+# Runs in the child interpreter; prints its stage timings (ms) as JSON
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from chatbot.engine import ChatEngine
+from database.connection import DatabaseConnection
+imported = time.perf_counter()
+engine = ChatEngine(DatabaseConnection({database!r}))
+constructed = time.perf_counter()
+answer = engine.chat({question!r}).answer
+answered = time.perf_counter()
+print(json.dumps({{
+    'import': (imported - started) * 1000,
+    'construct': (constructed - imported) * 1000,
+    'first_answer': (answered - constructed) * 1000,
+    'loaded': sorted(name for name in {heavy!r} if name in sys.modules),
+}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_child(code: str, importtime: bool = False):
+    """Run code in a fresh interpreter; (wall ms, stdout, stderr)"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return (time.perf_counter() - started) * 1000, completed.stdout, completed.stderr
+
+
+def package_import_times(stderr: str) -> Dict[str, float]:
+    """Cumulative import ms per top-level package from -X importtime output"""
+    packages = {}
+    for match in IMPORTTIME_LINE.finditer(stderr):
+        package = match.group(4).split('.')[0]
+        packages[package] = max(packages.get(package, 0.0), int(match.group(2)) / 1000)
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def bench_startup(database: str, question: str, repeats: int, top: int) -> Dict:
+    code = CHILD.format(database=database, question=question, heavy=HEAVY_PACKAGES)
+    # Warm-up: writes the .pyc files and migrates the database copy
+    run_child(code)
+    run_child('pass')
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(repeats):
+        samples['interpreter'].append(run_child('pass')[0])
+        wall_ms, stdout, _ = run_child(code)
+        child = json.loads(stdout.splitlines()[-1])
+        for stage in ('import', 'construct', 'first_answer'):
+            samples[stage].append(child[stage])
+        samples['process'].append(wall_ms)
+    _, stdout, stderr = run_child(code, importtime=True)
+    return {
+        'question': question,
+        'stages': {
+            stage: {'median_ms': round(statistics.median(values), 3), 'min_ms': round(min(values), 3)}
+            for stage, values in samples.items()
+        },
+        'loaded': json.loads(stdout.splitlines()[-1])['loaded'],
+        'import_ms': {package: round(ms, 3) for package, ms in list(package_import_times(stderr).items())[:top]},
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Stages whose median grew by more than threshold (a fraction) against the baseline"""
+    regressions = []
+    previous, result = baseline['results'], current['results']
+    print(f"\n🔁 vs baseline ({baseline['meta']['revision']}):")
+    for stage in STAGES:
+        if stage not in previous['stages']:
+            continue
+        old = previous['stages'][stage]['median_ms']
+        new = result['stages'][stage]['median_ms']
+        change = (new - old) / old if old else 0.0
+        flag = '⚠️' if change > threshold else '  '
+        print(f"  {flag} {stage:<13} median {old:9.1f} → {new:9.1f} ms ({change:+.0%})")
+        if change > threshold:
+            regressions.append(stage)
+    newly_loaded = sorted(set(result['loaded']) - set(previous.get('loaded', [])))
+    if newly_loaded:
+        print(f"  ⚠️ first answer now imports {', '.join(newly_loaded)}")
+        regressions.extend(f"imports {name}" for name in newly_loaded)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--database', default=SAMPLE_DATABASE, help="Database to copy and query")
+    parser.add_argument('--question', default="What is the temperature of cow-101?")
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--top', type=int, default=10, help="Packages listed in the import breakdown")
+    parser.add_argument('--output', help="Result JSON path (default: benchmarks/results/startup-<time>.json)")
+    parser.add_argument('--compare', help="Baseline result JSON to compare median times against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Median growth counted as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='cattle-startup-') as data_dir:
+        database = os.path.join(data_dir, 'startup.db')
+        shutil.copyfile(args.database, database)
+        result = bench_startup(database, args.question, args.repeats, args.top)
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpus': os.cpu_count(),
+            'repeats': args.repeats,
+        },
+        'results': result,
+    }
+    print(f"📊 Cold start, {args.repeats} fresh interpreters: {args.question!r}")
+    for stage in STAGES:
+        timing = result['stages'][stage]
+        print(f"  {stage:<13} median {timing['median_ms']:8.1f} ms   min {timing['min_ms']:8.1f} ms")
+    print(f"  heavy imports: {', '.join(result['loaded']) or 'none'}")
+    print("\n📦 Cumulative import time by package (-X importtime):")
+    for package, ms in result['import_ms'].items():
+        print(f"  {package:<20} {ms:8.1f} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(report, json.load(handle), args.threshold)
+        if regressions:
+            print(f"\n❌ Startup regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
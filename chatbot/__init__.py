@@ -0,0 +1,19 @@
+from lazy_exports import lazy_exports
+
+# Public names and the submodule each lives in. "from chatbot import
+# ChatEngine" loads the headless engine without Streamlit (only CattleChatbot
+# in main_controller needs it), and "import chatbot" loads nothing at all.
+_EXPORTS = {
+    'ChatEngine': 'engine',
+    'ChatResult': 'engine',
+    'CattleChatbot': 'main_controller',
+    'NLPQueryParser': 'nlp_parser',
+    'get_nlp_parser': 'nlp_parser',
+    'SimpleQueryProcessor': 'query_processor',
+    'SimpleResponseGenerator': 'response_generator',
+    'SimpleSQLGenerator': 'sql_generator',
+    'TimeExpressionParser': 'time_parser',
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,168 @@
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+from .nlp_parser import get_nlp_parser
+from .query_processor import SimpleQueryProcessor
+from .sql_generator import SimpleSQLGenerator
+from .response_generator import SimpleResponseGenerator
+from config import Config
+from database.connection import DatabaseConnection
+from instrumentation import log_event, metrics
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChatResult:
+    """Answer to one chat turn plus the debug details behind it"""
+    answer: str
+    processed: Dict[str, Any] = field(default_factory=dict)
+    sql: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    data: Optional[Dict[str, Any]] = None
+    row_count: int = 0
+    error: Optional[str] = None
+    # Milliseconds spent in each pipeline stage, plus 'total'
+    timings: Dict[str, float] = field(default_factory=dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form (datetimes and numpy scalars become strings)"""
+        result = asdict(self)
+        result['params'] = {key: str(value) for key, value in self.params.items()}
+        if self.data is not None:
+            result['data'] = {
+                key: value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+                for key, value in self.data.items()
+            }
+        return result
+
+class ChatEngine:
+    """Headless chat pipeline: process → generate SQL → execute → respond.
+    
+    Holds no per-conversation state and never touches Streamlit, so one
+    instance can serve many conversations from any thread.
+    """
+    
+    def __init__(self, db: DatabaseConnection = None):
+        self.query_processor = SimpleQueryProcessor()
+        self.sql_generator = SimpleSQLGenerator()
+        self.response_generator = SimpleResponseGenerator()
+        self.db = db or DatabaseConnection()
+        self._time_budgets = None
+        # Resolve cow names ("How is Bessie?") through the shared device registry
+        self.query_processor.registry = self.db.devices
+        if Config.NLP_MODEL:
+            # One lazily loaded spaCy pipeline per process, shared by every engine
+            self.query_processor.nlp_parser = get_nlp_parser(Config.NLP_MODEL)
+    
+    def _stage(self, name: str):
+        return metrics.span('cattle_chat_stage_seconds', stage=name)
+    
+    def chat(self, user_message: str) -> ChatResult:
+        """Answer one question, returning the response and its debug info"""
+        processed = {}
+        timings = {}
+        started = time.perf_counter()
+        try:
+            # Step 1: Process user query
+            with self._stage('process') as span:
+                processed = self.query_processor.process_query(user_message)
+            timings['process'] = span.ms
+            
+            # Step 2: Generate SQL
+            with self._stage('generate_sql') as span:
+                sql_query, params = self.sql_generator.generate_query(processed)
+            timings['generate_sql'] = span.ms
+            
+            # Step 3: Execute query
+            with self._stage('execute') as span:
+                results = self._fetch(processed, sql_query, params)
+            timings['execute'] = span.ms
+            
+            # Step 4: Generate response
+            with self._stage('respond') as span:
+                answer = self.response_generator.generate_response(processed, results, self.db)
+                answer = self._note_archived(answer, processed, sql_query, params)
+            timings['respond'] = span.ms
+            
+            return self._finish(self._result(answer, processed, sql_query, params, results), started, timings)
+        
+        except Exception as e:
+            return self._finish(self._error_result(e, processed), started, timings)
+    
+    async def chat_async(self, user_message: str) -> ChatResult:
+        """Async chat: the whole turn runs on the connection's bounded thread pool.
+        
+        Every stage can block: cow names refresh the device registry, unsure
+        questions go through spaCy, responses may look up geofences or the
+        registry and time budgets run NumPy over a behavior series. Running
+        chat() in the pool keeps all of that off the event loop, and the pool's
+        size still bounds how many turns touch SQLite at once.
+        """
+        return await self.db.run_in_pool(self.chat, user_message)
+    
+    @property
+    def time_budgets(self):
+        """database.time_budget.TimeBudgetEngine over this engine's database, imported on first use"""
+        if self._time_budgets is None:
+            from database.time_budget import TimeBudgetEngine
+            self._time_budgets = TimeBudgetEngine(self.db)
+        return self._time_budgets
+    
+    def _reaches_archive(self, statement, params: Dict[str, Any]) -> bool:
+        """Whether a statement on cattle_inference asks for days moved to the Parquet archive"""
+        start = params.get('start')
+        if start is None or 'cattle_inference' not in statement.text:
+            return False
+        horizon = self.db.archive_horizon()
+        return horizon is not None and start < horizon
+    
+    def _fetch(self, processed: Dict, statement, params: Dict[str, Any]):
+        """Run the prepared statement; time budgets reaching archived days read both tiers"""
+        if processed.get('metric') == 'time_budget' and self._reaches_archive(statement, params):
+            cow_ids = params.get('cow_ids') or ([params['cow_id']] if 'cow_id' in params else None)
+            return self.time_budgets.load_rows(cow_ids, params['start'], params['end'])
+        return self.db.fetch_rows(statement, params)
+    
+    def _note_archived(self, answer: str, processed: Dict, statement, params: Dict[str, Any]) -> str:
+        """Say so when a raw-reading answer's window reaches days moved to the Parquet archive.
+        
+        Chat statements on cattle_inference read the hot tier only, except
+        time budgets (see _fetch); periods that are summarized come from the
+        rollups, which keep the full history.
+        """
+        if processed.get('metric') == 'time_budget' or not self._reaches_archive(statement, params):
+            return answer
+        return f"{answer}\n\nℹ️ Readings before {self.db.archive_horizon():%Y-%m-%d} are archived and not included"
+    
+    def _finish(self, result: ChatResult, started: float, timings: Dict[str, float]) -> ChatResult:
+        """Record the turn's latency and log it as one structured event"""
+        seconds = time.perf_counter() - started
+        metrics.observe('cattle_chat_seconds', seconds)
+        if result.error:
+            metrics.inc('cattle_chat_errors_total')
+        timings['total'] = seconds * 1000
+        result.timings = {stage: round(ms, 3) for stage, ms in timings.items()}
+        log_event('chat', metric=result.processed.get('metric'), scope=result.processed.get('scope'),
+                  time_context=result.processed.get('time_context'), rows=result.row_count,
+                  error=result.error, ms=result.timings)
+        metrics.export_to(Config.METRICS_FILE, Config.METRICS_EXPORT_SECONDS)
+        return result
+    
+    def _result(self, answer: str, processed: Dict, sql_query, params: Dict, results) -> ChatResult:
+        return ChatResult(
+            answer=answer,
+            processed=processed,
+            sql=sql_query.text,
+            params=params,
+            data=results.first(),
+            row_count=len(results),
+        )
+    
+    def _error_result(self, error: Exception, processed: Dict) -> ChatResult:
+        logger.exception("Chatbot error")
+        return ChatResult(
+            answer=f"🔧 Sorry, I encountered an error: {str(error)}",
+            processed=processed,
+            error=str(error),
+        )
@@ -1,39 +1,42 @@
 import streamlit as st
-from .query_processor import SimpleQueryProcessor
-from .sql_generator import SimpleSQLGenerator
-from .response_generator import SimpleResponseGenerator
-from database.connection import DatabaseConnection
+from .engine import ChatEngine, ChatResult
 
 class CattleChatbot:
+    """Streamlit adapter over the headless ChatEngine"""
+    
     def __init__(self):
-        self.query_processor = SimpleQueryProcessor()
-        self.sql_generator = SimpleSQLGenerator()
-        self.response_generator = SimpleResponseGenerator()
-        self.db = DatabaseConnection()
+        self.engine = ChatEngine()
+        self.query_processor = self.engine.query_processor
+        self.sql_generator = self.engine.sql_generator
+        self.response_generator = self.engine.response_generator
+        self.db = self.engine.db
+    
+    def show_debug(self, result: ChatResult):
+        """Show query analysis, SQL and retrieved data in the sidebar"""
+        with st.sidebar:
+            st.subheader("🔍 Query Analysis")
+            st.json(result.processed)
+            
+            if result.sql:
+                st.subheader("🔍 Generated SQL")
+                st.code(result.sql, language='sql')
+                st.json(result.to_dict()['params'])
+            
+            if result.timings:
+                st.subheader("⏱️ Timings (ms)")
+                st.json(result.timings)
+            
+            if result.data is not None:
+                st.subheader("📊 Retrieved Data")
+                st.json(result.to_dict()['data'])
     
     def chat(self, user_message: str) -> str:
         """Main chat method with Streamlit integration"""
-        try:
-            with st.spinner("🤔 Thinking..."):
-                # Step 1: Process user query
-                processed = self.query_processor.process_query(user_message)
-                
-                # Step 2: Generate SQL
-                sql_query = self.sql_generator.generate_query(processed)
-                
-                # Show SQL query in sidebar for debugging
-                with st.sidebar:
-                    st.subheader("🔍 Generated SQL")
-                    st.code(sql_query, language='sql')
-                
-                # Step 3: Execute query
-                results = self.db.execute_query(sql_query)
-                
-                # Step 4: Generate response
-                response = self.response_generator.generate_response(processed, results, self.db)
-                
-                return response
-                
-        except Exception as e:
-            st.error(f"Chatbot error: {str(e)}")
-            return f"🔧 Sorry, I encountered an error: {str(e)}"
\ No newline at end of file
+        with st.spinner("🤔 Thinking..."):
+            result = self.engine.chat(user_message)
+        
+        self.show_debug(result)
+        if result.error:
+            st.error(f"Chatbot error: {result.error}")
+        
+        return result.answer
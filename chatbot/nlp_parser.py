@@ -0,0 +1,129 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'en_core_web_sm'
+# Classification reads lemmas and the dependency parse only; excluded components are never loaded
+EXCLUDED_COMPONENTS = ['ner', 'entity_ruler', 'entity_linker', 'textcat', 'textcat_multilabel', 'senter']
+# A verb's object or complement says more than the verb: "running a fever" is about temperature
+OBJECT_DEPS = ('dobj', 'attr', 'acomp', 'oprd', 'pobj')
+
+# Lemmas per metric, in the keyword matcher's priority order (earlier metrics win ties)
+METRIC_LEMMAS = {
+    'alerts': ('alert', 'anomaly', 'unusual', 'abnormal', 'odd', 'strange', 'weird'),
+    'time_budget': ('spend', 'fraction', 'proportion', 'percentage', 'percent', 'share', 'budget'),
+    'temperature': ('temperature', 'temp', 'fever', 'feverish', 'hot', 'cold', 'warm', 'chill', 'chilly'),
+    'behavior': ('behavior', 'behaviour', 'do', 'graze', 'walk', 'rest', 'ruminate', 'chew', 'eat',
+                 'lie', 'stand', 'sleep', 'run', 'wander'),
+    'location': ('location', 'where', 'position', 'place', 'locate', 'gps', 'coordinate'),
+    'accelerometer': ('accelerometer', 'acceleration', 'accx', 'accy', 'accz', 'movement'),
+    'activity': ('active', 'odba', 'vedba', 'energetic', 'exertion', 'lively', 'sluggish'),
+    'health': ('health', 'healthy', 'sick', 'ill', 'unwell', 'wellness', 'fine', 'okay', 'ok', 'feel',
+               'cough', 'limp', 'lame'),
+}
+
+class NLPQueryParser:
+    """spaCy fallback for questions the keyword matcher is unsure about.
+    
+    The pipeline loads on first use, without the components classification
+    never reads, and get_nlp_parser shares one instance per model across
+    sessions and threads. If spaCy or the model is not installed, the parser
+    logs once and classify() returns None, so keyword results stand.
+    """
+    
+    def __init__(self, model: str = DEFAULT_MODEL, metric_lemmas: Dict[str, Sequence[str]] = None):
+        self.model = model
+        self.lemma_metrics = {}
+        for metric, lemmas in (metric_lemmas or METRIC_LEMMAS).items():
+            for lemma in lemmas:
+                self.lemma_metrics.setdefault(lemma, metric)
+        self.priority = {metric: rank for rank, metric in enumerate(metric_lemmas or METRIC_LEMMAS)}
+        # None until the first load attempt, then whether the pipeline loaded
+        self.available: Optional[bool] = None
+        self._nlp = None
+        self._lock = threading.Lock()
+    
+    @property
+    def nlp(self):
+        """The loaded pipeline, or None when spaCy or the model is missing"""
+        if self.available is None:
+            with self._lock:
+                if self.available is None:
+                    self._nlp = self._load()
+                    self.available = self._nlp is not None
+        return self._nlp
+    
+    def _load(self):
+        try:
+            import spacy
+            return spacy.load(self.model, exclude=EXCLUDED_COMPONENTS)
+        except (ImportError, OSError) as error:
+            logger.warning("spaCy model %s unavailable, using keyword classification only: %s", self.model, error)
+            return None
+    
+    def classify_doc(self, doc) -> Optional[str]:
+        """Metric named by a parsed question, or None if it names none"""
+        scores = Counter()
+        for token in doc:
+            if token.dep_ == 'aux':
+                # "did she graze": the auxiliary 'do' is not a question about behavior
+                continue
+            lemma = token.lemma_.lower()
+            if lemma == 'long' and any(child.lower_ == 'how' for child in token.children):
+                metric = 'time_budget'
+            else:
+                metric = self.lemma_metrics.get(lemma)
+            if metric is not None:
+                scores[metric] += 2 if token.dep_ in OBJECT_DEPS else 1
+        if not scores:
+            return None
+        return min(scores, key=lambda metric: (-scores[metric], self.priority[metric]))
+    
+    def classify(self, query: str) -> Optional[str]:
+        nlp = self.nlp
+        return None if nlp is None else self.classify_doc(nlp(query))
+    
+    def classify_many(self, queries: Sequence[str], n_process: int = 1, batch_size: int = 256) -> List[Optional[str]]:
+        """Classify a batch with nlp.pipe, parsing in n_process worker processes"""
+        nlp = self.nlp
+        if nlp is None:
+            return [None] * len(queries)
+        return [self.classify_doc(doc) for doc in nlp.pipe(queries, n_process=n_process, batch_size=batch_size)]
+
+@lru_cache(maxsize=None)
+def get_nlp_parser(model: str = DEFAULT_MODEL) -> NLPQueryParser:
+    """Process-wide parser for a spaCy model"""
+    return NLPQueryParser(model)
+
+def main(argv=None):
+    from .query_processor import SimpleQueryProcessor
+    parser = argparse.ArgumentParser(description="Classify logged chat questions (one per line) in bulk")
+    parser.add_argument('questions', help="Text file of questions, or - for stdin")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="spaCy model for questions keywords can't settle")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes for nlp.pipe")
+    parser.add_argument('--jsonl', action='store_true', help="Print each processed question as JSON")
+    args = parser.parse_args(argv)
+    
+    handle = sys.stdin if args.questions == '-' else open(args.questions, encoding='utf-8')
+    with handle:
+        questions = [line.strip() for line in handle if line.strip()]
+    processor = SimpleQueryProcessor(nlp_parser=get_nlp_parser(args.model))
+    processed = processor.process_queries(questions, n_process=args.processes)
+    if args.jsonl:
+        for item in processed:
+            print(json.dumps(item))
+        return
+    nlp_count = sum(item.get('classifier') == 'nlp' for item in processed)
+    print(f"📊 {len(processed):,} questions, {nlp_count:,} classified by {args.model}")
+    for metric, count in Counter(item['metric'] for item in processed).most_common():
+        print(f"  {metric:<14} {count:>8,}")
+
+if __name__ == "__main__":
+    main()
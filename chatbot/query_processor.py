@@ -1,57 +1,255 @@
 import re
-import streamlit as st
-from typing import Dict
+from typing import Dict, Iterable, List, Tuple
+from .time_parser import TimeExpressionParser
+
+def _trie_pattern(words) -> str:
+    """Regex alternation factored into a prefix trie, longest match first"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if '' in node:
+            pattern = f"(?:{pattern})?" if len(branches) == 1 else f"{pattern}?"
+        return pattern
+    
+    return build(trie)
 
 class SimpleQueryProcessor:
-    def __init__(self):
+    def __init__(self, registry=None, nlp_parser=None):
         self.cow_pattern = r'cow[_-]?(\d+)'
+        # Optional database.registry.DeviceRegistry for cow names ("Is Bessie ok?")
+        self.registry = registry
+        # Optional chatbot.nlp_parser.NLPQueryParser, consulted only when the keywords are unsure
+        self.nlp_parser = nlp_parser
+        # Earlier metrics win ties, so "is her temperature unusual?" asks for alerts,
+        # "how long was she grazing?" for a time budget and "what activity is she
+        # performing?" for her behavior rather than her movement intensity
         self.metric_keywords = {
+            'alerts': ['alert', 'alerts', 'anomaly', 'anomalies', 'unusual', 'abnormal'],
+            'time_budget': ['how long', 'how much time', 'most time', 'time budget', 'spent', 'spend'],
             'temperature': ['temperature', 'temp', 'fever', 'hot', 'cold'],
-            'behavior': ['behavior', 'behaviour', 'activity', 'doing', 'grazing', 'walking', 'resting'],
+            'behavior': ['behavior', 'behaviour', 'doing', 'performing', 'grazing', 'walking', 'resting'],
             'location': ['location', 'where', 'position', 'place'],
             'accelerometer': ['accelerometer', 'accx', 'accy', 'accz', 'acceleration', 'movement'],
+            'activity': ['activity', 'active', 'odba', 'vedba', 'energetic', 'exertion'],
             'health': ['health', 'healthy', 'sick', 'wellness', 'fine', 'okay']
         }
         self.time_keywords = {
-            'current': ['current', 'now', 'present', 'latest', 'today'],
+            'current': ['current', 'now', 'present', 'latest'],
+            'today': ['today'],
             'yesterday': ['yesterday'],
             'last_hour': ['last hour', 'past hour'],
-            'last_week': ['last week', 'past week']
+            'last_week': ['last week', 'past week'],
+            'this_morning': ['this morning', 'morning'],
+            'last_night': ['last night', 'overnight', 'night'],
+        }
+        # Word stems naming a behavior in time budget questions ("how long did she graze")
+        self.behavior_stems = {
+            'graz': 'grazing', 'walk': 'walking', 'rest': 'resting', 'lying': 'resting', 'lay': 'resting',
+            'sleep': 'resting', 'slept': 'resting', 'ruminat': 'ruminating', 'chew': 'ruminating',
+            'stand': 'standing', 'stood': 'standing',
+        }
+        # Share words only ask for a time budget next to a behavior or a stretch of
+        # time ("what fraction of the night was she lying down?"), so "what
+        # percentage of cows are sick?" stays a health question
+        self.share_keywords = ['fraction', 'proportion', 'percentage', 'percent', 'share of']
+        self.duration_pattern = (r'\bof\s+(?:the\s+|her\s+|his\s+|its\s+|their\s+)?'
+                                 r'(?:(?:last|past)\s+(?:[\w.]+\s+)?)?'
+                                 r'(?:night|day|morning|afternoon|evening|hours?|minutes?|days|weeks?|time)\b')
+        # Questions about the whole herd rather than one animal
+        self.herd_keywords = ['cows', 'herd', 'cattle', 'animals', 'which']
+        # Spatial questions: named geofences and distances around a cow
+        # ("which paddock is cow-3 in?" asks for a location, not about a named fence)
+        self.geofence_pattern = (r'\b(?<!which )(?<!what )(?:the\s+)?('
+                                 r'(?:(?!(?:in|of|the|which|what|inside|outside|left|escaped|beyond|from|near|at|to)\s)'
+                                 r'[a-z0-9]+\s+)?'
+                                 r'(?:paddock|pasture|field|barn|yard)(?:\s+\d+)?)\b')
+        self.outside_keywords = ['outside', 'out of', 'left', 'escaped', 'beyond', 'not in']
+        self.near_keywords = ['near', 'close to', 'next to', 'nearby', 'around']
+        self.radius_pattern = r'within\s+(\d+(?:\.\d+)?)\s*(km|kilomet(?:er|re)s?|m|met(?:er|re)s?)\b'
+        self.default_radius_m = 100.0
+        # "last 3 days", "since 6am", "between Monday and Wednesday" resolve to a 'range'
+        self.time_parser = TimeExpressionParser()
+        self.compile_matcher()
+    
+    def compile_matcher(self):
+        """Precompile the cow ID regex and one keyword matcher for a single pass.
+        
+        Call again after changing metric_keywords, time_keywords, herd_keywords,
+        share_keywords or behavior_stems. Keywords are folded into a prefix trie
+        regex, so the query is scanned once instead of once per keyword, and a
+        longer keyword always wins over its prefix ('temperature' over 'temp').
+        """
+        self.cow_matcher = re.compile(self.cow_pattern)
+        self.geofence_matcher = re.compile(self.geofence_pattern)
+        self.outside_matcher = re.compile(rf"\b(?:{'|'.join(map(re.escape, self.outside_keywords))})\b")
+        self.near_matcher = re.compile(rf"\b(?:{'|'.join(map(re.escape, self.near_keywords))})\b")
+        self.radius_matcher = re.compile(self.radius_pattern)
+        self.behavior_matcher = re.compile(rf"\b({_trie_pattern(self.behavior_stems)})")
+        self.duration_matcher = re.compile(self.duration_pattern)
+        self.keyword_index = {}
+        for kind, groups in (('metric', self.metric_keywords), ('time', self.time_keywords)):
+            for label, keywords in groups.items():
+                for keyword in keywords:
+                    self.keyword_index.setdefault(keyword, []).append((kind, label))
+        for keyword in self.herd_keywords:
+            self.keyword_index.setdefault(keyword, []).append(('scope', 'herd'))
+        for keyword in self.share_keywords:
+            self.keyword_index.setdefault(keyword, []).append(('share', 'time_budget'))
+        # Earlier dictionary entries win ties, preserving their priority order
+        self.metric_priority = {metric: rank for rank, metric in enumerate(self.metric_keywords)}
+        self.time_priority = {time_type: rank for rank, time_type in enumerate(self.time_keywords)}
+        self.keyword_matcher = re.compile(_trie_pattern(self.keyword_index))
+        # A keyword starting inside a word ('temp' in 'attempt', 'hot' in 'shot') is a doubtful hit
+        self.inword_matcher = re.compile(rf"\B{_trie_pattern(self.keyword_index)}")
+    
+    def _pick(self, hits: Dict[str, int], priority: Dict[str, int], default: str) -> str:
+        """Label with the most keyword hits; ties go to the higher-priority label"""
+        if not hits:
+            return default
+        if len(hits) == 1:
+            return next(iter(hits))
+        return min(hits, key=lambda label: (-hits[label], priority[label]))
+    
+    def scan(self, query: str) -> Dict:
+        """Extract cow ID, metric and time context with one pass over the query"""
+        query_lower = query.lower()
+        processed, unsure = self._scan_keywords(query_lower)
+        if unsure:
+            self._use_nlp_metric(processed, self.nlp_parser.classify(query))
+        self._scan_details(query_lower, processed)
+        return processed
+    
+    def _scan_keywords(self, query_lower: str) -> Tuple[Dict, bool]:
+        """Keyword classification, and whether it is unsure enough to ask the NLP parser.
+        
+        Without an nlp_parser it is never unsure, so the fast path does no
+        extra work. With one, a question is unsure when no metric keyword
+        matched, the top metrics tied, or a keyword matched inside a word.
+        """
+        hits = {'metric': {}, 'time': {}, 'scope': {}, 'share': {}}
+        for keyword in self.keyword_matcher.findall(query_lower):
+            for kind, label in self.keyword_index[keyword]:
+                hits[kind][label] = hits[kind].get(label, 0) + 1
+        if hits['share'] and (self.behavior_matcher.search(query_lower) or self.duration_matcher.search(query_lower)):
+            hits['metric']['time_budget'] = hits['metric'].get('time_budget', 0) + hits['share']['time_budget']
+        cow_ids = self.extract_cow_ids(query_lower)
+        cow_id = cow_ids[0] if cow_ids else None
+        processed = {
+            'cow_id': cow_id,
+            # Every cow mentioned; more than one makes a comparison question
+            'cow_ids': cow_ids,
+            'metric': self._pick(hits['metric'], self.metric_priority, 'general'),
+            'time_context': self._pick(hits['time'], self.time_priority, 'current'),
+            # A named cow always wins over herd wording ("which cows near cow-101")
+            'scope': 'herd' if hits['scope'] and cow_id is None else 'cow',
         }
+        window = self.time_parser.parse(query_lower)
+        if window is not None:
+            # ISO strings keep the processed query JSON-serializable
+            processed.update(time_context='range', time_label=window.label,
+                             time_range=(window.start.isoformat(), window.end.isoformat()))
+        if self.nlp_parser is None:
+            return processed, False
+        counts = sorted(hits['metric'].values(), reverse=True)
+        unsure = (not counts or (len(counts) > 1 and counts[0] == counts[1])
+                  or self.inword_matcher.search(query_lower) is not None)
+        return processed, unsure
+    
+    def _use_nlp_metric(self, processed: Dict, metric: str):
+        if metric is not None:
+            processed.update(metric=metric, classifier='nlp')
+    
+    def _scan_details(self, query_lower: str, processed: Dict):
+        """Metric-specific details once the metric is settled: behavior, geofences, proximity"""
+        if processed['metric'] == 'time_budget':
+            behavior = self.behavior_matcher.search(query_lower)
+            processed['behavior'] = self.behavior_stems[behavior.group(1)] if behavior else None
+        self._scan_spatial(query_lower, processed)
+    
+    def _named_devices(self, query_lower: str) -> list:
+        """(offset, device) for registered devices the query names by cow name or cow ID"""
+        try:
+            return self.registry.mentions(query_lower)
+        except Exception:
+            return []
+    
+    def _scan_spatial(self, query_lower: str, processed: Dict):
+        """Turn geofence and proximity wording into 'geofence'/'proximity' metrics"""
+        geofence = self.geofence_matcher.search(query_lower)
+        if geofence:
+            processed.update(
+                metric='geofence', scope='herd' if processed['cow_id'] is None else 'cow',
+                geofence=geofence.group(1),
+                geofence_side='outside' if self.outside_matcher.search(query_lower) else 'inside',
+            )
+            return
+        if processed['cow_id'] is None:
+            return
+        radius = self.radius_matcher.search(query_lower)
+        if radius:
+            meters = float(radius.group(1)) * (1000.0 if radius.group(2).startswith('k') else 1.0)
+            processed.update(metric='proximity', radius_m=meters)
+        elif self.near_matcher.search(query_lower):
+            processed.update(metric='proximity', radius_m=self.default_radius_m)
     
     def extract_cow_id(self, query: str) -> str:
         """Extract cow ID from query"""
         match = re.search(self.cow_pattern, query.lower())
         return f"cow-{match.group(1)}" if match else None
     
+    def extract_cow_ids(self, query: str) -> List[str]:
+        """Every cow the query mentions, by ID or by registered name, in order of mention"""
+        query_lower = query.lower()
+        mentions = [(match.start(), f"cow-{match.group(1)}") for match in self.cow_matcher.finditer(query_lower)]
+        if self.registry is not None:
+            # Names are looked up in the text left after removing the cow-N IDs
+            remainder = self.cow_matcher.sub(lambda match: ' ' * len(match.group(0)), query_lower)
+            mentions += [(position, device.device_id) for position, device in self._named_devices(remainder)]
+        cow_ids = []
+        for _, cow_id in sorted(mentions, key=lambda mention: mention[0]):
+            if cow_id not in cow_ids:
+                cow_ids.append(cow_id)
+        return cow_ids
+    
     def extract_metric(self, query: str) -> str:
         """Extract what metric user is asking about"""
-        query_lower = query.lower()
-        for metric, keywords in self.metric_keywords.items():
-            if any(keyword in query_lower for keyword in keywords):
-                return metric
-        return 'general'
+        return self.scan(query)['metric']
     
     def extract_time_context(self, query: str) -> str:
         """Extract time context from query"""
-        query_lower = query.lower()
-        for time_type, keywords in self.time_keywords.items():
-            if any(keyword in query_lower for keyword in keywords):
-                return time_type
-        return 'current'
+        return self.scan(query)['time_context']
     
     def process_query(self, query: str) -> Dict:
         """Process user query and extract information"""
-        processed = {
-            'cow_id': self.extract_cow_id(query),
-            'metric': self.extract_metric(query),
-            'time_context': self.extract_time_context(query),
-            'original_query': query
-        }
-        
-        # Debug info in sidebar
-        with st.sidebar:
-            st.subheader("🔍 Query Analysis")
-            st.json(processed)
+        processed = self.scan(query)
+        processed['original_query'] = query
+        return processed
+    
+    def process_queries(self, queries: Iterable[str], n_process: int = 1) -> List[Dict]:
+        """Classify a batch of questions, e.g. logged chat history.
         
-        return processed
\ No newline at end of file
+        Questions the keywords are unsure about go to the NLP parser together
+        in one nlp.pipe call, parsed by n_process worker processes.
+        """
+        queries = list(queries)
+        scanned = [self._scan_keywords(query.lower()) for query in queries]
+        unsure = [i for i, (_, is_unsure) in enumerate(scanned) if is_unsure]
+        if unsure:
+            metrics = self.nlp_parser.classify_many([queries[i] for i in unsure], n_process=n_process)
+            for i, metric in zip(unsure, metrics):
+                self._use_nlp_metric(scanned[i][0], metric)
+        results = []
+        for query, (processed, _) in zip(queries, scanned):
+            self._scan_details(query.lower(), processed)
+            processed['original_query'] = query
+            results.append(processed)
+        return results
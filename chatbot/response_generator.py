@@ -1,9 +1,22 @@
-import pandas as pd
-import streamlit as st
+import math
 from typing import Dict
+from config import Config
+from database.rows import ResultRows
 
 class SimpleResponseGenerator:
-    def __init__(self):
+    def __init__(self, temp_high: float = None, temp_low: float = None):
+        # Health thresholds (°C)
+        self.temp_high = Config.TEMP_HIGH_THRESHOLD if temp_high is None else temp_high
+        self.temp_low = Config.TEMP_LOW_THRESHOLD if temp_low is None else temp_low
+        self.time_labels = {
+            'current': 'latest readings',
+            'today': 'today',
+            'yesterday': 'yesterday',
+            'last_hour': 'the last hour',
+            'last_week': 'the last week',
+            'this_morning': 'this morning',
+            'last_night': 'last night',
+        }
         self.templates = {
             'temperature': "🌡️ **{cow_name}** currently has a temperature of **{temperature}°C**",
             'behavior': "🐄 **{cow_name}** is currently **{behavior}** (confidence: {confidence:.1%})",
@@ -14,6 +27,34 @@ class SimpleResponseGenerator:
             'no_data': "❌ Sorry, I couldn't find data for that cow. Available cows: {available_cows}",
             'error': "🔧 Something went wrong. Please try again."
         }
+        # Rollup summaries answer questions about a whole period
+        self.summary_templates = {
+            'temperature': "🌡️ **{cow_name}** averaged **{temp_mean:.1f}°C** "
+                           "({period}; range {temp_min:.1f}–{temp_max:.1f}°C, {readings} readings)",
+            'behavior': "🐄 **{cow_name}** ({period}): {breakdown}",
+            'accelerometer': "📊 **{cow_name}** accelerometer ({period}): "
+                             "X={accx_mean:.3f}±{accx_std:.3f}g, Y={accy_mean:.3f}±{accy_std:.3f}g, "
+                             "Z={accz_mean:.3f}±{accz_std:.3f}g",
+            'general': "📊 **{cow_name}** ({period}): mostly {behavior}, "
+                       "avg {temp_mean:.1f}°C, Activity: {activity_mean:.1%}",
+        }
+        # Mean ODBA (g) above which a cow counts as each activity level
+        self.activity_levels = ((0.3, 'very active'), (0.1, 'moderately active'), (0.0, 'mostly still'))
+        self.behaviors = ('grazing', 'walking', 'resting', 'ruminating', 'standing', 'other_behavior')
+        # Anomaly alert lines: icon, label and value format per detector metric
+        self.alert_formats = {
+            'temperature': ("🌡️", "temperature", "{:.1f}°C"),
+            'activity': ("🏃", "activity", "{:.0%}"),
+            'magnitude': ("📈", "acceleration", "{:.2f}g"),
+        }
+        # Cows listed in a herd-wide time budget table
+        self.time_budget_rows = 10
+    
+    def _period(self, processed_query: Dict, default: str) -> str:
+        """How an answer names the asked-about period ("yesterday", "since 6am")"""
+        if processed_query['time_context'] == 'range':
+            return processed_query.get('time_label', default)
+        return self.time_labels.get(processed_query['time_context'], default)
     
     def _generate_health_response(self, data: Dict) -> str:
         """Generate health status response"""
@@ -23,9 +64,9 @@ class SimpleResponseGenerator:
         health_issues = []
         
         # Temperature check
-        if temp > 39.5:
+        if temp > self.temp_high:
             health_issues.append(f"high temperature ({temp}°C)")
-        elif temp < 38.0 and temp > 0:
+        elif temp < self.temp_low and temp > 0:
             health_issues.append(f"low temperature ({temp}°C)")
         
         if health_issues:
@@ -33,31 +74,362 @@ class SimpleResponseGenerator:
         else:
             return f"✅ **{cow_name}** appears healthy (temp: {temp}°C)"
     
+    def _generate_herd_health_response(self, processed_query: Dict, results: ResultRows) -> str:
+        """List every cow the herd screen flagged, fevers first"""
+        period = self._period(processed_query, 'latest readings')
+        if results.empty:
+            return (f"✅ No cows outside the {self.temp_low}–{self.temp_high}°C range "
+                    f"({period})")
+        
+        fevers, chills = [], []
+        for row in results.records():
+            name = row['cow_name'] or row['device_id']
+            if row['max_temperature'] is not None and row['max_temperature'] > self.temp_high:
+                fevers.append(f"- 🔥 **{name}** ({row['device_id']}): high temperature, "
+                              f"up to {row['max_temperature']:.1f}°C")
+            elif row['min_temperature'] is not None and row['min_temperature'] < self.temp_low:
+                chills.append(f"- 🥶 **{name}** ({row['device_id']}): low temperature, "
+                              f"down to {row['min_temperature']:.1f}°C")
+        
+        lines = [f"⚠️ **{len(results)} cow{'s' if len(results) != 1 else ''}** need attention ({period}):"]
+        return "\n".join(lines + fevers + chills)
+    
+    def _behavior_shares(self, data: Dict) -> list:
+        """(behavior, share) pairs from rollup counts, most frequent first"""
+        counts = {behavior: data.get(f'{behavior}_count') or 0 for behavior in self.behaviors}
+        total = sum(counts.values())
+        if not total:
+            return []
+        shares = [(behavior.replace('_behavior', ''), count / total)
+                  for behavior, count in counts.items() if count]
+        return sorted(shares, key=lambda share: -share[1])
+    
+    def _generate_summary_response(self, processed_query: Dict, data: Dict) -> str:
+        """Describe a cow's rollup summary for the asked period"""
+        metric = processed_query['metric']
+        period = self._period(processed_query, 'the period')
+        data = dict(data)
+        data['cow_name'] = data.get('cow_name') or data.get('device_id', 'Unknown')
+        shares = self._behavior_shares(data)
+        
+        if metric == 'health':
+            peak, low = data.get('temp_max'), data.get('temp_min')
+            health_issues = []
+            if peak is not None and peak > self.temp_high:
+                health_issues.append(f"high temperature (peak {peak:.1f}°C)")
+            if low is not None and 0 < low < self.temp_low:
+                health_issues.append(f"low temperature (down to {low:.1f}°C)")
+            if health_issues:
+                return f"⚠️ **{data['cow_name']}** health alert ({period}): {', '.join(health_issues)}"
+            if data.get('temp_mean') is None:
+                return f"✅ **{data['cow_name']}** has no temperature alerts ({period})"
+            return (f"✅ **{data['cow_name']}** appears healthy "
+                    f"({period}; temp: {low:.1f}–{peak:.1f}°C, avg {data['temp_mean']:.1f}°C)")
+        if metric == 'behavior':
+            breakdown = ', '.join(f"{behavior} {share:.0%}" for behavior, share in shares[:3])
+            return self.summary_templates['behavior'].format(
+                cow_name=data['cow_name'], period=period, breakdown=breakdown or 'no behavior data'
+            )
+        if metric == 'accelerometer':
+            # Standard deviation from the mean and mean of squares
+            for axis in 'xyz':
+                mean, meansq = data.get(f'acc{axis}_mean') or 0, data.get(f'acc{axis}_meansq') or 0
+                data[f'acc{axis}_mean'] = mean
+                data[f'acc{axis}_std'] = math.sqrt(max(meansq - mean * mean, 0.0))
+            return self.summary_templates['accelerometer'].format(period=period, **data)
+        if data.get('temp_mean') is None:
+            return f"❌ No temperature readings for **{data['cow_name']}** ({period})"
+        if metric == 'temperature':
+            return self.summary_templates['temperature'].format(period=period, **data)
+        return self.summary_templates['general'].format(
+            cow_name=data['cow_name'], period=period,
+            behavior=shares[0][0] if shares else 'unknown',
+            temp_mean=data['temp_mean'], activity_mean=data.get('activity_mean') or 0
+        )
+    
+    def _generate_activity_response(self, processed_query: Dict, data: Dict) -> str:
+        """Describe movement from the accelerometer feature summary"""
+        period = self._period(processed_query, 'the last hour')
+        if processed_query['time_context'] == 'current':
+            period = 'the last hour'
+        cow_name = data.get('cow_name') or data.get('device_id', 'Unknown')
+        odba = data['odba_mean']
+        level = next(label for threshold, label in self.activity_levels if odba >= threshold)
+        return (f"🏃 **{cow_name}** was **{level}** ({period}): ODBA {odba:.2f}g on average, "
+                f"peak {data['odba_max']:.2f}g, VeDBA {data['vedba_mean']:.2f}g "
+                f"over {data['feature_readings']} readings")
+    
+    def _generate_geofence_response(self, processed_query: Dict, results: ResultRows,
+                                    db_connection=None) -> str:
+        """Report which cows are inside or outside a named geofence"""
+        fence = processed_query['geofence']
+        side = processed_query['geofence_side']
+        if results.empty:
+            known = self.get_geofences(db_connection) if db_connection else []
+            if fence not in known:
+                return (f"❌ I don't know a geofence called '{fence}'. "
+                        f"Known geofences: {', '.join(known) if known else 'None found'}")
+            if processed_query['cow_id']:
+                return f"❌ No position found for {processed_query['cow_id']}"
+            return f"✅ No cows {side} the {fence}"
+        
+        rows = results.records()
+        names = [row['cow_name'] or row['device_id'] for row in rows]
+        device_ids = [row['device_id'] for row in rows]
+        if processed_query['cow_id']:
+            where = "inside" if rows[0]['inside_geofence'] else "outside"
+            icon = "✅" if where == side else "🚧"
+            return f"{icon} **{names[0]}** is **{where}** the {fence}"
+        icon = "🚧" if side == 'outside' else "📍"
+        count = len(results)
+        lines = [f"{icon} **{count} cow{'s' if count != 1 else ''}** {side} the {fence}:"]
+        lines += [f"- **{name}** ({device_id})" for name, device_id in zip(names, device_ids)]
+        return "\n".join(lines)
+    
+    def _generate_proximity_response(self, processed_query: Dict, results: ResultRows) -> str:
+        """List cows within the asked radius of a cow, nearest first"""
+        radius = processed_query['radius_m']
+        radius_label = f"{radius / 1000:g} km" if radius >= 1000 else f"{radius:g} m"
+        rows = results.records()
+        center_name = next((row['cow_name'] for row in rows if row['device_id'] == processed_query['cow_id']),
+                           None) or processed_query['cow_id']
+        neighbors = [row for row in rows if row['device_id'] != processed_query['cow_id']]
+        if not neighbors:
+            return f"📍 No other cows within {radius_label} of **{center_name}**"
+        count = len(neighbors)
+        lines = [f"📍 **{count} cow{'s' if count != 1 else ''}** within {radius_label} of **{center_name}**:"]
+        for row in neighbors:
+            name = row['cow_name'] or row['device_id']
+            lines.append(f"- **{name}** ({row['device_id']}): {row['distance_m']:.0f} m away")
+        return "\n".join(lines)
+    
+    def _comparison_cells(self, metric: str, row: Dict) -> Dict[str, str]:
+        """Table cells describing one cow's row of a comparison result"""
+        def number(value, pattern: str) -> str:
+            return 'n/a' if value is None else pattern.format(value)
+        
+        if 'odba_mean' in row:
+            odba = row['odba_mean']
+            level = next(label for threshold, label in self.activity_levels if odba >= threshold)
+            return {'Activity': level, 'ODBA (g)': number(odba, '{:.2f}'),
+                    'Peak ODBA (g)': number(row['odba_max'], '{:.2f}')}
+        if 'temp_mean' in row:
+            shares = self._behavior_shares(row)
+            mostly = f"{shares[0][0]} {shares[0][1]:.0%}" if shares else 'n/a'
+            if metric == 'temperature':
+                return {'Avg °C': number(row['temp_mean'], '{:.1f}'), 'Min °C': number(row['temp_min'], '{:.1f}'),
+                        'Max °C': number(row['temp_max'], '{:.1f}'), 'Readings': str(row['readings'])}
+            if metric == 'behavior':
+                return {'Behavior': ', '.join(f"{behavior} {share:.0%}" for behavior, share in shares[:3]) or 'n/a'}
+            if metric == 'accelerometer':
+                return {f'{axis.upper()} (g)': number(row[f'acc{axis}_mean'], '{:.3f}') for axis in 'xyz'}
+            if metric == 'health':
+                return {'Status': self._health_status(row['temp_max'], row['temp_min']),
+                        'Min °C': number(row['temp_min'], '{:.1f}'), 'Max °C': number(row['temp_max'], '{:.1f}')}
+            return {'Mostly': mostly, 'Avg °C': number(row['temp_mean'], '{:.1f}'),
+                    'Activity': number(row['activity_mean'], '{:.0%}')}
+        if metric == 'temperature':
+            return {'Temperature °C': number(row['temperature'], '{:.1f}')}
+        if metric == 'behavior':
+            return {'Behavior': row['predicted_behavior'] or 'n/a',
+                    'Confidence': number(row['confidence'], '{:.0%}')}
+        if metric == 'location':
+            return {'Latitude': number(row['location_lat'], '{:.4f}'),
+                    'Longitude': number(row['location_lng'], '{:.4f}')}
+        if metric == 'accelerometer':
+            return {f'{axis} (g)': number(row[axis], '{:.3f}') for axis in ('AccX', 'AccY', 'AccZ')}
+        if metric == 'health':
+            return {'Status': self._health_status(row['temperature'], row['temperature']),
+                    'Temperature °C': number(row['temperature'], '{:.1f}')}
+        return {'Behavior': row['predicted_behavior'] or 'n/a', 'Temperature °C': number(row['temperature'], '{:.1f}'),
+                'Activity': number(row['activity_level'], '{:.0%}')}
+    
+    def _health_status(self, high, low) -> str:
+        if high is not None and high > self.temp_high:
+            return "⚠️ fever"
+        if low is not None and 0 < low < self.temp_low:
+            return "⚠️ low temp"
+        return "✅ healthy" if high is not None else "n/a"
+    
+    def _generate_comparison_response(self, processed_query: Dict, results: ResultRows) -> str:
+        """Markdown table with one row per compared cow, in the order they were asked about"""
+        metric = processed_query['metric']
+        period = self._period(processed_query, 'latest readings')
+        if metric == 'activity' and processed_query['time_context'] == 'current':
+            period = 'the last hour'
+        rows = {row['device_id']: row for row in results.records()}
+        found = [cow_id for cow_id in processed_query['cow_ids'] if cow_id in rows]
+        missing = [cow_id for cow_id in processed_query['cow_ids'] if cow_id not in rows]
+        if not found:
+            return f"❌ No data for {', '.join(missing)} ({period})"
+        
+        cells = [self._comparison_cells(metric, rows[cow_id]) for cow_id in found]
+        headers = ['Cow'] + list(cells[0])
+        cows = f"{len(found)} cows" if len(found) > 1 else "1 cow"
+        lines = [f"📊 **Comparing {cows}** ({period}):", "",
+                 "| " + " | ".join(headers) + " |",
+                 "|" + "|".join("---" for _ in headers) + "|"]
+        for cow_id, row_cells in zip(found, cells):
+            name = rows[cow_id]['cow_name'] or cow_id
+            lines.append(f"| **{name}** ({cow_id}) | " + " | ".join(row_cells.values()) + " |")
+        if missing:
+            lines += ["", f"❌ No data for {', '.join(missing)}"]
+        return "\n".join(lines)
+    
+    def _generate_alerts_response(self, processed_query: Dict, results: ResultRows) -> str:
+        """List the anomaly detector's alerts, newest first"""
+        period = self._period(processed_query, 'the last 24 hours')
+        if processed_query['time_context'] == 'current':
+            period = 'the last 24 hours'
+        if results.empty:
+            cows = processed_query.get('cow_ids') or []
+            subject = f" for {', '.join(cows)}" if cows else ""
+            return f"✅ No unusual readings{subject} ({period})"
+        
+        lines = [f"🚨 **{len(results)} alert{'s' if len(results) != 1 else ''}** ({period}):"]
+        for row in results.records():
+            icon, label, value_format = self.alert_formats.get(row['metric'], ("⚠️", row['metric'], "{:.2f}"))
+            name = row['cow_name'] or row['device_id']
+            lines.append(
+                f"- {icon} **{name}** ({row['device_id']}) at {str(row['timestamp'])[:16]}: {label} "
+                f"**{value_format.format(row['value'])}**, usually {value_format.format(row['expected'])} "
+                f"± {value_format.format(row['std'])} ({row['zscore']:+.1f}σ)"
+            )
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _duration(seconds: float) -> str:
+        """Compact duration: '2d 3h', '5h 20m', '45m'"""
+        minutes = int(round(seconds / 60))
+        days, minutes = divmod(minutes, 24 * 60)
+        hours, minutes = divmod(minutes, 60)
+        if days:
+            return f"{days}d {hours}h"
+        return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m"
+    
+    def _generate_time_budget_response(self, processed_query: Dict, results: ResultRows) -> str:
+        """How long each cow spent in the asked behavior, or its whole time budget"""
+        # NumPy and pandas load with the first time budget question, not at startup
+        from database.time_budget import budgets_from_rows
+        period = self._period(processed_query, 'today')
+        if processed_query['time_context'] == 'current':
+            period = 'today'
+        behavior = processed_query.get('behavior')
+        budgets = budgets_from_rows(results)
+        if not budgets:
+            cows = processed_query.get('cow_ids') or []
+            return f"❌ No behavior readings for {', '.join(cows) if cows else 'any cow'} ({period})"
+        names = dict(zip(results.column('device_id'), results.column('cow_name')))
+        
+        if len(budgets) == 1:
+            budget = next(iter(budgets.values()))
+            name = names.get(budget.device_id) or budget.device_id
+            observed = self._duration(budget.observed_seconds)
+            if behavior:
+                spent = budget.get(behavior)
+                if spent is None:
+                    return f"🐄 **{name}** was not seen {behavior} ({period}; {observed} observed)"
+                return (f"🐄 **{name}** spent **{self._duration(spent.seconds)}** {behavior} "
+                        f"({spent.share:.0%} of {observed} observed, {period}): {spent.bouts} "
+                        f"bout{'s' if spent.bouts != 1 else ''}, longest {self._duration(spent.longest_seconds)}")
+            lines = [f"🐄 **{name}**'s time budget ({period}, {observed} observed):"]
+            lines += [f"- {spent.behavior}: **{self._duration(spent.seconds)}** ({spent.share:.0%}), "
+                      f"{spent.bouts} bout{'s' if spent.bouts != 1 else ''}, "
+                      f"longest {self._duration(spent.longest_seconds)}"
+                      for spent in budget.behaviors]
+            return "\n".join(lines)
+        
+        # Several cows: asked cows in the order asked, the herd by the asked behavior's share
+        def share(device_id: str) -> float:
+            spent = budgets[device_id].get(behavior)
+            return spent.share if spent else 0.0
+        
+        asked = [cow_id for cow_id in processed_query.get('cow_ids') or () if cow_id in budgets]
+        if asked:
+            device_ids = asked
+        elif behavior:
+            device_ids = sorted(budgets, key=lambda device_id: (-share(device_id), device_id))
+        else:
+            device_ids = sorted(budgets)
+        shown = device_ids[:self.time_budget_rows]
+        if behavior:
+            headers = ['Cow', behavior.capitalize(), 'Share', 'Bouts', 'Longest']
+        else:
+            headers = ['Cow', 'Observed', 'Top behaviors']
+        lines = [f"🐄 **Time budget of {len(budgets)} cows** ({period}):", "",
+                 "| " + " | ".join(headers) + " |",
+                 "|" + "|".join("---" for _ in headers) + "|"]
+        for device_id in shown:
+            budget = budgets[device_id]
+            if behavior:
+                spent = budget.get(behavior)
+                cells = ([self._duration(spent.seconds), f"{spent.share:.0%}", str(spent.bouts),
+                          self._duration(spent.longest_seconds)] if spent else ['0m', '0%', '0', 'n/a'])
+            else:
+                cells = [self._duration(budget.observed_seconds),
+                         ', '.join(f"{spent.behavior} {spent.share:.0%}" for spent in budget.behaviors[:3])]
+            name = names.get(device_id) or device_id
+            lines.append(f"| **{name}** ({device_id}) | " + " | ".join(cells) + " |")
+        if len(device_ids) > len(shown):
+            lines += ["", f"…and {len(device_ids) - len(shown)} more"]
+        missing = [cow_id for cow_id in processed_query.get('cow_ids') or () if cow_id not in budgets]
+        if missing:
+            lines += ["", f"❌ No data for {', '.join(missing)}"]
+        return "\n".join(lines)
+    
+    def get_geofences(self, db_connection) -> list:
+        """Get list of known geofence names"""
+        try:
+            return db_connection.fetch_rows("SELECT name FROM cattle_geofences ORDER BY name").column('name')
+        except Exception:
+            return []
+    
     def get_available_cows(self, db_connection) -> list:
-        """Get list of available cow IDs"""
+        """Get list of available cow IDs from the in-memory device registry"""
         try:
-            query = "SELECT DISTINCT device_id FROM cattle_inference ORDER BY device_id"
-            result = db_connection.execute_query(query)
-            return result['device_id'].tolist() if not result.empty else []
-        except:
+            return db_connection.devices.device_ids()
+        except Exception:
             return []
     
-    def generate_response(self, processed_query: Dict, results: pd.DataFrame, db_connection=None) -> str:
-        """Generate response based on query and results"""
+    def generate_response(self, processed_query: Dict, results: ResultRows, db_connection=None,
+                          available_cows: list = None) -> str:
+        """Generate response based on query and results (available_cows skips the lookup on no data)"""
+        if not isinstance(results, ResultRows):
+            # A DataFrame from DatabaseConnection.execute_query
+            results = ResultRows.from_frame(results)
+        
+        if processed_query.get('scope') == 'herd' and 'max_temperature' in results.columns:
+            return self._generate_herd_health_response(processed_query, results)
+        
+        if processed_query['metric'] == 'geofence':
+            return self._generate_geofence_response(processed_query, results, db_connection)
+        
+        if processed_query['metric'] == 'alerts':
+            return self._generate_alerts_response(processed_query, results)
+        
+        if processed_query['metric'] == 'time_budget':
+            return self._generate_time_budget_response(processed_query, results)
+        
+        if len(processed_query.get('cow_ids') or ()) > 1 and processed_query['metric'] != 'proximity':
+            return self._generate_comparison_response(processed_query, results)
+        
         if results.empty:
-            available_cows = self.get_available_cows(db_connection) if db_connection else []
+            if available_cows is None:
+                available_cows = self.get_available_cows(db_connection) if db_connection else []
             return self.templates['no_data'].format(
                 available_cows=', '.join(available_cows) if available_cows else 'None found'
             )
         
         try:
-            data = results.iloc[0].to_dict()
+            data = results.first()
             metric = processed_query['metric']
             
-            # Display data in sidebar for debugging
-            with st.sidebar:
-                st.subheader("📊 Retrieved Data")
-                st.json(data)
+            if 'distance_m' in data:
+                return self._generate_proximity_response(processed_query, results)
+            if 'odba_mean' in data:
+                return self._generate_activity_response(processed_query, data)
+            if 'temp_mean' in data:
+                return self._generate_summary_response(processed_query, data)
             
             if metric == 'temperature':
                 return self.templates['temperature'].format(
@@ -1,48 +1,520 @@
-from typing import Dict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.sql.elements import TextClause
+from config import Config
+from database.geo import METERS_PER_DEGREE
 
 class SimpleSQLGenerator:
-    def __init__(self):
-        self.base_query = """
-        SELECT ci.device_id, cd.cow_name, ci.timestamp,
-               ci.predicted_behavior, ci.confidence, ci.temperature,
-               ci.location_lat, ci.location_lng, ci.activity_level,
-               ci.AccX, ci.AccY, ci.AccZ
+    def __init__(self, temp_high: float = None, temp_low: float = None):
+        # Herd screening thresholds (°C), bound as parameters at execution time
+        self.temp_high = Config.TEMP_HIGH_THRESHOLD if temp_high is None else temp_high
+        self.temp_low = Config.TEMP_LOW_THRESHOLD if temp_low is None else temp_low
+        # Columns each metric needs on top of device_id, cow_name and timestamp
+        self.metric_columns = {
+            'temperature': ['ci.temperature'],
+            'behavior': ['ci.predicted_behavior', 'ci.confidence'],
+            'location': ['ci.location_lat', 'ci.location_lng'],
+            'accelerometer': ['ci.AccX', 'ci.AccY', 'ci.AccZ'],
+            'health': ['ci.temperature', 'ci.predicted_behavior', 'ci.activity_level'],
+        }
+        self.all_columns = [
+            'ci.predicted_behavior', 'ci.confidence', 'ci.temperature',
+            'ci.location_lat', 'ci.location_lng', 'ci.activity_level',
+            'ci.AccX', 'ci.AccY', 'ci.AccZ',
+        ]
+        self.inference_source = """
         FROM cattle_inference ci
         LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
         """
+        # Current state comes from the trigger-maintained cattle_latest table
+        self.latest_source = """
+        FROM cattle_latest ci
+        LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
+        """
+        # 'range' is any parsed window ("since 6am"); its bounds come with the query
+        self.time_contexts = ('today', 'yesterday', 'last_hour', 'last_week', 'this_morning', 'last_night', 'range')
+        self.herd_metrics = ('health', 'temperature')
+        # Day-plus windows are answered from the hourly/daily rollup tables;
+        # location has no meaningful aggregate and always reads raw rows
+        self.rollup_contexts = ('today', 'yesterday', 'last_week', 'this_morning', 'last_night')
+        self.rollup_metrics = ('temperature', 'behavior', 'accelerometer', 'health', 'general')
+        # Parsed ranges at least this long use the rollups too; shorter ones read raw rows
+        self.rollup_min_window = timedelta(hours=2)
+        self.rollup_columns = (
+            "device_id, last_reading, readings, temp_count, temp_sum, temp_min, temp_max, "
+            "activity_count, activity_sum, acc_count, accx_sum, accy_sum, accz_sum, "
+            "accx_sumsq, accy_sumsq, accz_sumsq, grazing_count, walking_count, "
+            "resting_count, ruminating_count, standing_count, other_behavior_count"
+        )
+        # Prepared statements keyed by (metric, time_context, has_cow)
+        self._statements: Dict[Tuple[str, str, bool], TextClause] = {}
+    
+    def time_bounds(self, time_context: str, now: datetime = None) -> Optional[Tuple[datetime, datetime]]:
+        """Resolve a time context to a half-open [start, end) range in local time"""
+        now = now or datetime.now()
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Rolling windows end at the next whole minute so repeat questions
+        # within a minute bind identical parameters and can hit the result cache
+        now = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        if time_context == 'today':
+            return start_of_day, start_of_day + timedelta(days=1)
+        if time_context == 'yesterday':
+            return start_of_day - timedelta(days=1), start_of_day
+        if time_context == 'last_hour':
+            return now - timedelta(hours=1), now
+        if time_context == 'last_week':
+            return now - timedelta(days=7), now
+        if time_context == 'this_morning':
+            return start_of_day, start_of_day + timedelta(hours=12)
+        if time_context == 'last_night':
+            # 8pm yesterday to 6am today, or to now while that night is still on
+            return start_of_day - timedelta(hours=4), min(start_of_day + timedelta(hours=6), now)
+        return None
+    
+    def query_bounds(self, processed_query: Dict) -> Optional[Tuple[datetime, datetime]]:
+        """[start, end) for a processed query: its parsed range, else its time context"""
+        if processed_query['time_context'] == 'range':
+            start, end = processed_query['time_range']
+            return datetime.fromisoformat(start), datetime.fromisoformat(end)
+        return self.time_bounds(processed_query['time_context'])
+    
+    def uses_rollups(self, time_context: str, bounds: Optional[Tuple[datetime, datetime]]) -> bool:
+        """Whether a period is summarized from the rollup tables rather than raw readings"""
+        if time_context == 'range':
+            return bounds[1] - bounds[0] >= self.rollup_min_window
+        return time_context in self.rollup_contexts
     
-    def generate_query(self, processed_query: Dict) -> str:
-        """Generate SQL query based on processed input"""
+    def rollup_bounds(self, start: datetime, end: datetime) -> Dict[str, datetime]:
+        """Split [start, end) into whole days read from the daily rollup and hourly edges.
+        
+        The hourly edges are [start, day_start) and [day_end, end); start is
+        floored to the hour, so a rolling window may include up to an hour of
+        readings before it.
+        """
+        start = start.replace(minute=0, second=0, microsecond=0)
+        day_start = start.replace(hour=0)
+        if day_start < start:
+            day_start += timedelta(days=1)
+        day_end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+        if day_end <= day_start:
+            # No whole day inside the window: read hourly buckets only
+            day_start = day_end = end
+        return {'start': start, 'day_start': day_start, 'day_end': day_end, 'end': end}
+    
+    def get_statement(self, metric: str, time_context: str, has_cow: bool) -> TextClause:
+        """Return the prepared statement for a query shape, building it on first use"""
+        if time_context not in self.time_contexts:
+            time_context = 'current'
+        key = (metric, time_context, has_cow)
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._build_statement(metric, time_context, has_cow)
+            self._statements[key] = statement
+        return statement
+    
+    def _build_statement(self, metric: str, time_context: str, has_cow: bool) -> TextClause:
+        columns = ['ci.device_id', 'cd.cow_name', 'ci.timestamp']
+        columns += self.metric_columns.get(metric, self.all_columns)
         where_conditions = []
         
         # Add cow ID filter
-        if processed_query['cow_id']:
-            where_conditions.append(f"ci.device_id = '{processed_query['cow_id']}'")
+        if has_cow:
+            where_conditions.append("ci.device_id = :cow_id")
         
         # Add time filter
-        if processed_query['time_context'] == 'current':
-            where_conditions.append("""
-                ci.timestamp = (
-                    SELECT MAX(timestamp) 
-                    FROM cattle_inference 
-                    WHERE device_id = ci.device_id
-                )
-            """)
-        elif processed_query['time_context'] == 'today':
-            where_conditions.append("DATE(ci.timestamp) = DATE('now')")
-        elif processed_query['time_context'] == 'yesterday':
-            where_conditions.append("DATE(ci.timestamp) = DATE('now', '-1 day')")
-        elif processed_query['time_context'] == 'last_hour':
-            where_conditions.append("ci.timestamp >= datetime('now', '-1 hour')")
-        elif processed_query['time_context'] == 'last_week':
-            where_conditions.append("ci.timestamp >= datetime('now', '-7 days')")
+        if time_context == 'current':
+            source = self.latest_source
+        else:
+            source = self.inference_source
+            # Half-open [start, end) range on the raw column keeps it sargable
+            where_conditions.append("ci.timestamp >= :start AND ci.timestamp < :end")
         
         # Build complete query
-        where_clause = " AND ".join(where_conditions)
-        if where_clause:
-            query = f"{self.base_query} WHERE {where_clause}"
+        query = f"SELECT {', '.join(columns)} {source}"
+        if where_conditions:
+            query += f" WHERE {' AND '.join(where_conditions)}"
+        query += " ORDER BY ci.timestamp DESC LIMIT 10"
+        
+        statement = text(query)
+        if time_context != 'current':
+            # Bind datetimes in the same text format SQLAlchemy stores them in
+            statement = statement.bindparams(
+                bindparam('start', type_=DateTime()),
+                bindparam('end', type_=DateTime()),
+            )
+        return statement
+    
+    def _cow_filter(self, column: str, has_cow: bool, many: bool) -> str:
+        """AND-clause restricting column to the asked cow, or to the :cow_ids list"""
+        if many:
+            return f"AND {column} IN :cow_ids"
+        return f"AND {column} = :cow_id" if has_cow else ""
+    
+    def get_summary_statement(self, has_cow: bool, many: bool = False) -> TextClause:
+        """Prepared per-cow summary over rollup buckets: daily for whole days, hourly at the edges"""
+        key = ('summary', 'rollup', 'many' if many else has_cow)
+        statement = self._statements.get(key)
+        if statement is None:
+            cow_filter = self._cow_filter('device_id', has_cow, many)
+            arms = [
+                ("cattle_rollup_daily", ":day_start", ":day_end"),
+                ("cattle_rollup_hourly", ":start", ":day_start"),
+                ("cattle_rollup_hourly", ":day_end", ":end"),
+            ]
+            buckets = "\n                UNION ALL".join(
+                f"""
+                SELECT {self.rollup_columns} FROM {table}
+                WHERE bucket_start >= {lower} AND bucket_start < {upper} {cow_filter}"""
+                for table, lower, upper in arms
+            )
+            acc_means = ", ".join(
+                f"SUM(r.acc{axis}_sum) / NULLIF(SUM(r.acc_count), 0) AS acc{axis}_mean, "
+                f"SUM(r.acc{axis}_sumsq) / NULLIF(SUM(r.acc_count), 0) AS acc{axis}_meansq"
+                for axis in 'xyz'
+            )
+            behavior_counts = ", ".join(
+                f"SUM(r.{behavior}_count) AS {behavior}_count"
+                for behavior in ('grazing', 'walking', 'resting', 'ruminating', 'standing', 'other_behavior')
+            )
+            query = f"""
+            WITH buckets AS ({buckets}
+            )
+            SELECT r.device_id, cd.cow_name, MAX(r.last_reading) AS timestamp,
+                   SUM(r.readings) AS readings,
+                   SUM(r.temp_sum) / NULLIF(SUM(r.temp_count), 0) AS temp_mean,
+                   MIN(r.temp_min) AS temp_min, MAX(r.temp_max) AS temp_max,
+                   SUM(r.activity_sum) / NULLIF(SUM(r.activity_count), 0) AS activity_mean,
+                   {acc_means},
+                   {behavior_counts}
+            FROM buckets r
+            LEFT JOIN cattle_devices cd ON r.device_id = cd.device_id
+            GROUP BY r.device_id
+            ORDER BY {'r.device_id' if many else 'timestamp DESC LIMIT 10'}
+            """
+            statement = text(query).bindparams(
+                *[bindparam(name, type_=DateTime()) for name in ('start', 'day_start', 'day_end', 'end')],
+                *self._cow_list_params(many)
+            )
+            self._statements[key] = statement
+        return statement
+    
+    def get_activity_statement(self, has_cow: bool, many: bool = False) -> TextClause:
+        """Prepared movement summary per cow from the ingest-time accelerometer features"""
+        key = ('activity', 'features', 'many' if many else has_cow)
+        statement = self._statements.get(key)
+        if statement is None:
+            cow_filter = self._cow_filter('f.device_id', has_cow, many)
+            query = f"""
+            SELECT f.device_id, cd.cow_name, MAX(f.timestamp) AS timestamp,
+                   COUNT(*) AS feature_readings,
+                   AVG(f.odba) AS odba_mean, MAX(f.odba) AS odba_max,
+                   AVG(f.vedba) AS vedba_mean, AVG(f.magnitude_var) AS magnitude_var_mean,
+                   AVG(f.pitch) AS pitch_mean, AVG(f.roll) AS roll_mean
+            FROM cattle_acc_features f
+            LEFT JOIN cattle_devices cd ON f.device_id = cd.device_id
+            WHERE f.timestamp >= :start AND f.timestamp < :end {cow_filter}
+            GROUP BY f.device_id
+            ORDER BY {'f.device_id' if many else 'odba_mean DESC LIMIT 10'}
+            """
+            statement = text(query).bindparams(
+                bindparam('start', type_=DateTime()),
+                bindparam('end', type_=DateTime()),
+                *self._cow_list_params(many)
+            )
+            self._statements[key] = statement
+        return statement
+    
+    def _cow_list_params(self, many: bool) -> list:
+        # An expanding parameter renders IN (?, ?, ...) for however many cows are bound
+        return [bindparam('cow_ids', expanding=True)] if many else []
+    
+    def get_comparison_statement(self, metric: str, time_context: str, rollup: bool = None) -> TextClause:
+        """Prepared side-by-side query for several cows (:cow_ids): one row per cow, one round-trip.
+        
+        Current state reads each cow's cattle_latest row, rollup periods reuse
+        the summary over rollup buckets, and shorter windows (the last hour)
+        aggregate raw readings into the same summary columns.
+        """
+        if metric == 'activity':
+            return self.get_activity_statement(True, many=True)
+        if rollup is None:
+            rollup = time_context in self.rollup_contexts
+        if rollup:
+            return self.get_summary_statement(True, many=True)
+        if time_context not in self.time_contexts:
+            time_context = 'current'
+        key = ('compare', time_context, 'many')
+        statement = self._statements.get(key)
+        if statement is None:
+            if time_context == 'current':
+                query = f"""
+                SELECT ci.device_id, cd.cow_name, ci.timestamp, {', '.join(self.all_columns)}
+                {self.latest_source}
+                WHERE ci.device_id IN :cow_ids
+                ORDER BY ci.device_id
+                """
+                statement = text(query).bindparams(*self._cow_list_params(True))
+            else:
+                acc_means = ", ".join(
+                    f"AVG(ci.Acc{axis.upper()}) AS acc{axis}_mean, "
+                    f"AVG(ci.Acc{axis.upper()} * ci.Acc{axis.upper()}) AS acc{axis}_meansq"
+                    for axis in 'xyz'
+                )
+                behavior_counts = ", ".join(
+                    f"SUM(ci.predicted_behavior = '{behavior}') AS {behavior}_count"
+                    for behavior in ('grazing', 'walking', 'resting', 'ruminating', 'standing')
+                )
+                query = f"""
+                SELECT ci.device_id, cd.cow_name, MAX(ci.timestamp) AS timestamp,
+                       COUNT(*) AS readings,
+                       AVG(ci.temperature) AS temp_mean,
+                       MIN(ci.temperature) AS temp_min, MAX(ci.temperature) AS temp_max,
+                       AVG(ci.activity_level) AS activity_mean,
+                       {acc_means},
+                       {behavior_counts},
+                       SUM(ci.predicted_behavior NOT IN ('grazing', 'walking', 'resting', 'ruminating', 'standing'))
+                           AS other_behavior_count
+                {self.inference_source}
+                WHERE ci.device_id IN :cow_ids AND ci.timestamp >= :start AND ci.timestamp < :end
+                GROUP BY ci.device_id
+                ORDER BY ci.device_id
+                """
+                statement = text(query).bindparams(
+                    bindparam('start', type_=DateTime()),
+                    bindparam('end', type_=DateTime()),
+                    *self._cow_list_params(True)
+                )
+            self._statements[key] = statement
+        return statement
+    
+    def get_alerts_statement(self, has_cow: bool, many: bool = False) -> TextClause:
+        """Prepared read of the anomaly detector's alerts in a time range, newest first"""
+        key = ('alerts', 'range', 'many' if many else has_cow)
+        statement = self._statements.get(key)
+        if statement is None:
+            query = f"""
+            SELECT a.device_id, cd.cow_name, a.timestamp, a.metric, a.value, a.expected, a.std, a.zscore
+            FROM cattle_alerts a
+            LEFT JOIN cattle_devices cd ON a.device_id = cd.device_id
+            WHERE a.timestamp >= :start AND a.timestamp < :end {self._cow_filter('a.device_id', has_cow, many)}
+            ORDER BY a.timestamp DESC
+            LIMIT 50
+            """
+            statement = text(query).bindparams(
+                bindparam('start', type_=DateTime()),
+                bindparam('end', type_=DateTime()),
+                *self._cow_list_params(many)
+            )
+            self._statements[key] = statement
+        return statement
+    
+    def get_time_budget_statement(self, has_cow: bool, many: bool = False) -> TextClause:
+        """Prepared behavior series in a time range for database.time_budget.
+        
+        Rows are unordered: the time budget sorts by device and timestamp
+        itself, so SQLite never sorts a herd-wide series.
+        """
+        key = ('time_budget', 'range', 'many' if many else has_cow)
+        statement = self._statements.get(key)
+        if statement is None:
+            query = f"""
+            SELECT ci.device_id, cd.cow_name, ci.timestamp, ci.predicted_behavior
+            {self.inference_source}
+            WHERE ci.timestamp >= :start AND ci.timestamp < :end {self._cow_filter('ci.device_id', has_cow, many)}
+            """
+            statement = text(query).bindparams(
+                bindparam('start', type_=DateTime()),
+                bindparam('end', type_=DateTime()),
+                *self._cow_list_params(many)
+            )
+            self._statements[key] = statement
+        return statement
+    
+    def get_geofence_statement(self, side: str, has_cow: bool) -> TextClause:
+        """Prepared geofence check on current positions, probing the location R*Tree.
+        
+        'inside' joins the fence's bounding box against the R*Tree; 'outside'
+        is every positioned cow not in that set. The R*Tree stores 32-bit
+        boxes, so membership is confirmed against the exact coordinates.
+        """
+        key = ('geofence', side, has_cow)
+        statement = self._statements.get(key)
+        if statement is None:
+            inside = """
+                    ci.location_lat BETWEEN g.min_lat AND g.max_lat
+                    AND ci.location_lng BETWEEN g.min_lng AND g.max_lng"""
+            columns = "ci.device_id, cd.cow_name, ci.timestamp, ci.location_lat, ci.location_lng"
+            if has_cow:
+                # One cow is a primary key lookup, no index probe needed
+                query = f"""
+                SELECT {columns}, g.name AS geofence, ({inside}) AS inside_geofence
+                FROM cattle_latest ci
+                JOIN cattle_geofences g ON g.name = :geofence
+                LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
+                WHERE ci.device_id = :cow_id
+                """
+            else:
+                probe = f"""
+                    SELECT ci.rowid AS id
+                    FROM cattle_geofences g
+                    JOIN cattle_location_rtree r
+                      ON r.max_lat >= g.min_lat AND r.min_lat <= g.max_lat
+                     AND r.max_lng >= g.min_lng AND r.min_lng <= g.max_lng
+                    JOIN cattle_latest ci ON ci.rowid = r.id
+                    WHERE g.name = :geofence AND {inside}"""
+                membership = "IN" if side == 'inside' else "NOT IN"
+                query = f"""
+                WITH inside AS ({probe}
+                )
+                SELECT {columns}, g.name AS geofence,
+                       {int(side == 'inside')} AS inside_geofence
+                FROM cattle_geofences g, cattle_latest ci
+                LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
+                WHERE g.name = :geofence AND ci.location_lat IS NOT NULL
+                  AND ci.rowid {membership} (SELECT id FROM inside)
+                ORDER BY ci.device_id
+                """
+            statement = text(query)
+            self._statements[key] = statement
+        return statement
+    
+    def get_proximity_statement(self) -> TextClause:
+        """Prepared "cows within N m of cow-X": R*Tree box probe, exact distance on candidates.
+        
+        The named cow itself is returned at distance 0, so an empty result
+        means it has no known position.
+        """
+        key = ('proximity', 'rtree', True)
+        statement = self._statements.get(key)
+        if statement is None:
+            query = """
+            WITH center AS (
+                SELECT location_lat AS lat, location_lng AS lng,
+                       lng_degrees(:radius_m, location_lat) AS dlng
+                FROM cattle_latest
+                WHERE device_id = :cow_id
+            )
+            SELECT ci.device_id, cd.cow_name, ci.timestamp, ci.location_lat, ci.location_lng,
+                   distance_m(c.lat, c.lng, ci.location_lat, ci.location_lng) AS distance_m
+            FROM center c
+            JOIN cattle_location_rtree r
+              ON r.max_lat >= c.lat - :dlat AND r.min_lat <= c.lat + :dlat
+             AND r.max_lng >= c.lng - c.dlng AND r.min_lng <= c.lng + c.dlng
+            JOIN cattle_latest ci ON ci.rowid = r.id
+            LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
+            WHERE distance_m(c.lat, c.lng, ci.location_lat, ci.location_lng) <= :radius_m
+            ORDER BY distance_m
+            """
+            statement = text(query)
+            self._statements[key] = statement
+        return statement
+    
+    def get_herd_statement(self, time_context: str) -> TextClause:
+        """Prepared herd temperature screen: every out-of-range cow in one aggregated pass"""
+        if time_context not in self.time_contexts:
+            time_context = 'current'
+        key = ('herd_health', time_context, False)
+        statement = self._statements.get(key)
+        if statement is None:
+            if time_context == 'current':
+                # One row per device in cattle_latest, so no aggregation needed
+                query = f"""
+                SELECT ci.device_id, cd.cow_name, ci.timestamp,
+                       ci.temperature AS max_temperature, ci.temperature AS min_temperature,
+                       1 AS flagged_readings
+                {self.latest_source}
+                WHERE ci.temperature > :temp_high
+                   OR (ci.temperature > 0 AND ci.temperature < :temp_low)
+                ORDER BY ci.temperature DESC
+                """
+                statement = text(query)
+            else:
+                # Filtering out-of-range readings before grouping means only
+                # flagged rows reach the GROUP BY; a cow's MAX is still its true
+                # peak when it has a fever, and its MIN the true low when chilled
+                query = f"""
+                SELECT ci.device_id, cd.cow_name, MAX(ci.timestamp) AS timestamp,
+                       MAX(ci.temperature) AS max_temperature,
+                       MIN(ci.temperature) AS min_temperature,
+                       COUNT(*) AS flagged_readings
+                {self.inference_source}
+                WHERE ci.timestamp >= :start AND ci.timestamp < :end
+                  AND (ci.temperature > :temp_high
+                       OR (ci.temperature > 0 AND ci.temperature < :temp_low))
+                GROUP BY ci.device_id
+                ORDER BY max_temperature DESC
+                """
+                statement = text(query).bindparams(
+                    bindparam('start', type_=DateTime()),
+                    bindparam('end', type_=DateTime()),
+                )
+            self._statements[key] = statement
+        return statement
+    
+    def generate_query(self, processed_query: Dict) -> Tuple[TextClause, Dict]:
+        """Generate a prepared SQL statement and its parameters from processed input"""
+        cow_id = processed_query['cow_id']
+        time_context = processed_query['time_context']
+        params = {}
+        bounds = self.query_bounds(processed_query)
+        rollup = self.uses_rollups(time_context, bounds)
+        if processed_query['metric'] == 'alerts':
+            many = len(processed_query.get('cow_ids') or ()) > 1
+            statement = self.get_alerts_statement(bool(cow_id), many)
+            if many:
+                params['cow_ids'] = list(processed_query['cow_ids'])
+                cow_id = None
+            if bounds is None:
+                # "Any alerts?" covers the last 24 hours
+                end = self.time_bounds('last_hour')[1]
+                bounds = end - timedelta(days=1), end
+        elif processed_query['metric'] == 'time_budget':
+            # Budgets need every reading in the window, so they always read raw rows
+            # (ChatEngine reads windows reaching archived days through TimeBudgetEngine)
+            many = len(processed_query.get('cow_ids') or ()) > 1
+            statement = self.get_time_budget_statement(bool(cow_id), many)
+            if many:
+                params['cow_ids'] = list(processed_query['cow_ids'])
+                cow_id = None
+            # "How long has she grazed?" covers today so far
+            bounds = bounds or self.time_bounds('today')
+        elif processed_query.get('scope') == 'herd' and processed_query['metric'] in self.herd_metrics:
+            statement = self.get_herd_statement(time_context)
+            params.update(temp_high=self.temp_high, temp_low=self.temp_low)
+        elif processed_query['metric'] == 'geofence':
+            # Geofence and proximity questions are about current positions
+            statement = self.get_geofence_statement(processed_query['geofence_side'], bool(cow_id))
+            params['geofence'] = processed_query['geofence']
+            bounds = None
+        elif processed_query['metric'] == 'proximity' and cow_id:
+            statement = self.get_proximity_statement()
+            radius_m = processed_query['radius_m']
+            params.update(radius_m=radius_m, dlat=1.01 * radius_m / METERS_PER_DEGREE)
+            bounds = None
+        elif len(processed_query.get('cow_ids') or ()) > 1:
+            # "Compare cow-101, cow-102 and cow-104": every cow in one statement
+            statement = self.get_comparison_statement(processed_query['metric'], time_context, rollup)
+            params['cow_ids'] = list(processed_query['cow_ids'])
+            if processed_query['metric'] == 'activity':
+                bounds = bounds or self.time_bounds('last_hour')
+            elif rollup:
+                params.update(self.rollup_bounds(*bounds))
+                bounds = None
+            cow_id = None
+        elif processed_query['metric'] == 'activity':
+            statement = self.get_activity_statement(bool(cow_id))
+            # "How active is she?" covers the last hour of movement
+            bounds = bounds or self.time_bounds('last_hour')
+        elif rollup and processed_query['metric'] in self.rollup_metrics:
+            statement = self.get_summary_statement(bool(cow_id))
+            params.update(self.rollup_bounds(*bounds))
+            bounds = None
         else:
-            query = self.base_query
+            statement = self.get_statement(processed_query['metric'], time_context, bool(cow_id))
         
-        query += " ORDER BY ci.timestamp DESC LIMIT 10"
-        return query
\ No newline at end of file
+        if cow_id:
+            params['cow_id'] = cow_id
+        if bounds:
+            params['start'], params['end'] = bounds
+        return statement, params
@@ -0,0 +1,144 @@
+import re
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'twelve': 12, 'twenty four': 24,
+}
+UNITS = {
+    'minute': timedelta(minutes=1), 'min': timedelta(minutes=1),
+    'hour': timedelta(hours=1), 'hr': timedelta(hours=1), 'h': timedelta(hours=1),
+    'day': timedelta(days=1), 'week': timedelta(weeks=1),
+}
+
+class TimeWindow(NamedTuple):
+    """A resolved half-open [start, end) range in local time, with a label for answers"""
+    start: datetime
+    end: datetime
+    label: str
+
+class TimeExpressionParser:
+    """Resolve free-text time expressions to absolute [start, end) bounds.
+    
+    Understands rolling windows ("last 3 days", "past 30 minutes"), open
+    ranges ("since 6am", "since Monday"), closed ranges ("between Monday and
+    Wednesday", "from 6am to 9:30am") and single days ("on Tuesday",
+    "2025-07-01"). Days are whole local days, clock times name the most
+    recent such time, and a day at the end of a range is included in full.
+    Fixed phrases like "yesterday" or "last hour" are left to the keyword
+    contexts, so parse() returns None for them.
+    """
+    
+    def __init__(self):
+        number = '|'.join(sorted(map(re.escape, NUMBER_WORDS), key=len, reverse=True))
+        unit = r'(minute|min|hour|hr|h|day|week)s?'
+        clock = r'\d{1,2}(?::\d{2})?\s*(?:am|pm)|\d{1,2}:\d{2}|noon|midnight'
+        day = rf"{'|'.join(WEEKDAYS)}|today|yesterday|\d{{4}}-\d{{2}}-\d{{2}}"
+        self.point_pattern = rf'(?:{clock}|{day})'
+        self.rolling_matcher = re.compile(
+            rf'\b(?:last|past|previous)\s+(\d+(?:\.\d+)?|{number})\s*{unit}\b')
+        self.between_matcher = re.compile(
+            rf'\b(?:between|from)\s+({self.point_pattern})\s+(?:and|to|until|till)\s+({self.point_pattern})\b')
+        self.since_matcher = re.compile(rf'\bsince\s+({self.point_pattern})\b')
+        self.this_week_matcher = re.compile(r'\bthis\s+week\b')
+        self.day_matcher = re.compile(rf"\b(last\s+|on\s+)?({'|'.join(WEEKDAYS)}|\d{{4}}-\d{{2}}-\d{{2}})\b")
+        self.clock_matcher = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)?$')
+        # Every expression needs one of these words, so most questions are ruled out by one search
+        self.trigger_matcher = re.compile(
+            rf"\b(?:between|from|since|last|past|previous|this\s+week|{'|'.join(WEEKDAYS)})\b|\d{{4}}-\d{{2}}-\d{{2}}")
+    
+    @staticmethod
+    def rolling_end(now: datetime) -> datetime:
+        # Rolling windows end at the next whole minute so repeat questions
+        # within a minute bind identical parameters and can hit the result cache
+        return now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    
+    def parse(self, query: str, now: datetime = None) -> Optional[TimeWindow]:
+        """The first time expression in query as a TimeWindow, or None"""
+        query = query.lower()
+        if not self.trigger_matcher.search(query):
+            return None
+        try:
+            return self._parse(query, now or datetime.now())
+        except ValueError:
+            # An impossible date ("2025-13-45") is not a time expression; the keyword context stands
+            return None
+    
+    def _parse(self, query: str, now: datetime) -> Optional[TimeWindow]:
+        end = self.rolling_end(now)
+        
+        match = self.between_matcher.search(query)
+        if match:
+            start, _ = self._resolve(match.group(1), now)
+            last_start, last_end = self._resolve(match.group(2), now)
+            if self._is_clock(match.group(2)):
+                last_end = last_start
+            while last_end <= start:
+                # "between 10pm and 2am", "from Friday to Monday": the end comes after the start
+                last_end += timedelta(days=1) if self._is_clock(match.group(2)) else timedelta(weeks=1)
+            return TimeWindow(start, last_end, f"{self._label(match.group(1))}–{self._label(match.group(2))}")
+        
+        match = self.since_matcher.search(query)
+        if match:
+            start, _ = self._resolve(match.group(1), now)
+            return TimeWindow(start, end, f"since {self._label(match.group(1))}")
+        
+        match = self.rolling_matcher.search(query)
+        if match:
+            amount, unit = match.group(1), match.group(2)
+            count = float(amount) if amount[0].isdigit() else NUMBER_WORDS[amount]
+            unit_label = {'min': 'minute', 'hr': 'hour', 'h': 'hour'}.get(unit, unit)
+            amount_label = f"{count:g} {unit_label}{'s' if count != 1 else ''}"
+            return TimeWindow(end - count * UNITS[unit], end, f"the last {amount_label}")
+        
+        if self.this_week_matcher.search(query):
+            start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            return TimeWindow(start_of_day - timedelta(days=now.weekday()), end, "this week")
+        
+        match = self.day_matcher.search(query)
+        if match:
+            start, day_end = self._resolve(match.group(2), now)
+            if match.group(1) and match.group(1).startswith('last') and start.date() == now.date():
+                # "last Monday" on a Monday means a week ago
+                start, day_end = start - timedelta(weeks=1), day_end - timedelta(weeks=1)
+            return TimeWindow(start, day_end, self._label(match.group(2)))
+        return None
+    
+    def _is_clock(self, point: str) -> bool:
+        return point in ('noon', 'midnight') or bool(self.clock_matcher.match(point))
+    
+    def _resolve(self, point: str, now: datetime) -> Tuple[datetime, datetime]:
+        """[start, end) of a point: the whole day for days, the instant for clock times"""
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if point == 'today':
+            start = start_of_day
+        elif point == 'yesterday':
+            start = start_of_day - timedelta(days=1)
+        elif point in WEEKDAYS:
+            # The most recent such day, today included
+            start = start_of_day - timedelta(days=(now.weekday() - WEEKDAYS.index(point)) % 7)
+        elif point[0].isdigit() and '-' in point:
+            start = datetime.strptime(point, '%Y-%m-%d')
+        else:
+            instant = start_of_day + self._clock_offset(point)
+            if instant > now:
+                instant -= timedelta(days=1)
+            return instant, instant
+        return start, start + timedelta(days=1)
+    
+    def _clock_offset(self, point: str) -> timedelta:
+        if point == 'noon':
+            return timedelta(hours=12)
+        if point == 'midnight':
+            return timedelta(0)
+        match = self.clock_matcher.match(point)
+        hour, minute, meridiem = int(match.group(1)) % 24, int(match.group(2) or 0), match.group(3)
+        if meridiem:
+            hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+        return timedelta(hours=hour, minutes=min(minute, 59))
+    
+    @staticmethod
+    def _label(point: str) -> str:
+        return point.capitalize() if point in WEEKDAYS else point.replace(' ', '')
@@ -0,0 +1,21 @@
+import os
+
+class Config:
+    """Application settings; each can be overridden with an environment variable"""
+    
+    # Health thresholds (°C)
+    TEMP_HIGH_THRESHOLD = float(os.getenv('TEMP_HIGH_THRESHOLD', '39.5'))
+    TEMP_LOW_THRESHOLD = float(os.getenv('TEMP_LOW_THRESHOLD', '38.0'))
+    
+    # Instrumentation: queries slower than this are logged with their EXPLAIN QUERY PLAN
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '250'))
+    # Optional Prometheus textfile path, rewritten at most every METRICS_EXPORT_SECONDS
+    METRICS_FILE = os.getenv('METRICS_FILE') or None
+    METRICS_EXPORT_SECONDS = float(os.getenv('METRICS_EXPORT_SECONDS', '15'))
+    
+    # Cold tier for readings moved out of SQLite by database/archive.py
+    # (default: a <database>_archive directory beside the database file)
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR') or None
+    
+    # Optional spaCy model (e.g. en_core_web_sm) for questions the keyword matcher is unsure about
+    NLP_MODEL = os.getenv('NLP_MODEL') or None
@@ -0,0 +1,37 @@
+"""
+Storage layer of the cattle chatbot: SQLite schema and engines, the query
+connection, ingest, the Parquet archive and the analytics built on them.
+
+Public names are re-exported lazily, so "from database import
+DatabaseConnection" imports the connection module alone, and NumPy, pandas
+and pyarrow only load with the first class that needs them.
+"""
+
+from lazy_exports import lazy_exports
+
+# Public name -> submodule that defines it; the schema, connection and
+# registry need only SQLAlchemy, the rest bring in NumPy, pandas or pyarrow
+_EXPORTS = {
+    'Alert': 'anomaly',
+    'AnomalyDetector': 'anomaly',
+    'ArchiveCompactor': 'archive',
+    'ReadingArchive': 'archive',
+    'QueryResultCache': 'cache',
+    'DatabaseConnection': 'connection',
+    'get_reader_engine': 'engines',
+    'get_writer_engine': 'engines',
+    'AccelerometerFeatureExtractor': 'features',
+    'BulkIngestor': 'ingest',
+    'IngestStats': 'ingest',
+    'run_migrations': 'models',
+    'Device': 'registry',
+    'DeviceRegistry': 'registry',
+    'get_device_registry': 'registry',
+    'ResultRows': 'rows',
+    'SyntheticHerd': 'synthetic',
+    'TimeBudget': 'time_budget',
+    'TimeBudgetEngine': 'time_budget',
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
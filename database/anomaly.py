@@ -0,0 +1,246 @@
+"""
+anomaly.py - Online per-cow anomaly detection on ingested readings
+
+Keeps an exponentially weighted mean and variance of every device's
+temperature, activity level and acceleration magnitude in NumPy arrays (one
+row per device) and updates them in O(1) per reading as batches are
+ingested. Until a device has 1/alpha readings each reading weighs 1/n,
+which makes the update exactly Welford's running mean and variance; after
+that old readings fade out, so the baseline follows slow drifts but a
+fever still stands out against it.
+
+A reading more than z_threshold standard deviations from its device's
+baseline raises an Alert once that baseline has min_samples readings, at
+most once per device and metric per cooldown. Deviations are clipped to the
+threshold before they update the baseline, so a long episode is absorbed
+slowly instead of resetting it. BulkIngestor and the synthetic herd loader
+write the alerts to cattle_alerts and the state to cattle_anomaly_state in
+the same transaction as the readings, and backfill_baselines learns them
+for readings inserted any other way (the sample data); the chatbot answers
+"any alerts today?" from that table.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .models import ANOMALY_METRICS
+
+# Standard deviation floor per metric (°C, activity fraction, g), so a very
+# steady baseline does not turn measurement noise into alerts
+MIN_STD = np.array([0.1, 0.05, 0.02])
+
+STATE_FIELDS = ('count', 'mean', 'var')
+STATE_COLUMNS = tuple(f"{metric}_{field}" for metric in ANOMALY_METRICS for field in STATE_FIELDS + ('last_alert',))
+
+STATE_UPSERT_SQL = (
+    f"INSERT OR REPLACE INTO cattle_anomaly_state (device_id, {', '.join(STATE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in range(len(STATE_COLUMNS) + 1))})"
+)
+STATE_SELECT_SQL = f"SELECT device_id, {', '.join(STATE_COLUMNS)} FROM cattle_anomaly_state"
+# Readings in arrival order, for learning baselines from stored data
+BACKFILL_SELECT_SQL = (
+    "SELECT device_id, timestamp, temperature, activity_level, AccX, AccY, AccZ FROM cattle_inference "
+    "WHERE device_id IS NOT NULL AND timestamp IS NOT NULL ORDER BY timestamp, id"
+)
+ALERT_INSERT_SQL = (
+    "INSERT INTO cattle_alerts (device_id, timestamp, metric, value, expected, std, zscore, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+@dataclass(frozen=True)
+class Alert:
+    """One reading far outside its device's usual range"""
+    device_id: str
+    timestamp: str
+    metric: str
+    value: float
+    expected: float
+    std: float
+    zscore: float
+    
+    def row(self, created_at: str) -> tuple:
+        """Parameter tuple for ALERT_INSERT_SQL"""
+        return (self.device_id, self.timestamp, self.metric, self.value, self.expected,
+                self.std, self.zscore, created_at)
+
+
+def _seconds(timestamp: str) -> float:
+    return datetime.fromisoformat(str(timestamp)).timestamp()
+
+
+class AnomalyDetector:
+    """Per-device EWMA baselines in (devices x metrics) arrays, updated batch by batch"""
+    
+    def __init__(self, alpha: float = 0.02, z_threshold: float = 5.0, min_samples: int = 24,
+                 cooldown: timedelta = timedelta(hours=1), capacity: int = 64):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.cooldown_seconds = cooldown.total_seconds()
+        self.slots: Dict[str, int] = {}
+        self.device_ids: List[str] = []
+        shape = (capacity, len(ANOMALY_METRICS))
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        # Epoch seconds of the last alert per device and metric (-inf: never)
+        self.last_alert = np.full(shape, -np.inf)
+    
+    def __len__(self) -> int:
+        return len(self.device_ids)
+    
+    def _slots_for(self, device_ids: Sequence[str]) -> np.ndarray:
+        """Array rows for the devices, adding (and growing the arrays for) new ones"""
+        slots = np.empty(len(device_ids), dtype=np.int64)
+        for i, device_id in enumerate(device_ids):
+            slot = self.slots.get(device_id)
+            if slot is None:
+                slot = self.slots[device_id] = len(self.device_ids)
+                self.device_ids.append(device_id)
+            slots[i] = slot
+        if len(self.device_ids) > len(self.count):
+            grow = max(len(self.device_ids), 2 * len(self.count)) - len(self.count)
+            self.count = np.concatenate([self.count, np.zeros((grow, self.count.shape[1]), dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros((grow, self.mean.shape[1]))])
+            self.var = np.concatenate([self.var, np.zeros((grow, self.var.shape[1]))])
+            self.last_alert = np.concatenate([self.last_alert, np.full((grow, self.last_alert.shape[1]), -np.inf)])
+        return slots
+    
+    def observe(self, device_ids: Sequence[str], timestamps: Sequence[str], values: np.ndarray) -> List[Alert]:
+        """Score readings against their baselines, then fold them in; returns the alerts raised.
+        
+        values holds one row per reading and one column per ANOMALY_METRICS
+        entry, NaN where a reading lacks that measurement. Readings are taken
+        in timestamp order per device; each round of the loop updates every
+        device that still has readings once, so the work is vectorized across
+        the devices in the batch.
+        """
+        values = np.asarray(values, dtype=float).reshape(-1, len(ANOMALY_METRICS))
+        if not len(values):
+            return []
+        slots = self._slots_for(device_ids)
+        order = np.lexsort((np.asarray(timestamps, dtype=str), slots))
+        sorted_slots = slots[order]
+        starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        
+        alerts = []
+        for round_number in range(rank.max() + 1):
+            rows = order[rank == round_number]
+            slot = slots[rows]
+            x = values[rows]
+            valid = ~np.isnan(x)
+            count, mean = self.count[slot], self.mean[slot]
+            std = np.sqrt(np.maximum(self.var[slot], MIN_STD ** 2))
+            deviation = np.where(valid, x - mean, 0.0)
+            zscore = deviation / std
+            flagged = valid & (count >= self.min_samples) & (np.abs(zscore) >= self.z_threshold)
+            if flagged.any():
+                alerts += self._alerts(rows, slot, flagged, x, mean, std, zscore, device_ids, timestamps)
+            
+            # Welford while n < 1/alpha, EWMA after; clipped deviations keep an episode from resetting the baseline
+            count = count + valid
+            weight = np.where(valid, np.maximum(1.0 / np.maximum(count, 1), self.alpha), 0.0)
+            limit = np.where(count > self.min_samples, self.z_threshold * std, np.inf)
+            step = np.clip(deviation, -limit, limit)
+            self.count[slot] = count
+            self.mean[slot] = mean + weight * step
+            self.var[slot] = (1.0 - weight) * (self.var[slot] + weight * step * step)
+        return alerts
+    
+    def _alerts(self, rows, slot, flagged, x, mean, std, zscore, device_ids, timestamps) -> List[Alert]:
+        alerts = []
+        for i, j in zip(*np.nonzero(flagged)):
+            timestamp = timestamps[rows[i]]
+            seconds = _seconds(timestamp)
+            if seconds - self.last_alert[slot[i], j] < self.cooldown_seconds:
+                continue
+            self.last_alert[slot[i], j] = seconds
+            alerts.append(Alert(device_ids[rows[i]], str(timestamp), ANOMALY_METRICS[j], float(x[i, j]),
+                                float(mean[i, j]), float(std[i, j]), float(zscore[i, j])))
+        return alerts
+    
+    def baseline(self, device_id: str) -> Optional[Dict[str, Dict[str, float]]]:
+        """{metric: {count, mean, std}} for a device, or None if it was never seen"""
+        slot = self.slots.get(device_id)
+        if slot is None:
+            return None
+        return {
+            metric: {'count': int(self.count[slot, j]), 'mean': float(self.mean[slot, j]),
+                     'std': float(np.sqrt(self.var[slot, j]))}
+            for j, metric in enumerate(ANOMALY_METRICS)
+        }
+    
+    def state_rows(self, device_ids: Optional[Iterable[str]] = None) -> List[tuple]:
+        """Parameter tuples for STATE_UPSERT_SQL (all devices, or just the given ones)"""
+        rows = []
+        for device_id in (self.device_ids if device_ids is None else device_ids):
+            slot = self.slots[device_id]
+            row = [device_id]
+            for j in range(len(ANOMALY_METRICS)):
+                last_alert = self.last_alert[slot, j]
+                row += [int(self.count[slot, j]), float(self.mean[slot, j]), float(self.var[slot, j]),
+                        None if np.isinf(last_alert) else float(last_alert)]
+            rows.append(tuple(row))
+        return rows
+    
+    def load_state(self, rows: Iterable[Sequence]):
+        """Restore baselines from STATE_SELECT_SQL rows"""
+        rows = list(rows)
+        slots = self._slots_for([row[0] for row in rows])
+        width = len(STATE_FIELDS) + 1
+        for slot, row in zip(slots, rows):
+            for j in range(len(ANOMALY_METRICS)):
+                count, mean, var, last_alert = row[1 + j * width:1 + (j + 1) * width]
+                self.count[slot, j], self.mean[slot, j], self.var[slot, j] = count or 0, mean or 0.0, var or 0.0
+                self.last_alert[slot, j] = -np.inf if last_alert is None else last_alert
+    
+    @classmethod
+    def from_connection(cls, conn, **kwargs) -> 'AnomalyDetector':
+        """A detector resuming from the baselines saved in cattle_anomaly_state"""
+        detector = cls(**kwargs)
+        detector.load_state(conn.execute(STATE_SELECT_SQL).fetchall())
+        return detector
+
+
+def reading_metrics(temperature: Sequence, activity: Sequence, acc: np.ndarray) -> np.ndarray:
+    """(readings x ANOMALY_METRICS) values: temperature, activity level, acceleration magnitude"""
+    acc = np.asarray(acc, dtype=float).reshape(-1, 3)
+    return np.column_stack([
+        np.asarray(temperature, dtype=float),
+        np.asarray(activity, dtype=float),
+        np.sqrt(np.einsum('ij,ij->i', acc, acc)),
+    ])
+
+
+def backfill_baselines(conn, chunk_size: int = 50000, **kwargs) -> int:
+    """Learn baselines from readings that never went through a detector, returning the alert count.
+    
+    Replays every stored reading in timestamp order on a SQLAlchemy
+    connection, storing the alerts raised and the final state. Run it once on
+    a database filled without BulkIngestor; readings already folded into
+    cattle_anomaly_state would be counted twice.
+    """
+    detector = AnomalyDetector(**kwargs)
+    detector.load_state(conn.exec_driver_sql(STATE_SELECT_SQL).fetchall())
+    created_at = datetime.now().isoformat(sep=' ', timespec='microseconds')
+    result = conn.exec_driver_sql(BACKFILL_SELECT_SQL)
+    alerts = 0
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        device_ids, timestamps, temperature, activity, acc_x, acc_y, acc_z = zip(*rows)
+        timestamps = [str(timestamp) for timestamp in timestamps]
+        values = reading_metrics(temperature, activity, np.column_stack([acc_x, acc_y, acc_z]))
+        raised = detector.observe(device_ids, timestamps, values)
+        if raised:
+            conn.exec_driver_sql(ALERT_INSERT_SQL, [alert.row(created_at) for alert in raised])
+        alerts += len(raised)
+    if len(detector):
+        conn.exec_driver_sql(STATE_UPSERT_SQL, detector.state_rows())
+    return alerts
@@ -0,0 +1,216 @@
+"""
+archive.py - Hot/cold tiering of cattle_inference into daily Parquet files
+
+Readings older than a retention window are moved out of SQLite into one
+zstd-compressed Parquet file per day (archive_dir/date=YYYY-MM-DD/readings.parquet),
+so the hot database only holds recent data. Each day is written to its file
+first and only then deleted from SQLite; archived rows keep their id, and
+re-running the job merges into an existing day file without duplicating rows.
+
+Usage:
+    python -m database.archive --older-than 30
+    python -m database.archive --older-than 7 --database big.db --archive-dir /data/cold --vacuum
+
+A day's cattle_acc_features rows are deleted with its readings, so neither
+table grows without bound. The rollup tables keep their full history
+(nothing is subtracted when raw rows leave), so summary questions over old
+periods are still answered from SQLite. DatabaseConnection.fetch_readings reads raw readings across both
+tiers, opening only the day files a time range touches.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .engines import WRITER_PRAGMAS, apply_pragmas, create_tuned_engine
+from .ingest import DEFAULT_DATABASE_PATH, format_timestamp
+from .models import run_migrations
+
+PARTITION_PREFIX = 'date='
+PARTITION_FILE = 'readings.parquet'
+COMPRESSION = 'zstd'
+
+# cattle_inference columns with timestamps as real timestamp types
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('device_id', pa.string()),
+    ('timestamp', pa.timestamp('us')),
+    ('predicted_behavior', pa.string()),
+    ('confidence', pa.float64()),
+    ('temperature', pa.float64()),
+    ('location_lat', pa.float64()),
+    ('location_lng', pa.float64()),
+    ('activity_level', pa.float64()),
+    ('AccX', pa.float64()),
+    ('AccY', pa.float64()),
+    ('AccZ', pa.float64()),
+    ('created_at', pa.timestamp('us')),
+])
+ARCHIVE_COLUMNS = tuple(ARCHIVE_SCHEMA.names)
+TIMESTAMP_COLUMNS = ('timestamp', 'created_at')
+# Hot tables emptied for each archived day; accelerometer features can be
+# recomputed from the archived AccX/AccY/AccZ, so they are not kept
+ARCHIVED_TABLES = ('cattle_inference', 'cattle_acc_features')
+
+
+def default_archive_dir(database_path: str) -> str:
+    """Archive directory beside a database file: cattle_monitoring.db -> cattle_monitoring_archive/"""
+    return f"{os.path.splitext(database_path)[0]}_archive"
+
+
+def to_archive_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """cattle_inference rows with text timestamps parsed, in archive column order"""
+    frame = frame.reindex(columns=ARCHIVE_COLUMNS)
+    for column in TIMESTAMP_COLUMNS:
+        frame[column] = pd.to_datetime(frame[column], format='ISO8601').astype('datetime64[us]')
+    return frame
+
+
+@dataclass
+class ArchiveStats:
+    """Counters for one compaction run"""
+    rows: int = 0
+    partitions: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+
+
+class ReadingArchive:
+    """The cold tier: one Parquet file of readings per day"""
+    
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+    
+    def partition_path(self, day) -> str:
+        return os.path.join(self.archive_dir, f"{PARTITION_PREFIX}{day:%Y-%m-%d}", PARTITION_FILE)
+    
+    def days(self) -> List[datetime]:
+        """Start of every archived day, oldest first"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        days = []
+        for name in os.listdir(self.archive_dir):
+            if name.startswith(PARTITION_PREFIX) and os.path.exists(os.path.join(self.archive_dir, name, PARTITION_FILE)):
+                days.append(datetime.strptime(name[len(PARTITION_PREFIX):], '%Y-%m-%d'))
+        return sorted(days)
+    
+    def horizon(self) -> Optional[datetime]:
+        """End of the newest archived day; readings from here on are only in SQLite"""
+        days = self.days()
+        return days[-1] + timedelta(days=1) if days else None
+    
+    def partitions(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """Files of the days overlapping [start, end); the rest are never opened"""
+        return [
+            self.partition_path(day) for day in self.days()
+            if (start is None or day + timedelta(days=1) > start) and (end is None or day < end)
+        ]
+    
+    def write_day(self, day: datetime, frame: pd.DataFrame) -> int:
+        """Merge one day's rows into its file (atomically replaced), returning the file size"""
+        path = self.partition_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame = to_archive_frame(frame)
+        if os.path.exists(path):
+            # Rows already archived by an interrupted run keep their first copy
+            frame = pd.concat([pq.read_table(path).to_pandas(), frame], ignore_index=True)
+            frame = frame.drop_duplicates('id', keep='first')
+        table = pa.Table.from_pandas(frame.sort_values(['device_id', 'timestamp']), schema=ARCHIVE_SCHEMA,
+                                     preserve_index=False)
+        temp_path = f"{path}.tmp"
+        pq.write_table(table, temp_path, compression=COMPRESSION)
+        os.replace(temp_path, path)
+        return os.path.getsize(path)
+    
+    def read(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+             device_ids: Optional[Sequence[str]] = None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Archived readings in [start, end), optionally for some devices only"""
+        columns = list(columns or ARCHIVE_COLUMNS)
+        paths = self.partitions(start, end)
+        if not paths:
+            return pd.DataFrame({column: pd.Series(dtype=ARCHIVE_SCHEMA.field(column).type.to_pandas_dtype())
+                                 for column in columns})
+        filters = []
+        if start is not None:
+            filters.append(('timestamp', '>=', start))
+        if end is not None:
+            filters.append(('timestamp', '<', end))
+        if device_ids is not None:
+            filters.append(('device_id', 'in', list(device_ids)))
+        table = pq.read_table(paths, columns=columns, filters=filters or None, schema=ARCHIVE_SCHEMA)
+        return table.to_pandas()
+
+
+class ArchiveCompactor:
+    """Moves readings older than a cutoff from cattle_inference into the archive, a day at a time"""
+    
+    def __init__(self, database_path: Optional[str] = None, archive_dir: Optional[str] = None):
+        self.database_path = database_path or DEFAULT_DATABASE_PATH
+        self.archive = ReadingArchive(archive_dir or default_archive_dir(self.database_path))
+    
+    def connect(self) -> sqlite3.Connection:
+        engine = create_tuned_engine(self.database_path)
+        run_migrations(engine)
+        engine.dispose()
+        conn = sqlite3.connect(self.database_path)
+        apply_pragmas(conn, WRITER_PRAGMAS)
+        return conn
+    
+    def compact(self, older_than_days: float, now: datetime = None, vacuum: bool = False) -> ArchiveStats:
+        """Archive every whole day that ended more than older_than_days ago"""
+        now = now or datetime.now()
+        # Whole days only, so each partition is written once per run and never split
+        cutoff = (now - timedelta(days=older_than_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        stats = ArchiveStats()
+        started = time.perf_counter()
+        conn = self.connect()
+        try:
+            days = [row[0] for row in conn.execute(
+                "SELECT DISTINCT substr(timestamp, 1, 10) FROM cattle_inference "
+                "WHERE timestamp < ? ORDER BY 1", (format_timestamp(cutoff),))]
+            for day_text in days:
+                day = datetime.strptime(day_text, '%Y-%m-%d')
+                bounds = (format_timestamp(day), format_timestamp(day + timedelta(days=1)))
+                frame = pd.read_sql_query(
+                    "SELECT * FROM cattle_inference WHERE timestamp >= ? AND timestamp < ?", conn, params=bounds)
+                stats.bytes_written += self.archive.write_day(day, frame)
+                # The file is durable before the hot rows go, together with their features
+                with conn:
+                    for table in ARCHIVED_TABLES:
+                        conn.execute(f"DELETE FROM {table} WHERE timestamp >= ? AND timestamp < ?", bounds)
+                stats.rows += len(frame)
+                stats.partitions += 1
+            if vacuum and days:
+                conn.execute("VACUUM")
+                # In WAL mode the file only shrinks once the WAL is checkpointed
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old cattle_inference readings into daily Parquet files")
+    parser.add_argument('--older-than', type=float, default=30, help="Archive whole days older than this many days")
+    parser.add_argument('--database', default=DEFAULT_DATABASE_PATH, help="SQLite database path")
+    parser.add_argument('--archive-dir', default=None, help="Archive directory (default: <database>_archive)")
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM afterwards to shrink the database file")
+    args = parser.parse_args(argv)
+    
+    compactor = ArchiveCompactor(args.database, args.archive_dir)
+    print(f"🗄️ Archiving readings older than {args.older_than:g} days to {compactor.archive.archive_dir}...")
+    stats = compactor.compact(args.older_than, vacuum=args.vacuum)
+    print(f"✅ {stats.rows:,} rows in {stats.partitions} daily files "
+          f"({stats.bytes_written / 1024 / 1024:.1f} MiB), {stats.seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class QueryResultCache:
+    """Bounded LRU + TTL cache of query results, invalidated by a data version.
+    
+    Every lookup passes the database's current data version; when it differs
+    from the version the cached entries were stored under, the whole cache is
+    dropped, so a result is never served after new readings have arrived.
+    Cached results are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def make_key(query, params: Dict = None) -> Tuple:
+        """Key on whitespace-normalized SQL plus the sorted bound parameters"""
+        sql = query if isinstance(query, str) else query.text
+        # Expanding IN parameters arrive as lists; key on them as tuples
+        items = ((name, tuple(value) if isinstance(value, list) else value)
+                 for name, value in (params or {}).items())
+        return " ".join(sql.split()), tuple(sorted(items))
+    
+    def _sync_version(self, version: Hashable):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._version = version
+    
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """Return the cached result for key, or None on a miss"""
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Hashable, version: Hashable, value: Any):
+        """Store a result computed at the given data version"""
+        with self._lock:
+            self._sync_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, eviction and invalidation counters plus current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+            }
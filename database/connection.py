@@ -1,39 +1,245 @@
-import pandas as pd
-import streamlit as st
-from sqlalchemy import create_engine, text
+import asyncio
+import logging
+from sqlalchemy import DateTime, bindparam, text
 import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+from config import Config
+from instrumentation import log_event, metrics
+from .cache import QueryResultCache
+from .engines import get_reader_engine, get_writer_engine
+from .registry import DeviceRegistry, get_device_registry
+from .rows import ResultRows
+
+if TYPE_CHECKING:
+    # pandas is imported on first use; the chat path never builds a DataFrame
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
 
 class DatabaseConnection:
-    def __init__(self):
+    def __init__(self, database_path: str = None, cache_size: int = 256, cache_ttl: float = 300.0,
+                 max_workers: int = 8, slow_query_ms: float = None, archive_dir: str = None):
         # SQLite database path
-        self.database_path = os.path.join(os.path.dirname(__file__), 'cattle_monitoring.db')
+        self.database_path = database_path or os.path.join(os.path.dirname(__file__), 'cattle_monitoring.db')
         self.engine = None
+        # Repeated questions are answered from here until the data changes
+        self.cache = QueryResultCache(max_entries=cache_size, ttl_seconds=cache_ttl)
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        # Bounded pool for the async API; SQLite releases the GIL while it steps
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Queries at least this slow are logged with their query plan
+        self.slow_query_ms = Config.SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        # Cold tier of old readings (archive.py); None means beside the database file
+        self.archive_dir = archive_dir or Config.ARCHIVE_DIR
+        self._archive = None
     
-    @st.cache_resource
-    def get_engine(_self):
-        """Get cached SQLAlchemy engine"""
+    def get_engine(self):
+        """Shared read-only engine (a pool of max_workers connections), or None if unavailable"""
         try:
-            engine = create_engine(f'sqlite:///{_self.database_path}')
-            return engine
+            return get_reader_engine(self.database_path, self.max_workers)
         except Exception as e:
-            st.error(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
             return None
     
-    def execute_query(self, query: str) -> pd.DataFrame:
-        """Execute SQL query using text() and return DataFrame"""
+    @property
+    def devices(self) -> DeviceRegistry:
+        """Process-wide in-memory registry of this database's devices"""
+        return get_device_registry(self.database_path)
+    
+    @property
+    def archive(self):
+        """The Parquet archive of old readings (pyarrow is only imported once this is used)"""
+        if self._archive is None:
+            from .archive import ReadingArchive, default_archive_dir
+            self._archive = ReadingArchive(self.archive_dir or default_archive_dir(self.database_path))
+        return self._archive
+    
+    def archive_horizon(self) -> Optional[datetime]:
+        """End of the newest archived day, or None when nothing is archived.
+        
+        Statements on cattle_inference only see readings from here on.
+        """
         try:
-            engine = self.get_engine()
+            return self.archive.horizon()
+        except ImportError:  # without pyarrow nothing can have been archived
+            return None
+    
+    def get_writer_engine(self):
+        """Shared single-connection writer engine for statements that modify data"""
+        return get_writer_engine(self.database_path)
+    
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Thread pool that runs SQLite work for the async API, created on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sqlite')
+            return self._executor
+    
+    async def run_in_pool(self, func, *args, **kwargs):
+        """Await a blocking database call on the bounded thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get_executor(), partial(func, *args, **kwargs))
+    
+    def get_data_version(self) -> int:
+        """Return PRAGMA data_version from a connection that never writes.
+        
+        The value changes whenever any other connection commits, which makes
+        it a constant-time staleness check for cached results.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(self.database_path, check_same_thread=False)
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Result cache hit/miss/eviction counters"""
+        return self.cache.stats()
+    
+    def execute_query(self, query, params: Dict = None, use_cache: bool = True) -> 'pd.DataFrame':
+        """Execute SQL (a string or prepared text() statement) with bound params and return DataFrame"""
+        return self._execute(query, params, use_cache, as_frame=True)
+    
+    def fetch_rows(self, query, params: Dict = None, use_cache: bool = True) -> ResultRows:
+        """Like execute_query, but return plain ResultRows without building a DataFrame.
+        
+        The chat path reads a handful of rows per question; DataFrames are for
+        analytics and exports.
+        """
+        return self._execute(query, params, use_cache, as_frame=False)
+    
+    def fetch_readings(self, start: datetime = None, end: datetime = None,
+                       device_ids: Sequence[str] = None, columns: Sequence[str] = None) -> 'pd.DataFrame':
+        """Raw readings in [start, end) from both tiers: cattle_inference and the Parquet archive.
+        
+        Only the archive's day files that overlap the range are opened, and
+        none when the range starts after the newest archived day. Rows are
+        returned oldest first with parsed timestamps; columns limits what is
+        read from either tier.
+        """
+        import pandas as pd
+        from .archive import to_archive_frame
+        conditions, params, binds = [], {}, []
+        if start is not None:
+            conditions.append("timestamp >= :start")
+            params['start'] = start
+            binds.append(bindparam('start', type_=DateTime()))
+        if end is not None:
+            conditions.append("timestamp < :end")
+            params['end'] = end
+            binds.append(bindparam('end', type_=DateTime()))
+        if device_ids is not None:
+            conditions.append("device_id IN :device_ids")
+            params['device_ids'] = list(device_ids)
+            binds.append(bindparam('device_ids', expanding=True))
+        # id and timestamp are always read, to merge the tiers
+        selected = list(dict.fromkeys(['id', 'timestamp', *columns])) if columns else None
+        query = f"SELECT {', '.join(selected) if selected else '*'} FROM cattle_inference"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        statement = text(query).bindparams(*binds)
+        hot = to_archive_frame(self.execute_query(statement, params))
+        cold = self.archive.read(start, end, device_ids, selected)
+        if cold.empty:
+            readings = hot
+        else:
+            # A compaction interrupted between writing a day and deleting it leaves rows in both tiers
+            readings = pd.concat([cold, hot], ignore_index=True).drop_duplicates('id', keep='last')
+        readings = readings.sort_values(['timestamp', 'id'], ignore_index=True)
+        return readings[list(columns)] if columns else readings
+    
+    def _execute(self, query, params: Dict, use_cache: bool, as_frame: bool):
+        started = time.perf_counter()
+        cache_outcome = 'off'
+        if as_frame:
+            import pandas as pd
+        empty = pd.DataFrame if as_frame else ResultRows
+        try:
+            statement = text(query) if isinstance(query, str) else query
+            reads = statement.text.lstrip().upper().startswith(('SELECT', 'WITH', 'EXPLAIN'))
+            engine = self.get_engine() if reads else self.get_writer_engine()
             if engine:
+                cacheable = use_cache and reads and not statement.text.lstrip().upper().startswith('EXPLAIN')
+                if cacheable:
+                    cache_key = (as_frame,) + self.cache.make_key(statement, params)
+                    version = self.get_data_version()
+                    cached = self.cache.get(cache_key, version)
+                    if cached is not None:
+                        self._record_query(started, 'hit', len(cached))
+                        return cached
+                    cache_outcome = 'miss'
                 with engine.connect() as conn:
-                    result = conn.execute(text(query))
-                    # Convert to DataFrame
-                    df = pd.DataFrame(result.fetchall(), columns=result.keys())
-                    return df
+                    result = conn.execute(statement, params or {})
+                    columns = tuple(result.keys()) if result.returns_rows else ()
+                    rows = result.fetchall() if result.returns_rows else []
+                    if not reads:
+                        conn.commit()
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    if elapsed_ms >= self.slow_query_ms:
+                        self._log_slow_query(conn, statement, params, elapsed_ms, len(rows))
+                output = pd.DataFrame(rows, columns=columns) if as_frame else ResultRows(columns, rows)
+                if cacheable:
+                    self.cache.put(cache_key, version, output)
+                self._record_query(started, cache_outcome, len(rows))
+                return output
             else:
-                return pd.DataFrame()
+                return empty()
         except Exception as e:
-            st.error(f"Query execution error: {e}")
-            return pd.DataFrame()
+            logger.error("Query execution error: %s", e)
+            metrics.inc('cattle_query_errors_total')
+            return empty()
+    
+    def _record_query(self, started: float, cache_outcome: str, rows: int):
+        """Observe one execute_query call: latency by cache outcome, rows and hit/miss counts"""
+        seconds = time.perf_counter() - started
+        metrics.observe('cattle_query_seconds', seconds, cache=cache_outcome)
+        metrics.inc('cattle_query_rows_total', rows)
+        if cache_outcome == 'hit':
+            metrics.inc('cattle_query_cache_hits_total')
+        elif cache_outcome == 'miss':
+            metrics.inc('cattle_query_cache_misses_total')
+        log_event('query', logging.DEBUG, ms=round(seconds * 1000, 3), rows=rows, cache=cache_outcome)
+    
+    def _log_slow_query(self, conn, statement, params: Dict, elapsed_ms: float, rows: int):
+        """Log a slow query with its EXPLAIN QUERY PLAN, run on the same connection"""
+        metrics.inc('cattle_slow_queries_total')
+        try:
+            plan = [row[-1] for row in conn.execute(*self._explain_statement(statement, params))]
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {e}"]
+        log_event('slow_query', logging.WARNING, ms=round(elapsed_ms, 3), rows=rows,
+                  threshold_ms=self.slow_query_ms, sql=" ".join(statement.text.split()),
+                  params=params or {}, plan=plan)
+    
+    async def execute_query_async(self, query, params: Dict = None, use_cache: bool = True) -> 'pd.DataFrame':
+        """Async execute_query: runs on the bounded thread pool instead of blocking the event loop"""
+        return await self.run_in_pool(self.execute_query, query, params, use_cache)
+    
+    async def fetch_rows_async(self, query, params: Dict = None, use_cache: bool = True) -> ResultRows:
+        """Async fetch_rows on the bounded thread pool"""
+        return await self.run_in_pool(self.fetch_rows, query, params, use_cache)
+    
+    @staticmethod
+    def _explain_statement(query, params: Dict = None):
+        """EXPLAIN QUERY PLAN statement and parameters for a query; list parameters stay IN lists"""
+        sql = query if isinstance(query, str) else query.text
+        params = {key: [str(item) for item in value] if isinstance(value, (list, tuple)) else str(value)
+                  for key, value in (params or {}).items()}
+        statement = text(f"EXPLAIN QUERY PLAN {sql}").bindparams(
+            *[bindparam(key, expanding=True) for key, value in params.items() if isinstance(value, list)])
+        return statement, params
+    
+    def explain_query(self, query, params: Dict = None) -> 'pd.DataFrame':
+        """Return the EXPLAIN QUERY PLAN rows for a query"""
+        return self.execute_query(*self._explain_statement(query, params))
     
     def test_connection(self) -> bool:
         """Test database connection"""
@@ -46,14 +252,15 @@ class DatabaseConnection:
                     return count > 0
             return False
         except Exception as e:
-            st.error(f"Connection test failed: {e}")
+            logger.error("Connection test failed: %s", e)
             return False
     
-    def get_available_cows(self) -> pd.DataFrame:
-        """Get list of available cows"""
-        query = """
-        SELECT device_id, cow_name
-        FROM cattle_devices
-        ORDER BY device_id
-        """
-        return self.execute_query(query)
\ No newline at end of file
+    def get_available_cows(self) -> 'pd.DataFrame':
+        """Get list of available cows (from the device registry, not a query)"""
+        import pandas as pd
+        return pd.DataFrame([(device.device_id, device.cow_name) for device in self.devices.devices()],
+                            columns=['device_id', 'cow_name'])
+    
+    async def get_available_cows_async(self) -> 'pd.DataFrame':
+        """Async get_available_cows"""
+        return await self.run_in_pool(self.get_available_cows)
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+engines.py - The one place SQLite engines are created and tuned
+
+Every entry point (the chatbot's DatabaseConnection, view.py exports and the
+models.py sample-data script) gets its engine here, so all of them share the
+same pragmas:
+
+    writer   WAL journal, synchronous=NORMAL, a single pooled connection
+             (SQLite allows one writer at a time anyway)
+    readers  read-only (mode=ro, query_only) connections in a pool sized for
+             the chat thread pool; in WAL mode they read the last committed
+             snapshot and never wait for, or block, a writer
+
+Both get busy_timeout, a memory-mapped read path (mmap_size) and a larger
+page cache, and have the geo SQL functions registered.
+"""
+
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+try:
+    from .geo import register_geo_functions
+except ImportError:  # run as a script from the database directory
+    from geo import register_geo_functions
+
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+READER_POOL_SIZE = 8
+
+# WAL lets readers keep going during a write, NORMAL synchronous is durable
+# across application crashes in WAL mode, and a larger page cache keeps the
+# index B-trees hot across ingest batches
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# journal_mode is persistent in the file; readers only tune their own connection
+READER_PRAGMAS = (
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    "PRAGMA cache_size = -16384",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA query_only = 1",
+)
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Run pragma statements on a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in pragmas:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def create_tuned_engine(database_path: str, read_only: bool = False,
+                        pool_size: int = READER_POOL_SIZE) -> Engine:
+    """New engine with the writer or read-only reader settings.
+    
+    A read-only engine needs the database file to exist already; use
+    get_reader_engine to have it created and migrated first.
+    """
+    if read_only:
+        engine = create_engine(
+            f"sqlite:///file:{database_path}?mode=ro&uri=true",
+            pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=False,
+        )
+        pragmas = READER_PRAGMAS
+    else:
+        engine = create_engine(f"sqlite:///{database_path}", pool_size=1, max_overflow=0, pool_timeout=60)
+        pragmas = WRITER_PRAGMAS
+    
+    def configure(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+        register_geo_functions(dbapi_connection, connection_record)
+    
+    event.listen(engine, 'connect', configure)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_writer_engine(database_path: str) -> Engine:
+    """Process-wide writer engine for a database file, schema migrated on first use"""
+    try:
+        from .models import run_migrations
+    except ImportError:  # run as a script from the database directory
+        from models import run_migrations
+    engine = create_tuned_engine(database_path)
+    run_migrations(engine)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_reader_engine(database_path: str, pool_size: int = READER_POOL_SIZE) -> Engine:
+    """Process-wide read-only engine, after the writer has created and migrated the file"""
+    get_writer_engine(database_path)
+    return create_tuned_engine(database_path, read_only=True, pool_size=pool_size)
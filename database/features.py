@@ -0,0 +1,141 @@
+"""
+features.py - Vectorized accelerometer features for collar readings
+
+Turns raw AccX/AccY/AccZ into per-reading movement features over a trailing
+window of each device's readings. A whole ingest batch, across every device
+in it, is processed in one set of NumPy operations:
+
+    magnitude       |a|, the vector magnitude of the raw acceleration (g)
+    odba            overall dynamic body acceleration, |dx| + |dy| + |dz| (g)
+    vedba           vectorial dynamic body acceleration, sqrt(dx² + dy² + dz²) (g)
+    pitch, roll     posture angles of the static (gravity) component (degrees)
+    magnitude_var   rolling variance of the magnitude (g²)
+
+The static component is the trailing window mean of each axis and the
+dynamic component (dx, dy, dz) is the raw reading minus it. Results are
+stored in cattle_acc_features, keyed by cattle_inference.id.
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+DEFAULT_WINDOW = 10
+
+FEATURE_COLUMNS = ('magnitude', 'odba', 'vedba', 'pitch', 'roll', 'magnitude_var')
+
+FEATURE_INSERT_SQL = (
+    f"INSERT OR REPLACE INTO cattle_acc_features "
+    f"(inference_id, device_id, timestamp, {', '.join(FEATURE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in range(3 + len(FEATURE_COLUMNS)))})"
+)
+
+# Readings with accelerometer data but no features yet, in window order
+BACKFILL_SELECT = """
+SELECT ci.id, ci.device_id, ci.timestamp, ci.AccX, ci.AccY, ci.AccZ
+FROM cattle_inference ci
+WHERE ci.AccX IS NOT NULL AND ci.AccY IS NOT NULL AND ci.AccZ IS NOT NULL
+  AND ci.device_id IS NOT NULL AND ci.timestamp IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM cattle_acc_features f WHERE f.inference_id = ci.id)
+ORDER BY ci.device_id, ci.timestamp, ci.id
+"""
+
+
+def grouped_rolling_mean(values: np.ndarray, group_start: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over up to window rows that never reaches back past a row's group start"""
+    idx = np.arange(len(values))
+    lower = np.maximum(idx - window + 1, group_start)
+    sums = np.cumsum(values, axis=0)
+    sums = np.concatenate([np.zeros((1,) + values.shape[1:]), sums])
+    counts = (idx - lower + 1).reshape((-1,) + (1,) * (values.ndim - 1))
+    return (sums[idx + 1] - sums[lower]) / counts
+
+
+class AccelerometerFeatureExtractor:
+    """Batch feature computation that carries each device's window across batches.
+    
+    Readings are windowed per device in timestamp order within a batch; the
+    last window - 1 readings of every device are kept so the next batch
+    continues the same windows. A device's first readings use a shorter window.
+    """
+    
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._tails: Dict[str, np.ndarray] = {}
+    
+    def transform(self, device_ids: Sequence[str], timestamps: Sequence[str],
+                  acc: np.ndarray) -> Dict[str, np.ndarray]:
+        """Features for each reading, aligned with the input order"""
+        acc = np.asarray(acc, dtype=float).reshape(-1, 3)
+        if not len(acc):
+            return {column: np.empty(0) for column in FEATURE_COLUMNS}
+        devices = np.asarray(device_ids, dtype=str)
+        order = np.lexsort((np.asarray(timestamps, dtype=str), devices))
+        
+        # Prepend each device's carried-over readings; the stable sort keeps
+        # them ahead of the batch and both parts in their existing order
+        carried = [device for device in np.unique(devices) if device in self._tails]
+        tail_acc = [self._tails[device] for device in carried]
+        tail_devices = np.repeat(np.asarray(carried, dtype=str), [len(tail) for tail in tail_acc])
+        ext_devices = np.concatenate([tail_devices, devices[order]])
+        ext_acc = np.concatenate(tail_acc + [acc[order]])
+        in_batch = np.concatenate([np.zeros(len(tail_devices), bool), np.ones(len(order), bool)])
+        regroup = np.argsort(ext_devices, kind='stable')
+        ext_devices, ext_acc, in_batch = ext_devices[regroup], ext_acc[regroup], in_batch[regroup]
+        
+        starts = np.flatnonzero(np.r_[True, ext_devices[1:] != ext_devices[:-1]])
+        group_start = np.repeat(starts, np.diff(np.r_[starts, len(ext_devices)]))
+        
+        static = grouped_rolling_mean(ext_acc, group_start, self.window)
+        dynamic = ext_acc - static
+        magnitude = np.sqrt(np.einsum('ij,ij->i', ext_acc, ext_acc))
+        magnitude_mean = grouped_rolling_mean(magnitude, group_start, self.window)
+        magnitude_sq_mean = grouped_rolling_mean(magnitude * magnitude, group_start, self.window)
+        features = {
+            'magnitude': magnitude,
+            'odba': np.abs(dynamic).sum(axis=1),
+            'vedba': np.sqrt(np.einsum('ij,ij->i', dynamic, dynamic)),
+            'pitch': np.degrees(np.arctan2(static[:, 0], np.hypot(static[:, 1], static[:, 2]))),
+            'roll': np.degrees(np.arctan2(static[:, 1], static[:, 2])),
+            'magnitude_var': np.maximum(magnitude_sq_mean - magnitude_mean ** 2, 0.0),
+        }
+        
+        ends = np.r_[starts[1:], len(ext_devices)]
+        for device, start, end in zip(ext_devices[starts], starts, ends):
+            self._tails[device] = ext_acc[max(start, end - self.window + 1):end]
+        
+        # Back from (device, timestamp) order to the caller's order
+        aligned = {}
+        for column, values in features.items():
+            aligned[column] = np.empty(len(order))
+            aligned[column][order] = values[in_batch]
+        return aligned
+    
+    def feature_rows(self, inference_ids: Sequence[int], device_ids: Sequence[str],
+                     timestamps: Sequence[str], acc: np.ndarray) -> list:
+        """Parameter tuples for FEATURE_INSERT_SQL"""
+        features = self.transform(device_ids, timestamps, acc)
+        columns = np.column_stack([features[column] for column in FEATURE_COLUMNS]).tolist()
+        return [
+            (inference_id, device_id, timestamp, *values)
+            for inference_id, device_id, timestamp, values in zip(inference_ids, device_ids, timestamps, columns)
+        ]
+
+
+def backfill_features(conn, window: int = DEFAULT_WINDOW, chunk_size: int = 50000) -> int:
+    """Compute features for stored readings that have none, returning the row count"""
+    extractor = AccelerometerFeatureExtractor(window)
+    result = conn.execute(text(BACKFILL_SELECT))
+    written = 0
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        ids, device_ids, timestamps, acc_x, acc_y, acc_z = zip(*rows)
+        timestamps = [str(timestamp) for timestamp in timestamps]
+        feature_rows = extractor.feature_rows(ids, device_ids, timestamps,
+                                              np.column_stack([acc_x, acc_y, acc_z]))
+        conn.exec_driver_sql(FEATURE_INSERT_SQL, feature_rows)
+        written += len(feature_rows)
+    return written
@@ -0,0 +1,37 @@
+"""
+geo.py - Distance helpers for cow location queries
+
+Registered as SQLite functions on every engine connection so proximity
+queries can prune candidates with the R*Tree bounding-box probe and compute
+exact distances for those candidates only.
+"""
+
+import math
+from typing import Optional
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> Optional[float]:
+    """Great-circle distance in meters between two WGS84 points"""
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(lng2 - lng1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def lng_degrees(meters: float, lat: float) -> Optional[float]:
+    """Longitude span of a distance at the given latitude, with 1% slack for the box edges"""
+    if meters is None or lat is None:
+        return None
+    return 1.01 * meters / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+
+
+def register_geo_functions(dbapi_connection, connection_record=None):
+    """SQLAlchemy "connect" listener adding distance_m() and lng_degrees() to SQLite"""
+    dbapi_connection.create_function('distance_m', 4, haversine_m, deterministic=True)
+    dbapi_connection.create_function('lng_degrees', 2, lng_degrees, deterministic=True)
@@ -0,0 +1,243 @@
+"""
+ingest.py - Bulk load collar sensor readings into cattle_inference
+
+Streams CSV or JSONL files (one reading per row/line) into SQLite in large
+executemany() transactions. Only one batch is held in memory at a time, so
+the footprint stays fixed no matter how big the input file is.
+
+Usage:
+    python -m database.ingest readings.csv more_readings.jsonl
+    python -m database.ingest readings.csv --batch-size 20000 --database other.db
+
+Each reading needs a device_id and timestamp; the remaining cattle_inference
+columns are optional (AccX/AccY/AccZ, temperature, predicted_behavior, ...).
+Accelerometer features (features.py) are computed for each batch and written
+in the same transaction, as are the alerts and updated baselines of the
+per-cow anomaly detector (anomaly.py).
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from .anomaly import ALERT_INSERT_SQL, STATE_UPSERT_SQL, AnomalyDetector, reading_metrics
+from .engines import WRITER_PRAGMAS, apply_pragmas, create_tuned_engine
+from .features import DEFAULT_WINDOW, FEATURE_INSERT_SQL, AccelerometerFeatureExtractor
+from .models import run_migrations
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'cattle_monitoring.db')
+
+INGEST_COLUMNS = (
+    'device_id', 'timestamp', 'predicted_behavior', 'confidence', 'temperature',
+    'location_lat', 'location_lng', 'activity_level', 'AccX', 'AccY', 'AccZ',
+)
+FLOAT_COLUMNS = frozenset(INGEST_COLUMNS[3:])
+ACC_POSITIONS = [INGEST_COLUMNS.index(column) for column in ('AccX', 'AccY', 'AccZ')]
+TEMPERATURE_POSITION = INGEST_COLUMNS.index('temperature')
+ACTIVITY_POSITION = INGEST_COLUMNS.index('activity_level')
+
+INSERT_SQL = (
+    f"INSERT INTO cattle_inference ({', '.join(INGEST_COLUMNS)}, created_at) "
+    f"VALUES ({', '.join('?' for _ in INGEST_COLUMNS)}, ?)"
+)
+
+@dataclass
+class IngestStats:
+    """Counters for one ingest run"""
+    rows: int = 0
+    features: int = 0
+    alerts: int = 0
+    rejected: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def format_timestamp(value) -> str:
+    """Normalize a timestamp to the naive local-time format SQLAlchemy stores"""
+    if isinstance(value, (int, float)):
+        parsed = datetime.fromtimestamp(value)
+    elif isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat(sep=' ', timespec='microseconds')
+
+
+def reading_to_row(reading: Dict) -> Tuple:
+    """Convert one reading mapping to an INSERT parameter tuple (without created_at)"""
+    device_id = reading.get('device_id')
+    if not device_id:
+        raise ValueError("reading has no device_id")
+    row = [device_id, format_timestamp(reading['timestamp'])]
+    for column in INGEST_COLUMNS[2:]:
+        value = reading.get(column)
+        if value == '' or value is None:
+            row.append(None)
+        elif column in FLOAT_COLUMNS:
+            row.append(float(value))
+        else:
+            row.append(value)
+    return tuple(row)
+
+
+def iter_csv(path: str) -> Iterator[Dict]:
+    """Stream readings from a CSV file with a header row"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        yield from csv.DictReader(handle)
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Stream readings from a JSON Lines file"""
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_readings(path: str) -> Iterator[Dict]:
+    """Pick a reader from the file extension"""
+    if path.endswith(('.jsonl', '.ndjson')):
+        return iter_jsonl(path)
+    if path.endswith('.csv'):
+        return iter_csv(path)
+    raise ValueError(f"Unsupported input format: {path} (expected .csv or .jsonl)")
+
+
+class BulkIngestor:
+    """Batched, WAL-mode writer for cattle_inference, its accelerometer features and anomaly alerts"""
+    
+    def __init__(self, database_path: Optional[str] = None, batch_size: int = 10000,
+                 feature_window: int = DEFAULT_WINDOW, detect_anomalies: bool = True):
+        self.database_path = database_path or DEFAULT_DATABASE_PATH
+        self.batch_size = batch_size
+        self.features = AccelerometerFeatureExtractor(feature_window)
+        self.detect_anomalies = detect_anomalies
+        self.detector = None
+        self.conn = None
+    
+    def connect(self) -> sqlite3.Connection:
+        """Open the writer connection, bringing the schema up to date first"""
+        if self.conn is None:
+            engine = create_tuned_engine(self.database_path)
+            run_migrations(engine)
+            engine.dispose()
+            self.conn = sqlite3.connect(self.database_path)
+            apply_pragmas(self.conn, WRITER_PRAGMAS)
+            if self.detect_anomalies:
+                # Resume every device's baseline from the last run
+                self.detector = AnomalyDetector.from_connection(self.conn)
+        return self.conn
+    
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def __enter__(self):
+        self.connect()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _write_batch(self, rows: List[Tuple]) -> Tuple[int, int]:
+        """Insert one batch with its features and alerts, returning (feature rows, alerts)"""
+        created_at = format_timestamp(datetime.now())
+        with self.conn:
+            self.conn.executemany(INSERT_SQL, [row + (created_at,) for row in rows])
+            # The batch holds the write lock, so its ids are consecutive and end
+            # at last_insert_rowid() (which triggers do not change)
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            positions = [i for i, row in enumerate(rows)
+                         if all(row[column] is not None for column in ACC_POSITIONS)]
+            feature_rows = []
+            if positions:
+                first_id = last_id - len(rows) + 1
+                feature_rows = self.features.feature_rows(
+                    [first_id + i for i in positions],
+                    [rows[i][0] for i in positions],
+                    [rows[i][1] for i in positions],
+                    np.array([[rows[i][column] for column in ACC_POSITIONS] for i in positions]),
+                )
+                self.conn.executemany(FEATURE_INSERT_SQL, feature_rows)
+            alerts = self._detect(rows, created_at) if self.detector is not None else 0
+            return len(feature_rows), alerts
+    
+    def _detect(self, rows: List[Tuple], created_at: str) -> int:
+        """Score the batch against each device's baseline, store alerts and the updated baselines"""
+        device_ids = [row[0] for row in rows]
+        values = reading_metrics(
+            [row[TEMPERATURE_POSITION] for row in rows],
+            [row[ACTIVITY_POSITION] for row in rows],
+            [[row[column] for column in ACC_POSITIONS] for row in rows],
+        )
+        alerts = self.detector.observe(device_ids, [row[1] for row in rows], values)
+        self.conn.executemany(ALERT_INSERT_SQL, [alert.row(created_at) for alert in alerts])
+        self.conn.executemany(STATE_UPSERT_SQL, self.detector.state_rows(dict.fromkeys(device_ids)))
+        return len(alerts)
+    
+    def ingest(self, readings: Iterable[Dict]) -> IngestStats:
+        """Insert readings in batches of batch_size, one transaction per batch"""
+        self.connect()
+        stats = IngestStats()
+        started = time.perf_counter()
+        readings = iter(readings)
+        while True:
+            chunk = list(islice(readings, self.batch_size))
+            if not chunk:
+                break
+            rows = []
+            for reading in chunk:
+                try:
+                    rows.append(reading_to_row(reading))
+                except (KeyError, TypeError, ValueError):
+                    stats.rejected += 1
+            if rows:
+                features, alerts = self._write_batch(rows)
+                stats.features += features
+                stats.alerts += alerts
+                stats.rows += len(rows)
+            stats.batches += 1
+        stats.seconds = time.perf_counter() - started
+        return stats
+    
+    def ingest_file(self, path: str) -> IngestStats:
+        """Stream one CSV or JSONL file into the database"""
+        return self.ingest(read_readings(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load collar readings into cattle_inference")
+    parser.add_argument('files', nargs='+', help="CSV or JSONL files with one reading per row")
+    parser.add_argument('--database', default=DEFAULT_DATABASE_PATH, help="SQLite database path")
+    parser.add_argument('--batch-size', type=int, default=10000, help="Rows per transaction")
+    args = parser.parse_args(argv)
+    
+    with BulkIngestor(args.database, batch_size=args.batch_size) as ingestor:
+        for path in args.files:
+            print(f"📥 Ingesting {path}...")
+            stats = ingestor.ingest_file(path)
+            print(f"✅ {stats.rows} rows in {stats.batches} batches, {stats.seconds:.2f}s "
+                  f"({stats.rows_per_second:,.0f} rows/s, {stats.features} with accelerometer features)")
+            if stats.alerts:
+                print(f"🚨 {stats.alerts} anomaly alerts raised")
+            if stats.rejected:
+                print(f"⚠️ Rejected {stats.rejected} malformed readings")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 # database/models.py - Simplified tables
 from sqlalchemy import (
-    create_engine,
     MetaData,
     Table,
     Column,
@@ -13,13 +12,30 @@ from sqlalchemy import (
 )
 import os
 from datetime import datetime, timedelta
+from functools import lru_cache
 import random
 
-# Create SQLite engine
+try:
+    from .engines import create_tuned_engine
+except ImportError:  # run as a script from the database directory
+    from engines import create_tuned_engine
+
+# The schema imports without NumPy or a database file: the SQLite engine (the
+# shared writer settings: WAL, busy_timeout, mmap) is created on first use
 database_path = os.path.join(os.path.dirname(__file__), 'cattle_monitoring.db')
-engine = create_engine(f"sqlite:///{database_path}")
 metadata_obj = MetaData()
 
+@lru_cache(maxsize=None)
+def get_engine():
+    """Writer engine for database_path, created on first use"""
+    return create_tuned_engine(database_path)
+
+def __getattr__(name):
+    # models.engine is kept for scripts that used the old module-level engine
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Define cattle_devices table (simplified)
 cattle_devices = Table(
     "cattle_devices",
@@ -48,11 +64,425 @@ cattle_inference = Table(
     Column("created_at", DateTime),
 )
 
+# Define cattle_latest table (latest reading per device, kept current by trigger)
+cattle_latest = Table(
+    "cattle_latest",
+    metadata_obj,
+    Column("device_id", String(50), primary_key=True),
+    Column("inference_id", Integer),  # cattle_inference.id of the reading
+    Column("timestamp", DateTime),
+    Column("predicted_behavior", String(50)),
+    Column("confidence", Float),
+    Column("temperature", Float),
+    Column("location_lat", Float),
+    Column("location_lng", Float),
+    Column("activity_level", Float),
+    Column("AccX", Float),
+    Column("AccY", Float),
+    Column("AccZ", Float),
+)
+
+LATEST_COLUMNS = (
+    "timestamp, predicted_behavior, confidence, temperature, "
+    "location_lat, location_lng, activity_level, AccX, AccY, AccZ"
+)
+
+# Upsert the new reading unless the device already has a newer one
+# (out-of-order readings must not overwrite the current state)
+LATEST_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS trg_cattle_latest_insert
+AFTER INSERT ON cattle_inference
+BEGIN
+    INSERT INTO cattle_latest (device_id, inference_id, {LATEST_COLUMNS})
+    VALUES (
+        NEW.device_id, NEW.id, NEW.timestamp, NEW.predicted_behavior,
+        NEW.confidence, NEW.temperature, NEW.location_lat, NEW.location_lng,
+        NEW.activity_level, NEW.AccX, NEW.AccY, NEW.AccZ
+    )
+    ON CONFLICT(device_id) DO UPDATE SET
+        inference_id = excluded.inference_id,
+        timestamp = excluded.timestamp,
+        predicted_behavior = excluded.predicted_behavior,
+        confidence = excluded.confidence,
+        temperature = excluded.temperature,
+        location_lat = excluded.location_lat,
+        location_lng = excluded.location_lng,
+        activity_level = excluded.activity_level,
+        AccX = excluded.AccX,
+        AccY = excluded.AccY,
+        AccZ = excluded.AccZ
+    WHERE excluded.timestamp >= cattle_latest.timestamp;
+END
+"""
+
+# SQLite takes bare columns from the MAX(timestamp) row of each group,
+# so the backfill is a single pass over the inference table
+LATEST_BACKFILL = f"""
+INSERT OR REPLACE INTO cattle_latest (device_id, inference_id, {LATEST_COLUMNS})
+SELECT device_id, id, MAX(timestamp), predicted_behavior, confidence,
+       temperature, location_lat, location_lng, activity_level, AccX, AccY, AccZ
+FROM cattle_inference
+GROUP BY device_id
+"""
+
+# Migration 2: indexes for per-cow history and herd-wide time range scans
+INFERENCE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_cattle_inference_device_ts "
+    "ON cattle_inference (device_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_cattle_inference_ts "
+    "ON cattle_inference (timestamp)",
+]
+
+# Rollup tables: per-device aggregates per hour and per day, kept current by
+# trigger so history questions read a handful of buckets instead of raw rows
+ROLLUP_BEHAVIORS = ('grazing', 'walking', 'resting', 'ruminating', 'standing')
+
+def rollup_columns():
+    """Columns shared by the hourly and daily rollup tables"""
+    return [
+        Column("device_id", String(50), primary_key=True),
+        Column("bucket_start", DateTime, primary_key=True),
+        Column("last_reading", DateTime),
+        Column("readings", Integer),
+        Column("temp_count", Integer),
+        Column("temp_sum", Float),
+        Column("temp_min", Float),
+        Column("temp_max", Float),
+        Column("activity_count", Integer),
+        Column("activity_sum", Float),
+        Column("acc_count", Integer),
+        Column("accx_sum", Float),
+        Column("accy_sum", Float),
+        Column("accz_sum", Float),
+        Column("accx_sumsq", Float),
+        Column("accy_sumsq", Float),
+        Column("accz_sumsq", Float),
+        *[Column(f"{behavior}_count", Integer) for behavior in ROLLUP_BEHAVIORS],
+        Column("other_behavior_count", Integer),
+    ]
+
+cattle_rollup_hourly = Table("cattle_rollup_hourly", metadata_obj, *rollup_columns())
+cattle_rollup_daily = Table("cattle_rollup_daily", metadata_obj, *rollup_columns())
+
+# Bucket keys are written in the same text format SQLAlchemy binds DateTime
+# parameters in, so range filters on bucket_start compare correctly
+ROLLUP_BUCKETS = {
+    'cattle_rollup_hourly': '%Y-%m-%d %H:00:00.000000',
+    'cattle_rollup_daily': '%Y-%m-%d 00:00:00.000000',
+}
+
+_BEHAVIOR_LIST = ", ".join(f"'{behavior}'" for behavior in ROLLUP_BEHAVIORS)
+
+# (column, per-reading value over row alias {r}, how buckets combine it)
+ROLLUP_MEASURES = [
+    ("last_reading", "{r}.timestamp", "MAX"),
+    ("readings", "1", "SUM"),
+    ("temp_count", "{r}.temperature IS NOT NULL", "SUM"),
+    ("temp_sum", "COALESCE({r}.temperature, 0)", "SUM"),
+    ("temp_min", "{r}.temperature", "MIN"),
+    ("temp_max", "{r}.temperature", "MAX"),
+    ("activity_count", "{r}.activity_level IS NOT NULL", "SUM"),
+    ("activity_sum", "COALESCE({r}.activity_level, 0)", "SUM"),
+    ("acc_count", "{r}.AccX IS NOT NULL", "SUM"),
+    ("accx_sum", "COALESCE({r}.AccX, 0)", "SUM"),
+    ("accy_sum", "COALESCE({r}.AccY, 0)", "SUM"),
+    ("accz_sum", "COALESCE({r}.AccZ, 0)", "SUM"),
+    ("accx_sumsq", "COALESCE({r}.AccX * {r}.AccX, 0)", "SUM"),
+    ("accy_sumsq", "COALESCE({r}.AccY * {r}.AccY, 0)", "SUM"),
+    ("accz_sumsq", "COALESCE({r}.AccZ * {r}.AccZ, 0)", "SUM"),
+    *[(f"{behavior}_count", f"COALESCE({{r}}.predicted_behavior = '{behavior}', 0)", "SUM")
+      for behavior in ROLLUP_BEHAVIORS],
+    ("other_behavior_count", f"COALESCE({{r}}.predicted_behavior NOT IN ({_BEHAVIOR_LIST}), 0)", "SUM"),
+]
+
+ROLLUP_COLUMNS = ", ".join(column for column, _, _ in ROLLUP_MEASURES)
+
+def _rollup_merge(column: str, how: str) -> str:
+    if how == "SUM":
+        return f"{column} = {column} + excluded.{column}"
+    # Scalar min()/max() return NULL if either side is NULL
+    return f"{column} = COALESCE({how.lower()}({column}, excluded.{column}), {column}, excluded.{column})"
+
+def rollup_upsert(table: str) -> str:
+    """Fold the NEW reading into its bucket of the given rollup table"""
+    values = ", ".join(expression.format(r="NEW") for _, expression, _ in ROLLUP_MEASURES)
+    merges = ",\n        ".join(_rollup_merge(column, how) for column, _, how in ROLLUP_MEASURES)
+    return f"""
+    INSERT INTO {table} (device_id, bucket_start, {ROLLUP_COLUMNS})
+    VALUES (NEW.device_id, strftime('{ROLLUP_BUCKETS[table]}', NEW.timestamp), {values})
+    ON CONFLICT(device_id, bucket_start) DO UPDATE SET
+        {merges};"""
+
+def rollup_backfill(table: str) -> str:
+    """Aggregate existing readings into the given rollup table in one pass.
+    
+    Daily buckets are combined from the hourly rollup (backfill it first),
+    which is far smaller than the readings table.
+    """
+    if table == 'cattle_rollup_daily':
+        aggregates = ", ".join(f"{how}({column})" for column, _, how in ROLLUP_MEASURES)
+        return f"""
+    INSERT INTO {table} (device_id, bucket_start, {ROLLUP_COLUMNS})
+    SELECT device_id, strftime('{ROLLUP_BUCKETS[table]}', bucket_start), {aggregates}
+    FROM cattle_rollup_hourly
+    GROUP BY 1, 2
+    """
+    aggregates = ", ".join(f"{how}({expression.format(r='ci')})" for _, expression, how in ROLLUP_MEASURES)
+    return f"""
+    INSERT INTO {table} (device_id, bucket_start, {ROLLUP_COLUMNS})
+    SELECT ci.device_id, strftime('{ROLLUP_BUCKETS[table]}', ci.timestamp), {aggregates}
+    FROM cattle_inference ci
+    WHERE ci.device_id IS NOT NULL AND ci.timestamp IS NOT NULL
+    GROUP BY 1, 2
+    """
+
+ROLLUP_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS trg_cattle_rollup_insert
+AFTER INSERT ON cattle_inference
+WHEN NEW.device_id IS NOT NULL AND NEW.timestamp IS NOT NULL
+BEGIN{''.join(rollup_upsert(table) for table in ROLLUP_BUCKETS)}
+END
+"""
+
+# Named rectangular geofences (paddocks, barns), names stored lowercase
+cattle_geofences = Table(
+    "cattle_geofences",
+    metadata_obj,
+    Column("name", String(100), primary_key=True),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+    Column("min_lng", Float),
+    Column("max_lng", Float),
+)
+
+# R*Tree over each device's current position in cattle_latest, keyed by its
+# rowid. The upsert in trg_cattle_latest_insert keeps rowids stable, and the
+# triggers below keep the index in step with every position change.
+LOCATION_RTREE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS cattle_location_rtree
+    USING rtree(id, min_lat, max_lat, min_lng, max_lng)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_cattle_location_insert
+    AFTER INSERT ON cattle_latest
+    WHEN NEW.location_lat IS NOT NULL AND NEW.location_lng IS NOT NULL
+    BEGIN
+        INSERT OR REPLACE INTO cattle_location_rtree
+        VALUES (NEW.rowid, NEW.location_lat, NEW.location_lat, NEW.location_lng, NEW.location_lng);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_cattle_location_update
+    AFTER UPDATE OF location_lat, location_lng ON cattle_latest
+    BEGIN
+        DELETE FROM cattle_location_rtree WHERE id = OLD.rowid;
+        INSERT INTO cattle_location_rtree
+        SELECT NEW.rowid, NEW.location_lat, NEW.location_lat, NEW.location_lng, NEW.location_lng
+        WHERE NEW.location_lat IS NOT NULL AND NEW.location_lng IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_cattle_location_delete
+    AFTER DELETE ON cattle_latest
+    BEGIN
+        DELETE FROM cattle_location_rtree WHERE id = OLD.rowid;
+    END
+    """,
+]
+
+LOCATION_BACKFILL = """
+INSERT INTO cattle_location_rtree
+SELECT rowid, location_lat, location_lat, location_lng, location_lng
+FROM cattle_latest
+WHERE location_lat IS NOT NULL AND location_lng IS NOT NULL
+"""
+
+# One-row change counter for cattle_devices, bumped by triggers, so the
+# in-memory device registry (registry.py) reloads only when devices change
+DEVICES_VERSION = [
+    """
+    CREATE TABLE IF NOT EXISTS cattle_devices_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO cattle_devices_version VALUES (1, 0)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cattle_devices_{event.lower()}
+    AFTER {event} ON cattle_devices
+    BEGIN
+        UPDATE cattle_devices_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+# Accelerometer features per reading, computed at ingest (see features.py)
+cattle_acc_features = Table(
+    "cattle_acc_features",
+    metadata_obj,
+    Column("inference_id", Integer, primary_key=True),  # cattle_inference.id
+    Column("device_id", String(50)),
+    Column("timestamp", DateTime),
+    Column("magnitude", Float),
+    Column("odba", Float),
+    Column("vedba", Float),
+    Column("pitch", Float),
+    Column("roll", Float),
+    Column("magnitude_var", Float),
+)
+
+FEATURE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_cattle_acc_features_device_ts "
+    "ON cattle_acc_features (device_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_cattle_acc_features_ts "
+    "ON cattle_acc_features (timestamp)",
+]
+
+# Herd-wide summaries scan a bucket range without a device filter
+ROLLUP_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS ix_{table}_bucket ON {table} (bucket_start)"
+    for table in ROLLUP_BUCKETS
+]
+
+# Metrics the anomaly detector (anomaly.py) keeps a baseline for, in state column order
+ANOMALY_METRICS = ('temperature', 'activity', 'magnitude')
+
+# Per-device anomaly baselines (see anomaly.py) and the alerts they raise
+cattle_anomaly_state = Table(
+    "cattle_anomaly_state",
+    metadata_obj,
+    Column("device_id", String(50), primary_key=True),
+    *[
+        Column(f"{metric}_{field}", Integer if field == "count" else Float)
+        for metric in ANOMALY_METRICS
+        for field in ("count", "mean", "var", "last_alert")
+    ],
+)
+
+cattle_alerts = Table(
+    "cattle_alerts",
+    metadata_obj,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("device_id", String(50)),
+    Column("timestamp", DateTime),
+    Column("metric", String(20)),
+    Column("value", Float),
+    Column("expected", Float),  # the device's baseline mean
+    Column("std", Float),
+    Column("zscore", Float),
+    Column("created_at", DateTime),
+)
+
+ALERT_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_cattle_alerts_ts ON cattle_alerts (timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_cattle_alerts_device_ts ON cattle_alerts (device_id, timestamp)",
+]
+
+def create_latest_table(conn):
+    """Create cattle_latest with its insert trigger and backfill it if empty"""
+    metadata_obj.create_all(conn, tables=[cattle_latest])
+    conn.execute(text(LATEST_TRIGGER))
+    if conn.execute(text("SELECT COUNT(*) FROM cattle_latest")).scalar() == 0:
+        conn.execute(text(LATEST_BACKFILL))
+
+def create_inference_indexes(conn):
+    """Index cattle_inference for device and time range lookups"""
+    for statement in INFERENCE_INDEXES:
+        conn.execute(text(statement))
+
+def create_rollup_tables(conn):
+    """Create the hourly and daily rollups with their trigger and backfill them if empty"""
+    metadata_obj.create_all(conn, tables=[cattle_rollup_hourly, cattle_rollup_daily])
+    for statement in ROLLUP_INDEXES:
+        conn.execute(text(statement))
+    conn.execute(text(ROLLUP_TRIGGER))
+    for table in ROLLUP_BUCKETS:
+        if conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() == 0:
+            conn.execute(text(rollup_backfill(table)))
+
+def compute_missing_features(conn) -> int:
+    """Compute accelerometer features for readings inserted without them"""
+    try:
+        from .features import backfill_features
+    except ImportError:  # run as a script from the database directory
+        from features import backfill_features
+    return backfill_features(conn)
+
+def create_feature_table(conn):
+    """Create cattle_acc_features and compute features for existing readings"""
+    metadata_obj.create_all(conn, tables=[cattle_acc_features])
+    for statement in FEATURE_INDEXES:
+        conn.execute(text(statement))
+    compute_missing_features(conn)
+
+def learn_anomaly_baselines(conn) -> int:
+    """Learn anomaly baselines from readings inserted without the detector, returning the alert count"""
+    try:
+        from .anomaly import backfill_baselines
+    except ImportError:  # run as a script from the database directory
+        from anomaly import backfill_baselines
+    return backfill_baselines(conn)
+
+def create_location_index(conn):
+    """Create the geofence table and the R*Tree over current cow positions"""
+    metadata_obj.create_all(conn, tables=[cattle_geofences])
+    for statement in LOCATION_RTREE:
+        conn.execute(text(statement))
+    if conn.execute(text("SELECT COUNT(*) FROM cattle_location_rtree")).scalar() == 0:
+        conn.execute(text(LOCATION_BACKFILL))
+
+def create_devices_version(conn):
+    for statement in DEVICES_VERSION:
+        conn.execute(text(statement))
+
+def create_anomaly_tables(conn):
+    """Create the anomaly baseline and alert tables (baselines are learned from new readings)"""
+    metadata_obj.create_all(conn, tables=[cattle_anomaly_state, cattle_alerts])
+    for statement in ALERT_INDEXES:
+        conn.execute(text(statement))
+
+# Ordered schema migrations; PRAGMA user_version records the last one applied.
+# Every step must be idempotent so a half-applied upgrade can simply be rerun.
+SCHEMA_MIGRATIONS = [
+    (1, "cattle_latest table and trigger", create_latest_table),
+    (2, "cattle_inference indexes", create_inference_indexes),
+    (3, "hourly and daily rollup tables", create_rollup_tables),
+    (4, "accelerometer feature table", create_feature_table),
+    (5, "geofences and location R*Tree", create_location_index),
+    (6, "cattle_devices change counter", create_devices_version),
+    (7, "anomaly baselines and alerts", create_anomaly_tables),
+]
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def get_schema_version(conn) -> int:
+    """Return the schema version stored in the database header"""
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+def run_migrations(target_engine=None) -> int:
+    """Create the base tables and apply pending migrations, returning the version"""
+    target_engine = target_engine or get_engine()
+    with target_engine.begin() as conn:
+        metadata_obj.create_all(conn, tables=[cattle_devices, cattle_inference])
+        version = get_schema_version(conn)
+        for step_version, description, step in SCHEMA_MIGRATIONS:
+            if step_version <= version:
+                continue
+            step(conn)
+            conn.execute(text(f"PRAGMA user_version = {step_version}"))
+            version = step_version
+    return version
+
 def create_sample_data():
     """Create tables and insert sample data"""
     
+    engine = get_engine()
+    
     # Create all tables
-    metadata_obj.create_all(engine)
+    run_migrations(engine)
     print("✅ Tables created successfully")
     
     # Sample cattle devices data (simplified)
@@ -90,6 +520,18 @@ def create_sample_data():
         conn.commit()
         print(f"✅ Inserted {len(devices_data)} cattle devices")
     
+    # Two paddocks splitting the sample grazing area north/south
+    geofences_data = [
+        {"name": "north paddock", "min_lat": 40.712776, "max_lat": 40.732776,
+         "min_lng": -74.025974, "max_lng": -73.985974},
+        {"name": "south paddock", "min_lat": 40.692776, "max_lat": 40.712776,
+         "min_lng": -74.025974, "max_lng": -73.985974},
+    ]
+    with engine.connect() as conn:
+        conn.execute(insert(cattle_geofences), geofences_data)
+        conn.commit()
+        print(f"✅ Inserted {len(geofences_data)} geofences")
+    
     # Generate sample inference data (no heart_rate)
     behaviors = ['grazing', 'walking', 'resting', 'ruminating', 'standing']
     current_time = datetime.now()
@@ -128,18 +570,24 @@ def create_sample_data():
             }
             inference_data.append(inference_record)
     
-    # Insert inference data
+    # Insert inference data with its accelerometer features and anomaly baselines
+    # (plain inserts skip the feature extraction and anomaly detection
+    # BulkIngestor does, so activity and alert questions need them)
     with engine.connect() as conn:
         conn.execute(insert(cattle_inference), inference_data)
+        features = compute_missing_features(conn)
+        alerts = learn_anomaly_baselines(conn)
         conn.commit()
         print(f"✅ Inserted {len(inference_data)} inference records")
+        print(f"✅ Computed {features} accelerometer feature rows")
+        print(f"✅ Learned anomaly baselines ({alerts} alerts)")
     
     print(f"✅ Database created at: {database_path}")
     return database_path
 
 def test_data():
     """Test the created data"""
-    with engine.connect() as conn:
+    with get_engine().connect() as conn:
         # Test cattle devices
         result = conn.execute(text("SELECT * FROM cattle_devices")).fetchall()
         print(f"\n📊 Cattle Devices ({len(result)} records):")
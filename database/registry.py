@@ -0,0 +1,136 @@
+"""
+registry.py - Process-wide in-memory registry of cattle devices
+
+Loads cattle_devices once per database file and answers lookups by device
+ID, cow ID or cow name from dictionaries. Staleness is checked in two cheap
+steps: PRAGMA data_version (did anything commit?) and, only then, the
+trigger-maintained cattle_devices_version counter (did the devices change?),
+so ingesting readings never causes a reload.
+"""
+
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from .engines import get_reader_engine
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+@dataclass(frozen=True)
+class Device:
+    device_id: str
+    cow_id: Optional[str]
+    cow_name: Optional[str]
+
+
+def alias_key(value: str) -> str:
+    """Lookup form of an ID or name: lowercase words joined by single spaces"""
+    return ' '.join(TOKEN_PATTERN.findall(value.lower()))
+
+
+class DeviceRegistry:
+    """Device lookups by ID, cow ID or name, reloaded only when cattle_devices changes"""
+    
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self.version = None
+        self.loads = 0
+        self._devices: Tuple[Device, ...] = ()
+        self._by_id: Dict[str, Device] = {}
+        self._by_alias: Dict[str, Device] = {}
+        self._max_words = 1
+        self._data_version = None
+        self._version_conn = None
+        self._lock = threading.Lock()
+    
+    def refresh(self) -> bool:
+        """Reload if cattle_devices changed since the last load; returns whether it reloaded"""
+        with self._lock:
+            if self._version_conn is None:
+                get_reader_engine(self.database_path)  # creates and migrates the file first
+                self._version_conn = sqlite3.connect(self.database_path, check_same_thread=False)
+            data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return False
+            self._data_version = data_version
+            version = self._version_conn.execute(
+                "SELECT version FROM cattle_devices_version WHERE id = 1").fetchone()[0]
+            if version == self.version:
+                return False
+            self._load()
+            self.version = version
+            return True
+    
+    def _load(self):
+        with get_reader_engine(self.database_path).connect() as conn:
+            rows = conn.execute(text(
+                "SELECT device_id, cow_id, cow_name FROM cattle_devices ORDER BY device_id"
+            )).fetchall()
+        devices = tuple(Device(*row) for row in rows)
+        by_alias = {}
+        # Later entries win, so device IDs beat a cow ID or name with the same key
+        for field in ('cow_name', 'cow_id', 'device_id'):
+            for device in devices:
+                value = getattr(device, field)
+                if value:
+                    by_alias[alias_key(value)] = device
+        by_alias.pop('', None)
+        self._devices = devices
+        self._by_id = {device.device_id: device for device in devices}
+        self._by_alias = by_alias
+        self._max_words = max((key.count(' ') + 1 for key in by_alias), default=1)
+        self.loads += 1
+    
+    def devices(self) -> List[Device]:
+        self.refresh()
+        return list(self._devices)
+    
+    def device_ids(self) -> List[str]:
+        self.refresh()
+        return [device.device_id for device in self._devices]
+    
+    def get(self, device_id: str) -> Optional[Device]:
+        self.refresh()
+        return self._by_id.get(device_id)
+    
+    def resolve(self, alias: str) -> Optional[Device]:
+        """The device whose ID, cow ID or name is alias (case and punctuation ignored)"""
+        self.refresh()
+        return self._by_alias.get(alias_key(alias))
+    
+    def find(self, text_value: str) -> List[Device]:
+        """Devices mentioned by ID, cow ID or name in free text, in order, longest match first"""
+        return [device for _, device in self.mentions(text_value)]
+    
+    def mentions(self, text_value: str) -> List[Tuple[int, Device]]:
+        """(character offset, device) for each distinct device mentioned in free text"""
+        self.refresh()
+        by_alias, max_words = self._by_alias, self._max_words
+        tokens = list(TOKEN_PATTERN.finditer(text_value.lower()))
+        words = [token.group(0) for token in tokens]
+        found, seen = [], set()
+        i = 0
+        while i < len(words):
+            for size in range(min(max_words, len(words) - i), 0, -1):
+                device = by_alias.get(' '.join(words[i:i + size]))
+                if device is not None:
+                    if device.device_id not in seen:
+                        seen.add(device.device_id)
+                        found.append((tokens[i].start(), device))
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+
+
+@lru_cache(maxsize=None)
+def get_device_registry(database_path: str) -> DeviceRegistry:
+    """Process-wide registry for a database file"""
+    return DeviceRegistry(database_path)
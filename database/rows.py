@@ -0,0 +1,48 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+class ResultRows:
+    """A small query result: column names plus the fetched row tuples.
+    
+    The chat path reads at most a few rows per question, so it skips
+    building a DataFrame; to_frame() converts when analytics need one.
+    """
+    __slots__ = ('columns', 'rows')
+    
+    def __init__(self, columns: Sequence[str] = (), rows: Sequence[Tuple] = ()):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.rows: Sequence[Tuple] = rows
+    
+    @classmethod
+    def from_frame(cls, frame) -> 'ResultRows':
+        """Rows of a DataFrame, with NaN/NaT turned back into None"""
+        rows = [tuple(None if value != value else value for value in row)
+                for row in frame.itertuples(index=False, name=None)]
+        return cls(frame.columns, rows)
+    
+    @property
+    def empty(self) -> bool:
+        return not self.rows
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __iter__(self) -> Iterator[Tuple]:
+        return iter(self.rows)
+    
+    def __repr__(self) -> str:
+        return f"ResultRows(columns={self.columns}, rows={len(self.rows)})"
+    
+    def first(self) -> Optional[Dict[str, Any]]:
+        """The first row as a column -> value dict, or None when empty"""
+        return dict(zip(self.columns, self.rows[0])) if self.rows else None
+    
+    def records(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+    
+    def column(self, name: str) -> list:
+        position = self.columns.index(name)
+        return [row[position] for row in self.rows]
+    
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(list(self.rows), columns=list(self.columns))
@@ -0,0 +1,244 @@
+"""
+synthetic.py - Seeded, vectorized synthetic herd data at any scale
+
+Generates realistic collar readings for thousands of devices over weeks or
+months with NumPy (one array operation per time step across the whole herd)
+and bulk-loads them with the derived tables rebuilt once at the end instead
+of per row by trigger. The readings go through the anomaly detector in the
+same transaction, as with BulkIngestor, so injected fever episodes raise
+alerts. The same arguments always produce the same data.
+
+Usage:
+    python -m database.synthetic --devices 10000 --days 30 --interval 30 --database big.db
+
+Each cow has its own temperature baseline, a diurnal cycle and, for a few
+cows, a multi-day fever episode; behavior follows time-of-day probabilities,
+activity and accelerometer signals follow behavior, and positions wander
+around a home point inside the sample paddocks.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from .anomaly import ALERT_INSERT_SQL, STATE_UPSERT_SQL, AnomalyDetector, reading_metrics
+from .engines import WRITER_PRAGMAS, apply_pragmas, create_tuned_engine
+from .features import FEATURE_INSERT_SQL, AccelerometerFeatureExtractor
+from .ingest import DEFAULT_DATABASE_PATH, INGEST_COLUMNS, IngestStats, format_timestamp
+from .models import (
+    LATEST_BACKFILL,
+    ROLLUP_BUCKETS,
+    rollup_backfill,
+    run_migrations,
+)
+
+BEHAVIORS = np.array(['grazing', 'walking', 'resting', 'ruminating', 'standing'])
+# Behavior probabilities by time of day (same order as BEHAVIORS)
+DAY_BEHAVIOR = np.array([0.45, 0.15, 0.10, 0.20, 0.10])
+NIGHT_BEHAVIOR = np.array([0.10, 0.05, 0.45, 0.30, 0.10])
+# Per-behavior activity level mean, accelerometer noise (g) and head pitch (degrees)
+BEHAVIOR_ACTIVITY = np.array([0.50, 0.80, 0.10, 0.20, 0.25])
+BEHAVIOR_ACC_NOISE = np.array([0.15, 0.40, 0.02, 0.05, 0.05])
+BEHAVIOR_PITCH = np.array([-40.0, -5.0, 10.0, 0.0, 0.0])
+
+HERD_CENTER = (40.712776, -74.005974)
+SAMPLE_GEOFENCES = [
+    ("north paddock", 40.712776, 40.732776, -74.025974, -73.985974),
+    ("south paddock", 40.692776, 40.712776, -74.025974, -73.985974),
+]
+
+INSERT_SQL = (
+    f"INSERT INTO cattle_inference (id, {', '.join(INGEST_COLUMNS)}, created_at) "
+    f"VALUES ({', '.join('?' for _ in range(len(INGEST_COLUMNS) + 2))})"
+)
+
+
+@dataclass
+class SyntheticHerd:
+    """A reproducible herd: devices cows reporting every interval_minutes for days"""
+    devices: int = 100
+    days: float = 7.0
+    interval_minutes: float = 10.0
+    seed: int = 42
+    end: Optional[datetime] = None
+    fever_rate: float = 0.05
+    
+    @property
+    def steps(self) -> int:
+        return int(self.days * 24 * 60 / self.interval_minutes)
+    
+    @property
+    def rows(self) -> int:
+        return self.steps * self.devices
+    
+    def device_ids(self) -> List[str]:
+        return [f"cow-{100 + i}" for i in range(self.devices)]
+    
+    def device_rows(self) -> List[tuple]:
+        """(device_id, cow_id, cow_name) for cattle_devices"""
+        return [(device_id, f"COW{i:05d}", f"Cow {i}") for i, device_id in enumerate(self.device_ids())]
+    
+    def iter_chunks(self, chunk_rows: int = 200000) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield column arrays for consecutive time slabs covering the whole herd"""
+        rng = np.random.default_rng(self.seed)
+        n = self.devices
+        end = (self.end or datetime.now()).replace(second=0, microsecond=0)
+        interval_us = int(self.interval_minutes * 60e6)
+        # Step k covers [first + k*interval, first + (k+1)*interval), so with the
+        # jitter every reading lands before end and none is future-dated
+        first = np.datetime64(end, 'us') - self.steps * np.timedelta64(interval_us, 'us')
+        
+        # Fixed per-cow traits
+        devices = np.array(self.device_ids())
+        jitter = rng.integers(0, max(interval_us // 2, 1), n).astype('timedelta64[us]')
+        baseline = rng.normal(38.6, 0.15, n)
+        fever = rng.random(n) < self.fever_rate
+        fever_start = rng.integers(0, max(self.steps, 1), n)
+        fever_length = rng.integers(int(24 * 60 / self.interval_minutes), int(72 * 60 / self.interval_minutes) + 1, n)
+        home = np.column_stack([
+            HERD_CENTER[0] + rng.uniform(-0.015, 0.015, n),
+            HERD_CENTER[1] + rng.uniform(-0.015, 0.015, n),
+        ])
+        position = home.copy()
+        day_cum = np.cumsum(DAY_BEHAVIOR)
+        night_cum = np.cumsum(NIGHT_BEHAVIOR)
+        
+        steps_per_chunk = max(1, chunk_rows // n)
+        for chunk_start in range(0, self.steps, steps_per_chunk):
+            chunk_steps = np.arange(chunk_start, min(chunk_start + steps_per_chunk, self.steps))
+            t = len(chunk_steps)
+            times = first + chunk_steps[:, None] * np.timedelta64(interval_us, 'us') + jitter[None, :]
+            hours = (times.astype('datetime64[m]').astype(np.int64) % (24 * 60)) / 60.0
+            
+            is_day = (hours >= 6) & (hours < 20)
+            draws = rng.random((t, n))
+            behavior = np.where(is_day, (draws[..., None] > day_cum).sum(-1),
+                                (draws[..., None] > night_cum).sum(-1))
+            behavior = np.minimum(behavior, len(BEHAVIORS) - 1)
+            
+            in_fever = fever & (chunk_steps[:, None] >= fever_start) & (chunk_steps[:, None] < fever_start + fever_length)
+            temperature = (baseline + 0.2 * np.sin(2 * np.pi * (hours - 9) / 24)
+                           + rng.normal(0, 0.08, (t, n)) + 1.6 * in_fever)
+            activity = np.clip(BEHAVIOR_ACTIVITY[behavior] + rng.normal(0, 0.08, (t, n)), 0, 1)
+            
+            pitch = np.radians(BEHAVIOR_PITCH[behavior])
+            noise = BEHAVIOR_ACC_NOISE[behavior][..., None] * rng.standard_normal((t, n, 3))
+            acc = np.stack([np.sin(pitch), np.zeros_like(pitch), np.cos(pitch)], axis=-1) + noise
+            
+            # Mean-reverting wander around each cow's home point
+            wander = rng.normal(0, 0.0003, (t, n, 2))
+            lat_lng = np.empty((t, n, 2))
+            for step in range(t):
+                position = home + (position - home) * 0.95 + wander[step]
+                lat_lng[step] = position
+            
+            yield {
+                'device_id': np.broadcast_to(devices, (t, n)).ravel(),
+                'timestamp': np.char.replace(np.datetime_as_string(times.ravel(), unit='us'), 'T', ' '),
+                'predicted_behavior': BEHAVIORS[behavior].ravel(),
+                'confidence': np.round(rng.uniform(0.7, 0.98, t * n), 3),
+                'temperature': np.round(temperature.ravel(), 2),
+                'location_lat': np.round(lat_lng[..., 0].ravel(), 6),
+                'location_lng': np.round(lat_lng[..., 1].ravel(), 6),
+                'activity_level': np.round(activity.ravel(), 2),
+                'AccX': np.round(acc[..., 0].ravel(), 3),
+                'AccY': np.round(acc[..., 1].ravel(), 3),
+                'AccZ': np.round(acc[..., 2].ravel(), 3),
+            }
+
+
+def _suspend_maintenance(conn: sqlite3.Connection) -> List[str]:
+    """Drop the per-row triggers and secondary indexes on the reading tables, returning their SQL"""
+    saved = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE tbl_name IN ('cattle_inference', 'cattle_acc_features') "
+        "AND type IN ('trigger', 'index') AND sql IS NOT NULL"
+    ).fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in saved]
+
+
+def _rebuild_derived_tables(conn: sqlite3.Connection):
+    """Recompute cattle_latest and the rollups from all readings in one pass each"""
+    conn.execute("DELETE FROM cattle_latest")
+    conn.execute(LATEST_BACKFILL)
+    for table in ROLLUP_BUCKETS:
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(rollup_backfill(table))
+
+
+def load_synthetic_data(database_path: str, herd: SyntheticHerd, chunk_rows: int = 200000,
+                        detect_anomalies: bool = True) -> IngestStats:
+    """Bulk-load a synthetic herd, rebuilding latest, rollup and index data once at the end"""
+    engine = create_tuned_engine(database_path)
+    run_migrations(engine)
+    engine.dispose()
+    
+    stats = IngestStats()
+    started = time.perf_counter()
+    conn = sqlite3.connect(database_path)
+    try:
+        apply_pragmas(conn, WRITER_PRAGMAS)
+        extractor = AccelerometerFeatureExtractor()
+        detector = AnomalyDetector.from_connection(conn) if detect_anomalies else None
+        created_at = format_timestamp(datetime.now())
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO cattle_devices VALUES (?, ?, ?)", herd.device_rows())
+            conn.executemany("INSERT OR IGNORE INTO cattle_geofences VALUES (?, ?, ?, ?, ?)", SAMPLE_GEOFENCES)
+            maintenance = _suspend_maintenance(conn)
+            next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM cattle_inference").fetchone()[0]
+            for chunk in herd.iter_chunks(chunk_rows):
+                count = len(chunk['device_id'])
+                ids = np.arange(next_id, next_id + count)
+                next_id += count
+                columns = [chunk[column].tolist() for column in INGEST_COLUMNS]
+                conn.executemany(INSERT_SQL, zip(ids.tolist(), *columns, repeat(created_at)))
+                acc = np.column_stack([chunk['AccX'], chunk['AccY'], chunk['AccZ']])
+                conn.executemany(FEATURE_INSERT_SQL, extractor.feature_rows(
+                    ids.tolist(), columns[0], columns[1], acc))
+                if detector is not None:
+                    alerts = detector.observe(columns[0], columns[1], reading_metrics(
+                        chunk['temperature'], chunk['activity_level'], acc))
+                    conn.executemany(ALERT_INSERT_SQL, [alert.row(created_at) for alert in alerts])
+                    stats.alerts += len(alerts)
+                stats.rows += count
+                stats.features += count
+                stats.batches += 1
+            if detector is not None:
+                conn.executemany(STATE_UPSERT_SQL, detector.state_rows())
+            for statement in maintenance:
+                conn.execute(statement)
+            _rebuild_derived_tables(conn)
+    finally:
+        conn.close()
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic herd database")
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=30, help="Minutes between readings per cow")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=DEFAULT_DATABASE_PATH, help="SQLite database path")
+    args = parser.parse_args(argv)
+    
+    herd = SyntheticHerd(args.devices, args.days, args.interval, args.seed)
+    print(f"🐄 Generating {herd.rows:,} readings for {herd.devices:,} cows over {herd.days:g} days...")
+    stats = load_synthetic_data(args.database, herd)
+    print(f"✅ {stats.rows:,} rows in {stats.seconds:.1f}s ({stats.rows_per_second:,.0f} rows/s) "
+          f"-> {args.database}")
+    if stats.alerts:
+        print(f"🚨 {stats.alerts} anomaly alerts raised")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+time_budget.py - Behavior time budgets from per-reading behavior labels
+
+Turns a series of (device_id, timestamp, predicted_behavior) readings into
+how long each device spent in each behavior, using NumPy run-length
+encoding instead of a Python loop over readings:
+
+    duration   a reading lasts until its device's next reading; a gap longer
+               than max_gap is a collar outage, so the reading before it (and
+               a device's last reading) counts for the typical interval instead
+    bouts      consecutive readings with the same label, split at outages;
+               np.add.reduceat sums each bout's durations in one call
+    budget     per device and behavior: total time, share of observed time,
+               bout count and longest bout, from bincount over the bouts
+
+TimeBudgetEngine loads the series for a range from both cattle_inference and
+the Parquet archive, so months of history per cow take milliseconds; the
+chat uses it for windows that reach archived days.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .rows import ResultRows
+
+DEFAULT_MAX_GAP = timedelta(hours=1)
+UNKNOWN_BEHAVIOR = 'unknown'
+SERIES_COLUMNS = ('device_id', 'timestamp', 'predicted_behavior')
+
+
+@dataclass(frozen=True)
+class BehaviorBudget:
+    """Time one device spent in one behavior"""
+    behavior: str
+    seconds: float
+    share: float
+    bouts: int
+    longest_seconds: float
+
+
+@dataclass(frozen=True)
+class TimeBudget:
+    """A device's behaviors over its observed time, most time first"""
+    device_id: str
+    start: datetime
+    end: datetime
+    readings: int
+    observed_seconds: float
+    behaviors: List[BehaviorBudget]
+    
+    def get(self, behavior: str) -> Optional[BehaviorBudget]:
+        return next((budget for budget in self.behaviors if budget.behavior == behavior), None)
+
+
+def to_datetime64(timestamps) -> np.ndarray:
+    """Timestamps (text as stored by SQLite, datetimes or datetime64) as datetime64[us]"""
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == 'M':
+        return timestamps.astype('datetime64[us]', copy=False)
+    # Parsing from an object array is several times faster than via a fixed-width str array
+    return np.asarray(timestamps, dtype=object).astype('datetime64[us]')
+
+
+def time_budgets(device_ids: Sequence[str], timestamps, behaviors: Sequence[Optional[str]],
+                 max_gap: timedelta = DEFAULT_MAX_GAP) -> Dict[str, TimeBudget]:
+    """Per-device time budgets from readings in any order.
+    
+    The typical interval credited to a reading before an outage, and to a
+    device's last reading, is the median gap between consecutive readings
+    across all devices (capped at max_gap).
+    """
+    if not len(device_ids):
+        return {}
+    times = to_datetime64(timestamps).astype(np.int64)
+    device_codes, device_labels = pd.factorize(np.asarray(device_ids, dtype=object))
+    behavior_codes, behavior_labels = pd.factorize(np.asarray(behaviors, dtype=object))
+    behavior_labels = list(behavior_labels) + [UNKNOWN_BEHAVIOR]
+    # Readings without a label (factorize code -1) get their own bucket
+    behavior_codes = np.where(behavior_codes < 0, len(behavior_labels) - 1, behavior_codes)
+    
+    order = np.lexsort((times, device_codes))
+    times, device_codes, behavior_codes = times[order], device_codes[order], behavior_codes[order]
+    new_device = np.r_[True, device_codes[1:] != device_codes[:-1]]
+    gaps = np.diff(times)
+    max_gap_us = max_gap // timedelta(microseconds=1)
+    outage = gaps > max_gap_us
+    in_device = gaps[~new_device[1:] & ~outage]
+    typical = min(float(np.median(in_device)), max_gap_us) if len(in_device) else max_gap_us
+    
+    duration = np.empty(len(times))
+    duration[:-1] = np.where(new_device[1:] | outage, typical, gaps)
+    duration[-1] = typical
+    
+    # Run-length encode: a bout starts at each new device, label change or outage
+    bout_start = new_device.copy()
+    bout_start[1:] |= (behavior_codes[1:] != behavior_codes[:-1]) | outage
+    starts = np.flatnonzero(bout_start)
+    bout_seconds = np.add.reduceat(duration, starts) / 1e6
+    
+    devices, kinds = len(device_labels), len(behavior_labels)
+    cells = device_codes[starts] * kinds + behavior_codes[starts]
+    totals = np.bincount(cells, weights=bout_seconds, minlength=devices * kinds).reshape(devices, kinds)
+    bouts = np.bincount(cells, minlength=devices * kinds).reshape(devices, kinds)
+    longest = np.zeros(devices * kinds)
+    np.maximum.at(longest, cells, bout_seconds)
+    longest = longest.reshape(devices, kinds)
+    
+    first = np.flatnonzero(new_device)
+    last = np.r_[first[1:], len(times)] - 1
+    observed = totals.sum(axis=1)
+    budgets = {}
+    for code, device_id in enumerate(device_labels):
+        behaviors_spent = [
+            BehaviorBudget(behavior_labels[kind], float(totals[code, kind]),
+                           float(totals[code, kind] / observed[code]), int(bouts[code, kind]),
+                           float(longest[code, kind]))
+            for kind in np.argsort(-totals[code], kind='stable') if bouts[code, kind]
+        ]
+        budgets[device_id] = TimeBudget(
+            device_id,
+            start=times[first[code]].astype('datetime64[us]').item(),
+            end=(times[last[code]] + int(duration[last[code]])).astype('datetime64[us]').item(),
+            readings=int(last[code] - first[code] + 1),
+            observed_seconds=float(observed[code]),
+            behaviors=behaviors_spent,
+        )
+    return budgets
+
+
+def budgets_from_rows(results, max_gap: timedelta = DEFAULT_MAX_GAP) -> Dict[str, TimeBudget]:
+    """Time budgets from a ResultRows or DataFrame with SERIES_COLUMNS"""
+    if isinstance(results, pd.DataFrame):
+        return time_budgets(results['device_id'].to_numpy(), results['timestamp'].to_numpy(),
+                            results['predicted_behavior'].to_numpy(), max_gap)
+    return time_budgets(*(results.column(column) for column in SERIES_COLUMNS), max_gap=max_gap)
+
+
+class TimeBudgetEngine:
+    """Time budgets over any range, reading the behavior series from both storage tiers"""
+    
+    def __init__(self, db, max_gap: timedelta = DEFAULT_MAX_GAP):
+        # A database.connection.DatabaseConnection
+        self.db = db
+        self.max_gap = max_gap
+    
+    def load_series(self, device_ids: Optional[Sequence[str]], start: datetime = None,
+                    end: datetime = None) -> pd.DataFrame:
+        """device_id, timestamp and predicted_behavior of the devices' readings in [start, end)"""
+        return self.db.fetch_readings(start, end, device_ids, columns=SERIES_COLUMNS)
+    
+    def load_rows(self, device_ids: Optional[Sequence[str]], start: datetime = None,
+                  end: datetime = None) -> ResultRows:
+        """The series with each device's cow_name, in the columns of the chat time budget statement"""
+        series = self.load_series(device_ids, start, end)
+        names = {device.device_id: device.cow_name for device in self.db.devices.devices()}
+        device_column = series['device_id'].tolist()
+        behaviors = series['predicted_behavior']
+        rows = list(zip(
+            device_column,
+            [names.get(device_id) for device_id in device_column],
+            series['timestamp'].to_numpy().astype('datetime64[us]').tolist(),
+            behaviors.astype(object).where(behaviors.notna(), None).tolist(),
+        ))
+        return ResultRows(('device_id', 'cow_name', 'timestamp', 'predicted_behavior'), rows)
+    
+    def budgets(self, device_ids: Optional[Sequence[str]], start: datetime = None,
+                end: datetime = None) -> Dict[str, TimeBudget]:
+        return budgets_from_rows(self.load_series(device_ids, start, end), self.max_gap)
+    
+    def budget(self, device_id: str, start: datetime = None, end: datetime = None) -> Optional[TimeBudget]:
+        return self.budgets([device_id], start, end).get(device_id)
@@ -0,0 +1,182 @@
+"""
+instrumentation.py - Timing spans, counters and structured logs for the hot path
+
+A small in-process metrics registry: histograms of span durations and plain
+counters, both keyed by name plus labels. The registry renders itself in the
+Prometheus text exposition format (served at GET /metrics by api.py, or
+written to a file with export_to) and events are logged as one JSON object
+per line on the "cattle.metrics" logger.
+
+Usage:
+    from instrumentation import metrics
+
+    with metrics.span('cattle_chat_stage_seconds', stage='process') as span:
+        ...
+    metrics.inc('cattle_query_rows_total', len(rows))
+    print(metrics.render_prometheus())
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger('cattle.metrics')
+
+# Latency histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+METRIC_HELP = {
+    'cattle_chat_seconds': "End-to-end chat latency",
+    'cattle_chat_stage_seconds': "Chat latency per pipeline stage",
+    'cattle_chat_errors_total': "Chat turns that raised an error",
+    'cattle_query_seconds': "DatabaseConnection.execute_query latency by result cache outcome",
+    'cattle_query_rows_total': "Rows returned by execute_query",
+    'cattle_query_cache_hits_total': "execute_query calls answered from the result cache",
+    'cattle_query_cache_misses_total': "Cacheable execute_query calls that ran SQL",
+    'cattle_query_errors_total': "execute_query calls that failed",
+    'cattle_slow_queries_total': "Queries over the slow-query threshold",
+}
+
+INF_LABEL = 'le="+Inf"'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def log_event(event: str, level: int = logging.INFO, **fields):
+    """Log one structured event as a single JSON line"""
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({'event': event, **fields}, default=str))
+
+
+class Span:
+    """Times a with-block and observes it into a registry histogram"""
+    __slots__ = ('registry', 'name', 'labels', 'started', 'seconds')
+    
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+        self.seconds = 0.0
+    
+    @property
+    def ms(self) -> float:
+        return self.seconds * 1000
+    
+    def __enter__(self) -> 'Span':
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.started
+        self.registry.observe(self.name, self.seconds, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Thread-safe histograms and counters with Prometheus text rendering"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms: Dict[str, Dict[LabelKey, list]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._lock = threading.Lock()
+        self._exported_at = 0.0
+    
+    def span(self, name: str, **labels) -> Span:
+        return Span(self, name, labels)
+    
+    def observe(self, name: str, value: float, **labels):
+        """Add one observation to a histogram: [bucket counts..., sum, count]"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+    
+    def count(self, name: str, **labels) -> float:
+        """Current value of a counter, or a histogram's observation count"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if name in self._histograms:
+                state = self._histograms[name].get(key)
+                return state[-1] if state else 0
+            return self._counters.get(name, {}).get(key, 0)
+    
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+    
+    @staticmethod
+    def _labels(key: LabelKey, extra: str = '') -> str:
+        parts = [f'{name}="{_escape(value)}"' for name, value in key]
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+    
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{self._labels(key)} {value:g}")
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, state):
+                        cumulative += count
+                        le = f'le="{bound:g}"'
+                        lines.append(f"{name}_bucket{self._labels(key, le)} {cumulative}")
+                    lines.append(f"{name}_bucket{self._labels(key, INF_LABEL)} {state[-1]}")
+                    lines.append(f"{name}_sum{self._labels(key)} {state[-2]:.6f}")
+                    lines.append(f"{name}_count{self._labels(key)} {state[-1]}")
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path: str):
+        """Atomically replace path with the current exposition (for a node_exporter textfile collector)"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as handle:
+            handle.write(self.render_prometheus())
+        os.replace(temp_path, path)
+    
+    def export_to(self, path: Optional[str], interval_seconds: float = 15.0) -> bool:
+        """write_prometheus at most once per interval; returns whether it wrote"""
+        if not path:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._exported_at < interval_seconds:
+                return False
+            self._exported_at = now
+        self.write_prometheus(path)
+        return True
+
+
+# Process-wide registry shared by the chat pipeline, the database layer and the API
+metrics = MetricsRegistry()
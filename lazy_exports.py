@@ -0,0 +1,36 @@
+"""
+lazy_exports.py - PEP 562 lazy re-exports for the package __init__ modules
+
+A package lists its public names and the submodule defining each; the
+submodule is imported on the first attribute access and the value cached in
+the package, so importing the package loads none of its submodules.
+
+Usage (in a package's __init__.py):
+    from lazy_exports import lazy_exports
+
+    _EXPORTS = {'ChatEngine': 'engine'}
+    __all__ = list(_EXPORTS)
+    __getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+"""
+
+import sys
+from importlib import import_module
+from typing import Callable, Dict, Tuple
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable, Callable]:
+    """Module-level __getattr__ and __dir__ for a package whose public names load on first use"""
+
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(import_module(f".{exports[name]}", package), name)
+        # Cache it in the package, so later lookups skip __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        # dir() and autocompletion list the exports before they are loaded
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
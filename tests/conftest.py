@@ -0,0 +1,63 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import (  # noqa: E402
+    cattle_devices,
+    cattle_inference,
+    run_migrations,
+)
+
+DEVICES = [
+    {"device_id": "cow-101", "cow_id": "COW001", "cow_name": "Bessie"},
+    {"device_id": "cow-102", "cow_id": "COW002", "cow_name": "Daisy"},
+    {"device_id": "cow-103", "cow_id": "COW003", "cow_name": "Moobert"},
+]
+
+
+def make_reading(device_id, timestamp, **overrides):
+    reading = {
+        "device_id": device_id,
+        "timestamp": timestamp,
+        "predicted_behavior": "grazing",
+        "confidence": 0.9,
+        "temperature": 38.6,
+        "location_lat": 40.7128,
+        "location_lng": -74.0060,
+        "activity_level": 0.5,
+        "AccX": 0.1,
+        "AccY": -0.2,
+        "AccZ": 1.0,
+        "created_at": timestamp,
+    }
+    reading.update(overrides)
+    return reading
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cattle_test.db")
+
+
+@pytest.fixture
+def engine(db_path):
+    """Schema plus 3 cows with 24 hourly readings each"""
+    engine = create_engine(f"sqlite:///{db_path}")
+    run_migrations(engine)
+    now = datetime.now()
+    readings = [
+        make_reading(device["device_id"], now - timedelta(hours=hour),
+                     temperature=38.0 + hour / 10)
+        for device in DEVICES
+        for hour in range(24)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_devices), DEVICES)
+        conn.execute(insert(cattle_inference), readings)
+    yield engine
+    engine.dispose()
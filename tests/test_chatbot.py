@@ -0,0 +1,567 @@
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert
+
+from api import ChatAPIServer
+from chatbot import sql_generator, time_parser
+from chatbot.engine import ChatEngine
+from chatbot.nlp_parser import NLPQueryParser, get_nlp_parser
+from chatbot.query_processor import SimpleQueryProcessor
+from chatbot.sql_generator import SimpleSQLGenerator
+from chatbot.time_parser import TimeExpressionParser
+from database.archive import ArchiveCompactor
+from database.connection import DatabaseConnection
+from database.engines import get_reader_engine
+from database.ingest import BulkIngestor
+from database.models import cattle_geofences, cattle_inference, run_migrations
+from database.rows import ResultRows
+from database.synthetic import SyntheticHerd, load_synthetic_data
+from instrumentation import metrics
+from tests.conftest import make_reading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def chat_engine(engine, db_path):
+    return ChatEngine(DatabaseConnection(db_path))
+
+
+def test_engine_returns_answer_with_debug_info(chat_engine):
+    result = chat_engine.chat("What is the temperature of cow-101?")
+    assert result.error is None
+    assert result.answer == "🌡️ **Bessie** currently has a temperature of **38.0°C**"
+    assert result.processed["cow_id"] == "cow-101"
+    assert "cattle_latest" in result.sql
+    assert result.params == {"cow_id": "cow-101"}
+    assert result.data["cow_name"] == "Bessie"
+    json.dumps(result.to_dict())
+
+
+def test_engine_does_not_import_streamlit():
+    code = "import sys, chatbot.engine, api; assert 'streamlit' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_chat_pipeline_imports_lazily():
+    code = "\n".join([
+        "import sys",
+        "from chatbot import ChatEngine",
+        "from database import DatabaseConnection, models",
+        "assert not {'numpy', 'pandas', 'pyarrow', 'chatbot.main_controller'} & set(sys.modules)",
+        "assert models.get_engine.cache_info().currsize == 0",
+        "assert models.engine is models.get_engine()",
+        "import chatbot, database",
+        "assert set(chatbot.__all__) <= set(dir(chatbot)) and 'chatbot.main_controller' not in sys.modules",
+        "assert set(database.__all__) <= set(dir(database)) and 'database.time_budget' not in sys.modules",
+    ])
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_chat_records_stage_spans_cache_hits_and_slow_query_plans(engine, db_path, caplog):
+    metrics.reset()
+    chat_engine = ChatEngine(DatabaseConnection(db_path, slow_query_ms=0))
+    with caplog.at_level(logging.INFO, logger="cattle.metrics"):
+        first = chat_engine.chat("What was cow-101 doing in the last hour?")
+        second = chat_engine.chat("What was cow-101 doing in the last hour?")
+
+    assert set(first.timings) == {"process", "generate_sql", "execute", "respond", "total"}
+    assert first.timings["total"] >= first.timings["execute"]
+    for stage in ("process", "generate_sql", "execute", "respond"):
+        assert metrics.count("cattle_chat_stage_seconds", stage=stage) == 2
+    assert metrics.count("cattle_query_cache_misses_total") == 1
+    assert metrics.count("cattle_query_cache_hits_total") == 1
+    assert metrics.count("cattle_query_rows_total") == first.row_count + second.row_count
+
+    events = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [event["rows"] for event in events if event["event"] == "chat"] == [first.row_count] * 2
+    slow = [event for event in events if event["event"] == "slow_query"]
+    assert len(slow) == 1 and slow[0]["params"]["cow_id"] == "cow-101"
+    assert any("USING INDEX" in step for step in slow[0]["plan"])
+
+    exposition = metrics.render_prometheus()
+    assert "# TYPE cattle_chat_stage_seconds histogram" in exposition
+    assert 'cattle_chat_stage_seconds_count{stage="execute"} 2' in exposition
+    assert "cattle_query_cache_hits_total 1" in exposition
+
+
+def test_cow_names_resolve_through_the_device_registry(chat_engine):
+    assert chat_engine.chat("Is Daisy healthy?").answer == chat_engine.chat("Is cow-102 healthy?").answer
+    processed = chat_engine.query_processor.process_query("Where is moobert right now?")
+    assert (processed["cow_id"], processed["metric"]) == ("cow-103", "location")
+    assert chat_engine.query_processor.process_query("Which cows have a fever?")["cow_id"] is None
+
+
+def test_multi_cow_comparisons_run_one_in_query(chat_engine):
+    processor = chat_engine.query_processor
+    processed = processor.process_query("Compare the temperature of cow-101, cow-102 and cow-104")
+    assert processed["cow_ids"] == ["cow-101", "cow-102", "cow-104"]
+    assert processor.process_query("compare daisy and cow-101 behavior")["cow_ids"] == ["cow-102", "cow-101"]
+
+    result = chat_engine.chat("Compare the temperature of cow-101, cow-102 and cow-104")
+    assert "cattle_latest" in result.sql and "IN" in result.sql
+    assert result.params == {"cow_ids": ["cow-101", "cow-102", "cow-104"]} and result.row_count == 2
+    assert "| **Bessie** (cow-101) | 38.0 |" in result.answer
+    assert result.answer.endswith("❌ No data for cow-104")
+
+    # Rollup periods and raw windows share the summary columns, rows follow the question's order
+    week = chat_engine.chat("Compare Moobert and Bessie over the past week")
+    assert "cattle_rollup_daily" in week.sql and week.row_count == 2
+    assert week.answer.index("cow-103") < week.answer.index("cow-101")
+    hour = chat_engine.chat("compare cow-102 and cow-101 temperature in the last hour")
+    assert "cattle_inference" in hour.sql and "| Avg °C | Min °C | Max °C | Readings |" in hour.answer
+
+
+def test_chat_path_returns_rows_without_building_dataframes(chat_engine, monkeypatch):
+    questions = ["What is the temperature of cow-101?", "Is cow-102 healthy?",
+                 "What was cow-103 doing yesterday?", "Which cows have a fever?", "Where is cow-404?"]
+    expected = [chat_engine.chat(question).answer for question in questions]
+    statement, params = chat_engine.sql_generator.generate_query(
+        chat_engine.query_processor.process_query("Where is cow-101?"))
+    rows = chat_engine.db.fetch_rows(statement, params)
+    frame = chat_engine.db.execute_query(statement, params)
+    assert isinstance(rows, ResultRows) and rows.columns == tuple(frame.columns)
+    assert rows.records() == frame.to_dict("records")
+
+    chat_engine.db.cache.clear()
+
+    def no_frames(*args, **kwargs):
+        raise AssertionError("DataFrame built on the chat path")
+
+    monkeypatch.setattr(pd, "DataFrame", no_frames)
+    assert [chat_engine.chat(question).answer for question in questions] == expected
+
+
+def test_api_serves_concurrent_conversations(chat_engine):
+    async def post(port, payload):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode()
+        writer.write(b"POST /chat HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+                     + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(body)
+
+    async def scenario():
+        api = ChatAPIServer(chat_engine, max_workers=4)
+        server = await api.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            questions = [f"What is cow-10{1 + i % 3} doing?" for i in range(12)]
+            responses = await asyncio.gather(*(
+                post(port, {"message": question, "conversation_id": f"field-{i % 4}"})
+                for i, question in enumerate(questions)
+            ))
+            bad = await post(port, {"text": "missing message"})
+        finally:
+            await api.close()
+        return responses, bad, api
+
+    responses, bad, api = asyncio.run(scenario())
+    assert all(status == 200 for status, _ in responses)
+    assert all("currently" in payload["answer"] for _, payload in responses)
+    assert {payload["conversation_id"] for _, payload in responses} == {f"field-{i}" for i in range(4)}
+    assert len(api.conversations.history("field-0")) == 6
+    assert bad[0] == 400
+
+
+def test_chat_async_matches_sync_and_fans_out_for_unknown_cows(chat_engine, monkeypatch):
+    respond_threads = []
+    generate_response = chat_engine.response_generator.generate_response
+
+    def recording_generate_response(*args):
+        respond_threads.append(threading.get_ident())
+        return generate_response(*args)
+
+    monkeypatch.setattr(chat_engine.response_generator, "generate_response", recording_generate_response)
+
+    async def scenario():
+        return await asyncio.gather(
+            chat_engine.chat_async("Is cow-102 healthy?"),
+            chat_engine.chat_async("What is cow-999 doing?"),
+            chat_engine.db.execute_query_async("SELECT COUNT(*) AS n FROM cattle_inference"),
+        )
+
+    healthy, unknown, count = asyncio.run(scenario())
+    # Responses (registry and geofence lookups included) are built off the event loop
+    assert len(respond_threads) == 2 and threading.get_ident() not in respond_threads
+    assert healthy.answer == chat_engine.chat("Is cow-102 healthy?").answer
+    assert unknown.answer.endswith("Available cows: cow-101, cow-102, cow-103")
+    assert count.iloc[0]["n"] == 72
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the temperature of cow-101?", ("cow-101", "temperature", "current")),
+    ("Is cow_102 healthy?", ("cow-102", "health", "current")),
+    ("What was cow103 doing last week?", ("cow-103", "behavior", "last_week")),
+    ("Show me cow-104's AccX and AccY values yesterday", ("cow-104", "accelerometer", "yesterday")),
+    ("Was cow-105 grazing or resting in the past hour, and is it sick?", ("cow-105", "behavior", "last_hour")),
+    ("Do you know where cow-101 is?", ("cow-101", "location", "current")),
+    ("Hello there", (None, "general", "current")),
+    ("How is cow-101 doing today?", ("cow-101", "behavior", "today")),
+    ("What was cow-102's temperature over the last 3 days?", ("cow-102", "temperature", "range")),
+    ("What percentage of cows are sick?", (None, "health", "current")),
+    ("What share of the herd has a fever today?", (None, "temperature", "today")),
+    ("What fraction of the night was cow-101 lying down?", ("cow-101", "time_budget", "last_night")),
+    ("What percentage of the last 6 hours was cow-102 grazing?", ("cow-102", "time_budget", "range")),
+    ("What proportion of her time does cow-103 ruminate?", ("cow-103", "time_budget", "current")),
+    ("Compare cow-101 and cow-102 activity", ("cow-101", "activity", "current")),
+    ("What activity is cow-103 performing?", ("cow-103", "behavior", "current")),
+])
+def test_single_pass_matcher(question, expected):
+    processed = SimpleQueryProcessor().process_query(question)
+    assert (processed["cow_id"], processed["metric"], processed["time_context"]) == expected
+    assert processed["original_query"] == question
+
+
+# Wednesday 2 July 2025, 10:17:30
+NOW = datetime(2025, 7, 2, 10, 17, 30)
+
+
+@pytest.mark.parametrize("expression, start, end, label", [
+    ("in the last 3 days", datetime(2025, 6, 29, 10, 18), datetime(2025, 7, 2, 10, 18), "the last 3 days"),
+    ("over the past two hours", datetime(2025, 7, 2, 8, 18), datetime(2025, 7, 2, 10, 18), "the last 2 hours"),
+    ("since 6am", datetime(2025, 7, 2, 6), datetime(2025, 7, 2, 10, 18), "since 6am"),
+    ("since 6:30 pm", datetime(2025, 7, 1, 18, 30), datetime(2025, 7, 2, 10, 18), "since 6:30pm"),
+    ("since Monday", datetime(2025, 6, 30), datetime(2025, 7, 2, 10, 18), "since Monday"),
+    ("between Monday and Wednesday", datetime(2025, 6, 30), datetime(2025, 7, 3), "Monday–Wednesday"),
+    ("from Friday to Monday", datetime(2025, 6, 27), datetime(2025, 7, 1), "Friday–Monday"),
+    ("between 10pm and 2am", datetime(2025, 7, 1, 22), datetime(2025, 7, 2, 2), "10pm–2am"),
+    ("on Tuesday", datetime(2025, 7, 1), datetime(2025, 7, 2), "Tuesday"),
+    ("last Wednesday", datetime(2025, 6, 25), datetime(2025, 6, 26), "Wednesday"),
+    ("on 2025-06-01", datetime(2025, 6, 1), datetime(2025, 6, 2), "2025-06-01"),
+    ("this week", datetime(2025, 6, 30), datetime(2025, 7, 2, 10, 18), "this week"),
+])
+def test_time_expressions_resolve_to_absolute_bounds(expression, start, end, label):
+    assert TimeExpressionParser().parse(f"What was cow-101 doing {expression}?", now=NOW) == (start, end, label)
+
+
+def test_fixed_phrases_stay_keyword_contexts():
+    parser = TimeExpressionParser()
+    for question in ("Is cow-101 ok now?", "What did cow-101 do yesterday?", "cow-101 in the last hour"):
+        assert parser.parse(question, now=NOW) is None
+
+
+def test_impossible_dates_fall_back_to_the_default_context():
+    question = "What was cow-101 temperature on 2025-13-45?"
+    assert TimeExpressionParser().parse(question, now=NOW) is None
+    assert TimeExpressionParser().parse("cow-101 between 2025-02-30 and Monday", now=NOW) is None
+    processed = SimpleQueryProcessor().process_query(question)
+    assert (processed["metric"], processed["time_context"]) == ("temperature", "current")
+
+
+def _vm_steps(engine, statement, params) -> int:
+    """SQLite virtual machine instructions executed by one statement (in units of 100)"""
+    steps = []
+    with engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        raw.set_progress_handler(lambda: steps.append(1) and 0, 100)
+        try:
+            conn.execute(statement, params).fetchall()
+        finally:
+            raw.set_progress_handler(None, 100)
+    return len(steps)
+
+
+def test_parsed_windows_scan_the_window_not_the_table(tmp_path):
+    end = datetime(2025, 7, 2, 12)
+    processor, generator = SimpleQueryProcessor(), SimpleSQLGenerator()
+    questions = {"6h": "Which cows had a fever in the last 6 hours?",
+                 "24h": "Which cows had a fever in the last 24 hours?",
+                 "compare": "Compare cow-101 and cow-102 temperature in the last 90 minutes"}
+    steps = {}
+    for days in (2, 20):
+        path = str(tmp_path / f"herd_{days}d.db")
+        load_synthetic_data(path, SyntheticHerd(devices=40, days=days, interval_minutes=10, end=end))
+        engine = get_reader_engine(path)
+        for name, question in questions.items():
+            processed = processor.process_query(question)
+            window = processor.time_parser.parse(question, now=end)
+            processed["time_range"] = (window.start.isoformat(), window.end.isoformat())
+            statement, params = generator.generate_query(processed)
+            steps[days, name] = _vm_steps(engine, statement, params)
+            plan = " ".join(DatabaseConnection(path).explain_query(statement, params)["detail"])
+            assert "timestamp>? AND timestamp<?" in plan
+
+    for name in questions:
+        # Ten times the history costs (almost) nothing extra...
+        assert steps[20, name] < 1.2 * steps[2, name]
+    # ...while four times the window costs about four times as much
+    assert 3 * steps[20, "6h"] < steps[20, "24h"] < 5 * steps[20, "6h"]
+
+
+def test_process_queries_batch_matches_single_calls():
+    processor = SimpleQueryProcessor()
+    questions = ["Is cow-102 healthy?", "Where is cow-7?", "temp of cow-101 now"]
+    assert processor.process_queries(questions) == [processor.process_query(q) for q in questions]
+
+    processor.metric_keywords["location"].append("paddock")
+    processor.compile_matcher()
+    assert processor.extract_metric("Which paddock is cow-3 in?") == "location"
+
+
+class RecordingParser:
+    """Stands in for NLPQueryParser's interface and records what reaches it"""
+
+    def __init__(self, metric):
+        self.metric, self.single, self.batches = metric, [], []
+
+    def classify(self, query):
+        self.single.append(query)
+        return self.metric
+
+    def classify_many(self, queries, n_process=1):
+        self.batches.append((list(queries), n_process))
+        return [self.metric] * len(queries)
+
+
+def test_nlp_parser_only_sees_questions_the_keywords_are_unsure_about():
+    parser = RecordingParser("health")
+    processor = SimpleQueryProcessor(nlp_parser=parser)
+    sure = ["Is cow-101 running a fever?", "Where is cow-102?", "What was cow-103 doing yesterday?"]
+    unsure = ["Is cow-101 feeling unwell?",                # no metric keyword
+              "Is cow-102 hot, or just walking?",          # temperature and behavior tie
+              "Any attempt to spot cow-103 today?"]        # 'temp' inside 'attempt'
+    for question in sure:
+        assert "classifier" not in processor.process_query(question)
+    assert parser.single == []
+    for question in unsure:
+        processed = processor.process_query(question)
+        assert (processed["metric"], processed["classifier"]) == ("health", "nlp")
+    assert parser.single == unsure
+
+    # Logged questions: one nlp.pipe batch for the unsure ones, over the requested processes
+    batch = processor.process_queries(sure + unsure, n_process=4)
+    assert parser.batches == [(unsure, 4)]
+    assert [item["metric"] for item in batch] == ["temperature", "location", "behavior"] + ["health"] * 3
+    assert batch[3:] == [processor.process_query(question) for question in unsure]
+
+
+def test_nlp_parser_without_its_model_keeps_keyword_results(caplog):
+    parser = NLPQueryParser("no_such_spacy_model")
+    processor = SimpleQueryProcessor(nlp_parser=parser)
+    with caplog.at_level(logging.WARNING, logger="chatbot.nlp_parser"):
+        assert processor.process_query("Is cow-101 feeling unwell?")["metric"] == "general"
+        assert processor.process_queries(["Hello there", "Is cow-102 hot, or just walking?"])[1]["metric"] \
+            == "temperature"
+    assert parser.available is False
+    assert len(caplog.records) == 1
+    assert get_nlp_parser("no_such_spacy_model") is get_nlp_parser("no_such_spacy_model")
+
+
+def test_nlp_parser_reads_lemmas_and_objects():
+    pytest.importorskip("spacy")
+    parser = NLPQueryParser()
+    if parser.nlp is None:
+        pytest.skip("spaCy model en_core_web_sm is not installed")
+    assert "ner" not in parser.nlp.pipe_names
+    assert parser.classify("Is Daisy running a fever?") == "temperature"
+    assert parser.classify("Has cow-101 been lying down a lot?") == "behavior"
+    assert parser.classify("Is cow-102 feeling unwell?") == "health"
+    assert parser.classify_many(["How long did she graze?", "Hello there"]) == ["time_budget", None]
+
+
+def test_herd_health_screen_lists_every_flagged_cow(engine, chat_engine):
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference), [
+            make_reading("cow-101", now + timedelta(minutes=1), temperature=40.2),
+            make_reading("cow-103", now + timedelta(minutes=1), temperature=37.4),
+        ])
+
+    result = chat_engine.chat("Which cows have a fever?")
+    assert result.processed["scope"] == "herd"
+    assert result.row_count == 2
+    assert "🔥 **Bessie** (cow-101): high temperature, up to 40.2°C" in result.answer
+    assert "🥶 **Moobert** (cow-103): low temperature, down to 37.4°C" in result.answer
+
+    # Over the week every cow's history reaches 40.3°C, so all are flagged
+    assert chat_engine.chat("Any sick cows in the past week?").row_count == 3
+    assert chat_engine.chat("Is cow-102 healthy?").processed["scope"] == "cow"
+
+    strict = ChatEngine(chat_engine.db)
+    strict.sql_generator.temp_high = strict.response_generator.temp_high = 41.0
+    assert "Bessie" not in strict.chat("Which cows have a fever?").answer
+
+
+def test_alert_questions_read_the_anomaly_detectors_queue(db_path, chat_engine):
+    now = datetime.now().replace(second=0, microsecond=0)
+    readings = [
+        {"device_id": device_id, "timestamp": now - timedelta(minutes=10 * (40 - i)), "temperature": temperature}
+        for i in range(40) for device_id, temperature in (("cow-101", 38.5), ("cow-102", 39.3))
+    ]
+    readings.append({"device_id": "cow-101", "timestamp": now, "temperature": 39.6})
+    with BulkIngestor(db_path) as ingestor:
+        assert ingestor.ingest(readings).alerts == 1
+
+    result = chat_engine.chat("Any alerts?")
+    assert result.processed["metric"] == "alerts" and "cattle_alerts" in result.sql
+    assert result.answer == (
+        f"🚨 **1 alert** (the last 24 hours):\n- 🌡️ **Bessie** (cow-101) at {now:%Y-%m-%d %H:%M}: "
+        "temperature **39.6°C**, usually 38.5°C ± 0.1°C (+11.0σ)"
+    )
+    assert chat_engine.query_processor.process_query("any alerts today?")["time_context"] == "today"
+    assert chat_engine.chat("Is Daisy's temperature unusual?").answer == \
+        "✅ No unusual readings for cow-102 (the last 24 hours)"
+
+
+def test_time_budget_questions_run_lengths_over_the_behavior_series(engine, chat_engine):
+    result = chat_engine.chat("How long did Bessie graze in the last 6 hours?")
+    assert (result.processed["metric"], result.processed["behavior"]) == ("time_budget", "grazing")
+    assert result.answer == ("🐄 **Bessie** spent **6h 00m** grazing (100% of 6h 00m observed, the last 6 hours): "
+                             "1 bout, longest 6h 00m")
+
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference), [
+            make_reading("cow-102", now - timedelta(hours=hour, minutes=30), predicted_behavior="resting")
+            for hour in range(3)
+        ])
+    answer = chat_engine.chat("What fraction of the last 6 hours did the cows spend resting?").answer
+    assert answer.splitlines()[0] == "🐄 **Time budget of 3 cows** (the last 6 hours):"
+    assert answer.splitlines()[4] == "| **Daisy** (cow-102) | 1h 30m | 25% | 3 | 30m |"
+    assert "| **Bessie** (cow-101) | 0m | 0% | 0 | n/a |" in answer
+    assert chat_engine.chat("What was Daisy's time budget last night?").answer.startswith(
+        "🐄 **Daisy**'s time budget (last night, ")
+
+
+def freeze_chat_clock(monkeypatch, now: datetime):
+    """Pin the clock the time parser and SQL generator read, so windows don't follow the wall clock"""
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(time_parser, "datetime", FrozenDatetime)
+    monkeypatch.setattr(sql_generator, "datetime", FrozenDatetime)
+
+
+def test_raw_reading_answers_say_when_history_is_archived(tmp_path, monkeypatch):
+    end = datetime(2025, 7, 2, 12, 50)
+    freeze_chat_clock(monkeypatch, end)
+    path = str(tmp_path / "herd.db")
+    load_synthetic_data(path, SyntheticHerd(devices=5, days=4, interval_minutes=30, end=end))
+    assert ArchiveCompactor(path).compact(2, now=end).rows > 0
+    horizon = "2025-06-30"
+    chat_engine = ChatEngine(DatabaseConnection(path))
+
+    note = f"ℹ️ Readings before {horizon} are archived and not included"
+    assert chat_engine.chat("Which cows had a fever in the last 3 days?").answer.endswith(note)
+    assert note not in chat_engine.chat("Which cows had a fever in the last 6 hours?").answer
+    # Summaries come from the rollups, which keep the full history
+    week = chat_engine.chat("What was the temperature of cow-101 over the past week?")
+    assert week.data["readings"] == 4 * 48 and note not in week.answer
+
+
+def test_time_budgets_over_archived_days_read_both_tiers(tmp_path, monkeypatch):
+    end = datetime(2025, 7, 2, 12, 50)
+    freeze_chat_clock(monkeypatch, end)
+    path = str(tmp_path / "herd.db")
+    load_synthetic_data(path, SyntheticHerd(devices=5, days=4, interval_minutes=30, end=end))
+    chat_engine = ChatEngine(DatabaseConnection(path))
+    questions = ["How long did cow-101 graze in the last 3 days?",
+                 "Compare the time budget of cow-101 and cow-102 in the last 3 days",
+                 "What fraction of the last 3 days did the cows spend resting?"]
+    before = [chat_engine.chat(question) for question in questions]
+    assert all(result.row_count and "❌" not in result.answer for result in before)
+
+    assert ArchiveCompactor(path).compact(2, now=end).rows > 0
+    after = [chat_engine.chat(question) for question in questions]
+    assert [result.answer for result in after] == [result.answer for result in before]
+    assert [result.row_count for result in after] == [result.row_count for result in before]
+    # A window inside the hot tier keeps the prepared statement and its result cache
+    assert chat_engine.chat("How long did cow-101 graze in the last 6 hours?").row_count == 12
+
+
+def test_history_questions_are_answered_from_rollups(chat_engine):
+    result = chat_engine.chat("What was the temperature of cow-101 over the past week?")
+    assert "cattle_rollup_daily" in result.sql
+    assert result.row_count == 1 and result.data["readings"] == 24
+    assert "range 38.0–40.3°C, 24 readings" in result.answer
+
+    assert "peak 40.3°C" in chat_engine.chat("Was cow-102 sick last week?").answer
+    assert "grazing 100%" in chat_engine.chat("What was cow-103 doing last week?").answer
+
+
+def test_activity_questions_read_ingest_time_features(engine, db_path, chat_engine):
+    morning = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0)
+    readings = [
+        {"device_id": device_id, "timestamp": morning + timedelta(minutes=i),
+         "AccX": swing * (i % 2), "AccY": 0.0, "AccZ": 1.0}
+        for device_id, swing in (("cow-102", 0.02), ("cow-103", 1.0))
+        for i in range(60)
+    ]
+    with BulkIngestor(db_path) as ingestor:
+        ingestor.ingest(readings)
+
+    result = chat_engine.chat("How active was cow-103 this morning?")
+    assert result.processed["metric"] == "activity"
+    assert result.processed["time_context"] == "this_morning"
+    assert "cattle_acc_features" in result.sql and "cattle_inference" not in result.sql
+    assert result.data["feature_readings"] == 60
+    assert result.answer.startswith("🏃 **Moobert** was **very active** (this morning)")
+    assert "**mostly still**" in chat_engine.chat("how active was cow-102 this morning").answer
+
+    # Without a cow the most active animals come first
+    herd = chat_engine.chat("Which cows were most active this morning?")
+    assert herd.row_count == 2 and herd.data["device_id"] == "cow-103"
+
+
+def test_geofence_and_proximity_questions(engine, chat_engine):
+    now = datetime.now() + timedelta(minutes=1)
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_geofences), [{"name": "north paddock", "min_lat": 40.7128,
+                                                 "max_lat": 40.73, "min_lng": -74.03, "max_lng": -73.98}])
+        conn.execute(insert(cattle_inference), [
+            make_reading("cow-101", now, location_lat=40.7130, location_lng=-74.0060),
+            make_reading("cow-102", now, location_lat=40.7133, location_lng=-74.0060),
+            make_reading("cow-103", now, location_lat=40.7100, location_lng=-74.0060),
+        ])
+
+    outside = chat_engine.chat("Which cows are outside the north paddock?")
+    assert outside.processed["geofence"] == "north paddock"
+    assert outside.answer == "🚧 **1 cow** outside the north paddock:\n- **Moobert** (cow-103)"
+    assert chat_engine.chat("Is cow-101 in the north paddock?").answer == \
+        "✅ **Bessie** is **inside** the north paddock"
+    assert "Known geofences: north paddock" in chat_engine.chat("Any cows outside the south field?").answer
+
+    near = chat_engine.chat("Which cows are within 50 m of cow-101?")
+    assert near.processed["radius_m"] == 50.0
+    assert near.answer == "📍 **1 cow** within 50 m of **Bessie**:\n- **Daisy** (cow-102): 33 m away"
+    assert "Moobert" in chat_engine.chat("cows within 0.5 km of cow-101").answer
+    assert chat_engine.chat("Is anyone near cow-103?").answer == "📍 No other cows within 100 m of **Moobert**"
+
+
+def test_herd_screen_of_10k_collars_is_fast(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    run_migrations(engine)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference), [
+            make_reading(f"cow-{i}", now - timedelta(minutes=minute),
+                         temperature=39.9 if i % 100 == 0 else 38.6)
+            for i in range(10000) for minute in (0, 30)
+        ])
+    chat_engine = ChatEngine(DatabaseConnection(db_path))
+    chat_engine.chat("Which cows have a fever?")  # warm up connection and statement caches
+
+    started = time.perf_counter()
+    result = chat_engine.db.execute_query(*chat_engine.sql_generator.generate_query(
+        chat_engine.query_processor.process_query("Which cows are sick?")), use_cache=False)
+    answer = chat_engine.response_generator.generate_response(
+        chat_engine.query_processor.process_query("Which cows are sick?"), result)
+    elapsed = time.perf_counter() - started
+    assert len(result) == 100 and answer.startswith("⚠️ **100 cows**")
+    assert elapsed < 0.1
@@ -0,0 +1,658 @@
+import csv
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from chatbot.sql_generator import SimpleSQLGenerator
+from database import archive, models
+from database.anomaly import AnomalyDetector
+from database.archive import ArchiveCompactor
+from database.cache import QueryResultCache
+from database.connection import DatabaseConnection
+from database.features import backfill_features
+from database.ingest import BulkIngestor
+from database.models import (
+    SCHEMA_VERSION,
+    cattle_devices,
+    cattle_inference,
+    get_schema_version,
+    run_migrations,
+)
+from database.registry import DeviceRegistry
+from database.synthetic import SyntheticHerd, load_synthetic_data
+from database.time_budget import BehaviorBudget, TimeBudgetEngine, time_budgets
+from tests.conftest import make_reading
+from view import CattleDataExporter, ExportSummary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def processed(cow_id=None, metric="general", time_context="current"):
+    return {"cow_id": cow_id, "metric": metric, "time_context": time_context,
+            "original_query": ""}
+
+
+def test_latest_table_tracks_newest_reading(engine):
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference), [
+            make_reading("cow-101", now + timedelta(minutes=5), temperature=40.1),
+            # Late-arriving older reading must not replace the current state
+            make_reading("cow-101", now - timedelta(days=2), temperature=36.0),
+        ])
+        rows = conn.execute(text(
+            "SELECT device_id, temperature FROM cattle_latest ORDER BY device_id"
+        )).fetchall()
+    assert [row.device_id for row in rows] == ["cow-101", "cow-102", "cow-103"]
+    assert rows[0].temperature == 40.1
+
+
+def test_latest_backfill_matches_max_timestamp(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM cattle_latest"))
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA user_version = 0"))
+    run_migrations(engine)
+    with engine.connect() as conn:
+        latest = conn.execute(text(
+            "SELECT device_id, timestamp FROM cattle_latest ORDER BY device_id"
+        )).fetchall()
+        expected = conn.execute(text(
+            "SELECT device_id, MAX(timestamp) FROM cattle_inference "
+            "GROUP BY device_id ORDER BY device_id"
+        )).fetchall()
+    assert [tuple(row) for row in latest] == [tuple(row) for row in expected]
+
+
+def test_current_query_reads_latest_table(engine):
+    statement, params = SimpleSQLGenerator().generate_query(processed())
+    assert "cattle_latest" in statement.text
+    with engine.connect() as conn:
+        rows = conn.execute(statement, params).fetchall()
+    assert len(rows) == 3
+    assert {row.temperature for row in rows} == {38.0}
+
+
+def test_migrations_are_versioned_and_idempotent(engine):
+    assert run_migrations(engine) == SCHEMA_VERSION
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        indexes = {row[0] for row in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'cattle_inference'"
+        ))}
+    assert {"ix_cattle_inference_device_ts", "ix_cattle_inference_ts"} <= indexes
+
+
+@pytest.mark.parametrize("time_context", ["today", "yesterday", "last_hour", "last_week"])
+@pytest.mark.parametrize("cow_id", [None, "cow-101"])
+def test_time_filters_use_index_range_scans(engine, cow_id, time_context):
+    # Location has no rollup, so every time context reads raw readings
+    statement, params = SimpleSQLGenerator().generate_query(
+        processed(cow_id, "location", time_context=time_context))
+    assert "DATE(" not in statement.text
+    params = {key: str(value) for key, value in params.items()}
+    with engine.connect() as conn:
+        plan = [row.detail for row in conn.execute(text(f"EXPLAIN QUERY PLAN {statement.text}"), params)]
+    inference_steps = [step for step in plan if step.split()[1] == "ci"]
+    assert inference_steps and all(step.startswith("SEARCH") for step in inference_steps), plan
+    assert any("timestamp>? AND timestamp<?" in step for step in inference_steps), plan
+
+
+def test_statements_are_prepared_once_per_shape(engine):
+    generator = SimpleSQLGenerator()
+    first, first_params = generator.generate_query(processed("cow-101", "temperature", "last_week"))
+    second, second_params = generator.generate_query(processed("cow-102", "temperature", "last_week"))
+    assert first is second
+    assert "cow-10" not in first.text
+    assert (first_params["cow_id"], second_params["cow_id"]) == ("cow-101", "cow-102")
+    assert len(generator._statements) == 1
+
+    with engine.connect() as conn:
+        rows = conn.execute(first, first_params).fetchall()
+        assert len(rows) == 1 and rows[0].device_id == "cow-101"
+        # Bound parameters cannot break out of the statement
+        injected = processed("cow-101' OR '1'='1", "temperature")
+        statement, params = generator.generate_query(injected)
+        assert conn.execute(statement, params).fetchall() == []
+
+
+def test_rollups_match_raw_readings(engine):
+    generator = SimpleSQLGenerator()
+    now = datetime.now()
+    with engine.begin() as conn:
+        # Readings spanning several days, some without temperature or behavior
+        conn.execute(insert(cattle_inference), [
+            make_reading("cow-101", now - timedelta(hours=7 * i), temperature=37.5 + (i % 9) / 4,
+                         predicted_behavior=("resting", "walking", None)[i % 3], AccX=(i % 4) / 10)
+            for i in range(1, 30)
+        ] + [make_reading("cow-101", now - timedelta(days=1), temperature=None)])
+
+    for time_context in ("yesterday", "last_week"):
+        statement, params = generator.generate_query(processed("cow-101", "general", time_context))
+        with engine.connect() as conn:
+            summary = conn.execute(statement, params).mappings().one()
+            raw = conn.execute(text(
+                "SELECT COUNT(*) AS readings, AVG(temperature) AS temp_mean, "
+                "MIN(temperature) AS temp_min, MAX(temperature) AS temp_max, "
+                "AVG(AccX) AS accx_mean, SUM(predicted_behavior = 'resting') AS resting_count "
+                "FROM cattle_inference WHERE device_id = 'cow-101' "
+                "AND timestamp >= :start AND timestamp < :end"
+            ), {key: str(params[key]) for key in ("start", "end")}).mappings().one()
+        assert summary["readings"] == raw["readings"] > 0
+        assert summary["resting_count"] == raw["resting_count"]
+        for column in ("temp_mean", "temp_min", "temp_max", "accx_mean"):
+            assert summary[column] == pytest.approx(raw[column])
+
+
+@pytest.mark.parametrize("cow_id", [None, "cow-101"])
+def test_history_questions_read_rollups(engine, cow_id):
+    statement, params = SimpleSQLGenerator().generate_query(processed(cow_id, "temperature", "last_week"))
+    assert "cattle_inference" not in statement.text
+    params = {key: str(value) for key, value in params.items()}
+    with engine.connect() as conn:
+        plan = [row.detail for row in conn.execute(text(f"EXPLAIN QUERY PLAN {statement.text}"), params)]
+    rollup_steps = [step for step in plan if "cattle_rollup" in step]
+    assert len(rollup_steps) == 3 and all(step.startswith("SEARCH") for step in rollup_steps), plan
+
+
+def test_location_rtree_follows_latest_positions(engine, db_path):
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference), [
+            make_reading("cow-101", now + timedelta(minutes=1), location_lat=40.80, location_lng=-74.10),
+            # Stale reading: neither cattle_latest nor the index may move back
+            make_reading("cow-102", now - timedelta(days=3), location_lat=41.00, location_lng=-75.00),
+        ])
+        indexed = conn.execute(text(
+            "SELECT ci.device_id, r.min_lat, r.min_lng FROM cattle_location_rtree r "
+            "JOIN cattle_latest ci ON ci.rowid = r.id ORDER BY ci.device_id"
+        )).fetchall()
+        assert conn.execute(text("SELECT COUNT(*) FROM cattle_location_rtree")).scalar() == 3
+    assert [row.device_id for row in indexed] == ["cow-101", "cow-102", "cow-103"]
+    # R*Tree coordinates are 32-bit floats
+    assert (indexed[0].min_lat, indexed[0].min_lng) == pytest.approx((40.80, -74.10), abs=1e-4)
+    assert (indexed[1].min_lat, indexed[1].min_lng) == pytest.approx((40.7128, -74.0060), abs=1e-4)
+
+
+@pytest.mark.parametrize("question", [
+    processed("cow-101", "proximity") | {"radius_m": 50.0},
+    processed(None, "geofence") | {"geofence": "north paddock", "geofence_side": "inside"},
+    processed(None, "geofence") | {"geofence": "north paddock", "geofence_side": "outside"},
+])
+def test_spatial_questions_probe_the_rtree(engine, db_path, question):
+    statement, params = SimpleSQLGenerator().generate_query(question)
+    db = DatabaseConnection(db_path)
+    with db.get_engine().connect() as conn:
+        plan = [row.detail for row in conn.execute(text(f"EXPLAIN QUERY PLAN {statement.text}"), params)]
+    rtree_steps = [step for step in plan if step.split()[1] == "r"]
+    assert rtree_steps and all("VIRTUAL TABLE INDEX" in step for step in rtree_steps), plan
+    assert not any(step.startswith("SCAN ci") for step in plan if question["metric"] == "proximity"), plan
+
+
+def test_sample_data_has_accelerometer_features_and_baselines(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sample.db'}")
+    monkeypatch.setattr(models, "get_engine", lambda: engine)
+    models.create_sample_data()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM cattle_acc_features")).scalar() == 125
+        detector = AnomalyDetector.from_connection(conn.connection.driver_connection)
+    assert len(detector) == 5 and detector.baseline("cow-103")["temperature"]["count"] == 25
+    db = DatabaseConnection(str(tmp_path / "sample.db"))
+    assert db.fetch_rows(*SimpleSQLGenerator().generate_query(processed("cow-103", "activity"))).rows
+    engine.dispose()
+
+
+def test_synthetic_herd_is_seeded_and_loads_consistently(tmp_path):
+    herd = SyntheticHerd(devices=20, days=2, interval_minutes=60, seed=7, end=datetime(2025, 7, 1, 12))
+    paths = [str(tmp_path / f"herd_{i}.db") for i in range(2)]
+    for path in paths:
+        stats = load_synthetic_data(path, herd, chunk_rows=200)
+        assert (stats.rows, stats.features) == (herd.rows, herd.rows) == (960, 960)
+
+    readings = []
+    for path in paths:
+        with sqlite3.connect(path) as conn:
+            readings.append(conn.execute("SELECT * FROM cattle_inference ORDER BY id").fetchall())
+    assert [row[:-1] for row in readings[0]] == [row[:-1] for row in readings[1]]
+
+    conn = sqlite3.connect(paths[0])
+    assert conn.execute("SELECT COUNT(*) FROM cattle_anomaly_state").fetchone()[0] == 20
+    assert conn.execute("SELECT COUNT(*) FROM cattle_alerts").fetchone()[0] == stats.alerts
+    assert conn.execute("SELECT MIN(timestamp) >= '2025-06-29 12:00', MAX(timestamp) <= '2025-07-01 12:00:00' "
+                        "FROM cattle_inference").fetchone() == (1, 1)
+    assert conn.execute("SELECT MIN(temperature) > 37, MAX(temperature) < 41.5 FROM cattle_inference").fetchone() == (1, 1)
+    # Derived tables are rebuilt once and match the readings
+    assert conn.execute("SELECT SUM(readings) FROM cattle_rollup_hourly").fetchone()[0] == 960
+    assert conn.execute("SELECT SUM(readings) FROM cattle_rollup_daily").fetchone()[0] == 960
+    assert conn.execute("SELECT COUNT(*) FROM cattle_acc_features").fetchone()[0] == 960
+    assert conn.execute(
+        "SELECT COUNT(*) FROM cattle_latest l WHERE timestamp = "
+        "(SELECT MAX(timestamp) FROM cattle_inference ci WHERE ci.device_id = l.device_id)"
+    ).fetchone()[0] == 20
+    assert conn.execute("SELECT COUNT(*) FROM cattle_location_rtree").fetchone()[0] == 20
+    # Triggers and indexes are back for regular ingest
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert {"trg_cattle_latest_insert", "trg_cattle_rollup_insert"} <= triggers
+    conn.close()
+
+
+def test_synthetic_fever_episodes_raise_temperature_alerts(tmp_path):
+    path = str(tmp_path / "herd.db")
+    herd = SyntheticHerd(devices=40, days=4, interval_minutes=30, fever_rate=0.25, end=datetime(2025, 7, 1, 12))
+    stats = load_synthetic_data(path, herd)
+    with sqlite3.connect(path) as conn:
+        fevers = conn.execute("SELECT COUNT(DISTINCT device_id), MIN(value) FROM cattle_alerts "
+                              "WHERE metric = 'temperature' AND zscore > 0").fetchone()
+        assert conn.execute("SELECT COUNT(*) FROM cattle_alerts").fetchone()[0] == stats.alerts
+    assert fevers[0] >= 5 and fevers[1] > 39.3
+    assert load_synthetic_data(str(tmp_path / "quiet.db"), herd, detect_anomalies=False).alerts == 0
+
+
+def test_archive_moves_old_days_to_parquet_and_reads_federate(tmp_path, monkeypatch):
+    end = datetime(2025, 7, 2, 12)
+    path = str(tmp_path / "herd.db")
+    load_synthetic_data(path, SyntheticHerd(devices=10, days=10, interval_minutes=30, end=end))
+    db = DatabaseConnection(path)
+    window = (end - timedelta(days=9), end - timedelta(days=1))
+    everything, before = db.fetch_readings(), db.fetch_readings(*window, device_ids=["cow-101", "cow-103"])
+
+    with sqlite3.connect(path) as conn:
+        features = conn.execute("SELECT COUNT(*) FROM cattle_acc_features").fetchone()[0]
+    assert features == len(everything)
+    stats = ArchiveCompactor(path).compact(3, now=end)
+    assert stats.partitions == 7 and stats.rows == 3120
+    assert sorted(os.listdir(tmp_path / "herd_archive"))[0] == "date=2025-06-22"
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*), MIN(timestamp) >= '2025-06-29' FROM cattle_inference").fetchone() \
+            == (len(everything) - 3120, 1)
+        assert conn.execute("SELECT COUNT(*), MIN(timestamp) >= '2025-06-29' FROM cattle_acc_features").fetchone() \
+            == (features - 3120, 1)
+        # Rollups keep the full history, so summaries of archived days still come from SQLite
+        assert conn.execute("SELECT SUM(readings) FROM cattle_rollup_daily").fetchone()[0] == len(everything)
+
+    opened = []
+    read_table = archive.pq.read_table
+
+    def recording_read_table(paths, **kwargs):
+        opened.append(paths)
+        return read_table(paths, **kwargs)
+
+    monkeypatch.setattr(archive.pq, "read_table", recording_read_table)
+    pd.testing.assert_frame_equal(db.fetch_readings(*window, device_ids=["cow-101", "cow-103"]), before)
+    assert [os.path.basename(os.path.dirname(file)) for file in opened[0]] == \
+        [f"date=2025-06-{day}" for day in range(23, 29)]
+    opened.clear()
+    assert len(db.fetch_readings(end - timedelta(days=1), end)) == 480 and not opened
+    pd.testing.assert_frame_equal(db.fetch_readings(), everything)
+
+    # A second run finds nothing new; a rerun over an already archived day does not duplicate it
+    assert ArchiveCompactor(path).compact(3, now=end).rows == 0
+    day = datetime(2025, 6, 28)
+    db.archive.write_day(day, db.fetch_readings(day, day + timedelta(days=1)))
+    pd.testing.assert_frame_equal(db.fetch_readings(), everything)
+
+
+def write_readings_csv(path, count, devices=("cow-201", "cow-202", "cow-203")):
+    start = datetime(2025, 7, 1)
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["device_id", "timestamp", "predicted_behavior", "temperature",
+                         "AccX", "AccY", "AccZ"])
+        for i in range(count):
+            writer.writerow([devices[i % len(devices)], start + timedelta(seconds=i),
+                             "grazing", 38.5, 0.1, 0.2, 0.98])
+
+
+def test_device_registry_reloads_only_when_devices_change(engine, db_path):
+    registry = DeviceRegistry(db_path)
+    assert registry.device_ids() == ["cow-101", "cow-102", "cow-103"]
+    assert registry.resolve("BESSIE").device_id == "cow-101"
+    assert registry.resolve("cow003").device_id == "cow-103"
+    assert registry.get("cow-102").cow_name == "Daisy"
+    assert [device.device_id for device in registry.find("compare daisy's and moobert's temps")] == \
+        ["cow-102", "cow-103"]
+
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference), [make_reading("cow-101", datetime.now())])
+    assert registry.get("cow-104") is None and registry.loads == 1
+
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_devices), [{"device_id": "cow-104", "cow_id": "COW004", "cow_name": "Luna Belle"}])
+        conn.execute(text("UPDATE cattle_devices SET cow_name = 'Bess' WHERE device_id = 'cow-101'"))
+    assert registry.resolve("luna belle").device_id == "cow-104"
+    assert registry.resolve("Bessie") is None and registry.resolve("bess").device_id == "cow-101"
+    assert registry.loads == 2
+
+
+def test_bulk_ingest_streams_csv_and_jsonl(tmp_path, db_path):
+    csv_path = tmp_path / "readings.csv"
+    write_readings_csv(csv_path, 2500)
+    jsonl_path = tmp_path / "readings.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"device_id": "cow-201", "timestamp": "2025-08-01T06:00:00Z",
+                    "temperature": 39.9}) + "\n"
+        + json.dumps({"timestamp": "2025-08-01T06:00:00"}) + "\n"
+    )
+    with BulkIngestor(db_path, batch_size=1000) as ingestor:
+        csv_stats = ingestor.ingest_file(str(csv_path))
+        jsonl_stats = ingestor.ingest_file(str(jsonl_path))
+        journal_mode = ingestor.conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    assert (csv_stats.rows, csv_stats.batches) == (2500, 3)
+    assert csv_stats.rows_per_second > 0
+    assert (jsonl_stats.rows, jsonl_stats.rejected) == (1, 1)
+    assert journal_mode == "wal"
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM cattle_inference").fetchone()[0] == 2501
+    latest = dict(conn.execute("SELECT device_id, temperature FROM cattle_latest"))
+    assert latest["cow-201"] == 39.9
+
+
+def test_ingest_computes_features_across_batches_and_devices(tmp_path):
+    start = datetime(2025, 7, 1, 6)
+    readings = [
+        {"device_id": f"cow-20{i % 3}", "timestamp": start + timedelta(seconds=i),
+         "AccX": 0.3 * ((i // 3) % 4), "AccY": -0.2, "AccZ": 1.0}
+        for i in range(600)
+    ] + [{"device_id": "cow-200", "timestamp": start, "temperature": 38.4}]
+
+    features = {}
+    for batch_size in (50, 10000):
+        path = str(tmp_path / f"features_{batch_size}.db")
+        with BulkIngestor(path, batch_size=batch_size, feature_window=4) as ingestor:
+            stats = ingestor.ingest(readings)
+        assert (stats.rows, stats.features) == (601, 600)
+        conn = sqlite3.connect(path)
+        features[batch_size] = conn.execute(
+            "SELECT ci.device_id, ci.timestamp, f.magnitude, f.odba, f.vedba, f.pitch, f.roll, "
+            "f.magnitude_var FROM cattle_acc_features f "
+            "JOIN cattle_inference ci ON ci.id = f.inference_id ORDER BY ci.id"
+        ).fetchall()
+        conn.close()
+    assert [row[:2] for row in features[50]] == [row[:2] for row in features[10000]]
+    assert [row[2:] for row in features[50]] == [pytest.approx(row[2:]) for row in features[10000]]
+
+    # cow-200 cycles AccX 0, 0.3, 0.6, 0.9: the 4-reading window mean is 0.45,
+    # so ODBA is |AccX - 0.45| once the window is full
+    steady = [row for row in features[50] if row[0] == "cow-200"][12:16]
+    assert [row[3] for row in steady] == pytest.approx([0.45, 0.15, 0.15, 0.45])
+    assert all(row[4] == pytest.approx(row[3]) for row in steady)
+
+    # Backfilling stored readings produces the same features as ingest
+    path = str(tmp_path / "features_10000.db")
+    with create_engine(f"sqlite:///{path}").begin() as conn:
+        conn.execute(text("DELETE FROM cattle_acc_features"))
+        assert backfill_features(conn, window=4) == 600
+    conn = sqlite3.connect(path)
+    backfilled = [row[0] for row in conn.execute("SELECT odba FROM cattle_acc_features ORDER BY inference_id")]
+    assert backfilled == pytest.approx([row[3] for row in features[10000]])
+
+
+def test_anomaly_detector_is_welford_then_ewma_and_batches_like_single_readings():
+    rng = np.random.default_rng(3)
+    temperatures = rng.normal(38.6, 0.3, 40)
+    detector = AnomalyDetector(min_samples=1000)
+    for value in temperatures:
+        detector.observe(["cow-1"], ["2025-07-01 00:00:00"], [[value, np.nan, np.nan]])
+    baseline = detector.baseline("cow-1")
+    assert baseline["temperature"]["mean"] == pytest.approx(temperatures.mean())
+    assert baseline["temperature"]["std"] == pytest.approx(temperatures.std())
+    assert baseline["activity"]["count"] == 0
+
+    count = 3000
+    device_ids = [f"cow-{i % 60}" for i in range(count)]
+    timestamps = [str(datetime(2025, 7, 1) + timedelta(minutes=10 * (i // 60))) for i in range(count)]
+    values = np.column_stack([rng.normal(38.6, 0.2, count), rng.uniform(0.2, 0.8, count),
+                              rng.normal(1.0, 0.05, count)])
+    values[2500, 0], values[2600, 2] = 41.0, np.nan
+    batched, single = AnomalyDetector(), AnomalyDetector()
+    alerts = batched.observe(device_ids, timestamps, values)
+    one_by_one = [alert for i in range(count)
+                  for alert in single.observe(device_ids[i:i + 1], timestamps[i:i + 1], values[i:i + 1])]
+    assert alerts == one_by_one
+    assert [(alert.device_id, alert.metric, alert.value) for alert in alerts] == [("cow-40", "temperature", 41.0)]
+    assert np.allclose(batched.mean[:60], single.mean[:60]) and np.allclose(batched.var[:60], single.var[:60])
+    assert batched.count.shape[0] >= 60 and batched.state_rows() == single.state_rows()
+
+
+def test_ingest_raises_alerts_against_each_cows_own_baseline(db_path):
+    start = datetime(2025, 7, 1)
+
+    def readings(temperatures, offset):
+        return [{"device_id": device_id, "timestamp": start + timedelta(minutes=30 * (offset + i)),
+                 "temperature": temperature, "activity_level": 0.5, "AccX": 0.1, "AccY": 0.2, "AccZ": 0.98}
+                for i, temperature in enumerate(temperatures) for device_id, temperature in temperature.items()]
+
+    baseline = [{"cow-201": 38.4 + 0.1 * (i % 3), "cow-202": 39.2 + 0.1 * (i % 3)} for i in range(48)]
+    with BulkIngestor(db_path, batch_size=20) as ingestor:
+        assert ingestor.ingest(readings(baseline, 0)).alerts == 0
+
+    # A new ingestor resumes the saved baselines: 39.3°C is a fever for cow-201 but normal for cow-202,
+    # and a fever that persists raises one alert per cooldown, not one per reading
+    with BulkIngestor(db_path) as ingestor:
+        assert len(ingestor.detector) == 2
+        stats = ingestor.ingest(readings([{"cow-201": 39.3, "cow-202": 39.3}] * 2, 48))
+    assert stats.alerts == 1
+    with sqlite3.connect(db_path) as conn:
+        alert = conn.execute("SELECT device_id, metric, value, expected, zscore FROM cattle_alerts").fetchall()
+        assert conn.execute("SELECT COUNT(*) FROM cattle_anomaly_state").fetchone()[0] == 2
+    assert alert == [("cow-201", "temperature", 39.3, pytest.approx(38.5), pytest.approx(8.0))]
+
+
+def test_time_budget_runs_are_weighted_by_the_time_between_readings():
+    start = datetime(2025, 7, 1)
+    series = [("cow-a", 0, "grazing"), ("cow-a", 10, "grazing"), ("cow-a", 20, "resting"), ("cow-a", 30, None),
+              ("cow-a", 40, "resting"), ("cow-a", 180, "resting"), ("cow-a", 190, "resting"),
+              ("cow-b", 0, "walking"), ("cow-b", 5, "walking")]
+    # Any order; the 40 -> 180 minute outage counts as the typical 10 minutes and splits the bout
+    device_ids, minutes, behaviors = zip(*reversed(series))
+    timestamps = [str(start + timedelta(minutes=minute)) for minute in minutes]
+    budgets = time_budgets(device_ids, timestamps, behaviors)
+
+    cow_a = budgets["cow-a"]
+    assert (cow_a.start, cow_a.end, cow_a.readings, cow_a.observed_seconds) == \
+        (start, start + timedelta(minutes=200), 7, 70 * 60)
+    assert cow_a.behaviors == [
+        BehaviorBudget("resting", 40 * 60, 4 / 7, 3, 20 * 60),
+        BehaviorBudget("grazing", 20 * 60, 2 / 7, 1, 20 * 60),
+        BehaviorBudget("unknown", 10 * 60, 1 / 7, 1, 10 * 60),
+    ]
+    assert cow_a.get("walking") is None
+    assert budgets["cow-b"].behaviors == [BehaviorBudget("walking", 15 * 60, 1.0, 1, 15 * 60)]
+
+    # Three months of one-minute readings for one cow
+    count = 90 * 24 * 60
+    times = np.datetime64(start, "us") + np.arange(count) * np.timedelta64(60, "s")
+    labels = np.array(["grazing", "resting", "ruminating"])[np.random.default_rng(5).integers(0, 3, count)]
+    started = time.perf_counter()
+    budget = time_budgets(["cow-a"] * count, times, labels)["cow-a"]
+    assert time.perf_counter() - started < 0.5
+    assert budget.observed_seconds == count * 60
+    assert sum(spent.bouts for spent in budget.behaviors) == 1 + np.count_nonzero(labels[1:] != labels[:-1])
+
+
+def test_time_budget_engine_reads_archived_and_recent_readings(tmp_path):
+    end = datetime(2025, 7, 2, 12)
+    path = str(tmp_path / "herd.db")
+    load_synthetic_data(path, SyntheticHerd(devices=3, days=6, interval_minutes=30, end=end))
+    budgets = TimeBudgetEngine(DatabaseConnection(path))
+    before = budgets.budgets(None)
+    assert ArchiveCompactor(path).compact(2, now=end).rows > 0
+    assert budgets.budgets(None) == before
+    window = (end - timedelta(days=5), end - timedelta(days=1))
+    assert budgets.budget("cow-101", *window).readings == 4 * 48
+
+
+def test_bulk_ingest_memory_is_independent_of_input_size(tmp_path, db_path):
+    peaks = []
+    for count in (5000, 20000):
+        csv_path = tmp_path / f"readings_{count}.csv"
+        write_readings_csv(csv_path, count)
+        with BulkIngestor(db_path, batch_size=1000) as ingestor:
+            ingestor.connect()
+            tracemalloc.start()
+            ingestor.ingest_file(str(csv_path))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    assert peaks[1] < peaks[0] * 1.5
+
+
+@pytest.mark.parametrize("export_format", ["csv", "parquet", "arrow"])
+def test_export_streams_chunks_to_disk(engine, db_path, tmp_path, export_format, capsys):
+    exporter = CattleDataExporter(db_path)
+    filename = str(tmp_path / f"export.{export_format}")
+    assert exporter.export_inference_data(filename, format=export_format, chunk_size=10) == filename
+    expected_chunks = [10] * 7 + [2]
+
+    if export_format == "csv":
+        exported = pd.read_csv(filename)
+        chunks = [len(chunk) for chunk in exporter.iter_query_chunks("SELECT * FROM cattle_inference", 10)]
+    elif export_format == "parquet":
+        import pyarrow.parquet as pq
+        exported = pd.read_parquet(filename)
+        assert isinstance(exported["predicted_behavior"].dtype, pd.CategoricalDtype)
+        assert exported["AccX"].dtype == "float32"
+        metadata = pq.ParquetFile(filename).metadata
+        chunks = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    else:
+        import pyarrow as pa
+        with pa.ipc.open_stream(filename) as reader:
+            batches = list(reader)
+        exported = pa.Table.from_batches(batches).to_pandas()
+        chunks = [batch.num_rows for batch in batches]
+    assert chunks == expected_chunks
+    assert len(exported) == 72
+    assert "Total Records: 72" in capsys.readouterr().out
+
+
+def test_export_includes_archived_readings(tmp_path, capsys):
+    end = datetime(2025, 7, 2, 12)
+    path = str(tmp_path / "herd.db")
+    load_synthetic_data(path, SyntheticHerd(devices=4, days=5, interval_minutes=60, end=end))
+    everything = DatabaseConnection(path).fetch_readings()
+    assert ArchiveCompactor(path).compact(2, now=end).rows > 0
+
+    filename = str(tmp_path / "export.csv")
+    assert CattleDataExporter(path).export_inference_data(filename, chunk_size=25) == filename
+    exported = pd.read_csv(filename)
+    assert sorted(exported["id"]) == sorted(everything["id"])
+    assert exported["timestamp"].is_monotonic_decreasing
+    assert exported["cow_name"].notna().all()
+    assert f"Total Records: {len(everything)}" in capsys.readouterr().out
+
+
+def test_incremental_summary_matches_full_frame():
+    frame = pd.DataFrame({
+        "timestamp": ["2025-07-01 10:00:00", "2025-07-02 10:00:00", "2025-07-03 10:00:00"],
+        "device_id": ["cow-101", "cow-102", "cow-101"],
+        "cow_name": ["Bessie", "Daisy", "Bessie"],
+        "predicted_behavior": ["grazing", "resting", "grazing"],
+        "temperature": [38.5, None, 39.5],
+        "activity_level": [0.2, 0.4, 0.6],
+        "AccX": [0.1, -0.3, 0.2], "AccY": [0.0, 0.1, 0.2], "AccZ": [1.0, 0.9, 1.1],
+    })
+    summary = ExportSummary().update(frame.iloc[:1]).update(frame.iloc[1:])
+    assert summary.total == 3
+    assert (summary.min_timestamp, summary.max_timestamp) == ("2025-07-01 10:00:00", "2025-07-03 10:00:00")
+    assert summary.device_counts == {"cow-101": 2, "cow-102": 1}
+    assert summary.mean("temperature") == pytest.approx(frame["temperature"].mean())
+    assert summary.range("AccX") == (-0.3, 0.2)
+
+
+def test_result_cache_hits_until_new_readings_arrive(engine, db_path):
+    db = DatabaseConnection(db_path)
+    statement, params = SimpleSQLGenerator().generate_query(processed("cow-102", "health"))
+    first = db.execute_query(statement, params)
+    assert db.execute_query(statement, params) is first
+    assert db.cache_stats()["hits"] == 1 and db.cache_stats()["misses"] == 1
+
+    with engine.begin() as conn:
+        conn.execute(insert(cattle_inference),
+                     [make_reading("cow-102", datetime.now() + timedelta(minutes=1), temperature=40.4)])
+    fresh = db.execute_query(statement, params)
+    assert fresh.iloc[0]["temperature"] == 40.4
+    assert db.cache_stats()["invalidations"] == 1
+
+
+def test_result_cache_evicts_lru_and_expired_entries():
+    cache = QueryResultCache(max_entries=2, ttl_seconds=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, 1, key.upper())
+    assert cache.get("a", 1) is None
+    assert cache.get("c", 1) == "C"
+    assert cache.stats()["evictions"] == 1
+
+    cache.ttl_seconds = -1
+    assert cache.get("c", 1) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 2, "invalidations": 0, "size": 1}
+    assert QueryResultCache.make_key("SELECT  1\n FROM t", {"b": 2, "a": 1}) == \
+        QueryResultCache.make_key("SELECT 1 FROM t", {"a": 1, "b": 2})
+
+
+WRITER_SCRIPT = """
+import sys, time
+from datetime import datetime, timedelta
+from database.ingest import BulkIngestor
+start = datetime.now() - timedelta(days=1)
+readings = ({"device_id": f"cow-9{i % 50:02d}", "timestamp": start + timedelta(seconds=i),
+             "predicted_behavior": "grazing", "temperature": 38.6, "AccX": 0.1, "AccY": 0.0, "AccZ": 1.0}
+            for i in range(int(sys.argv[2])))
+print("writing", flush=True)
+with BulkIngestor(sys.argv[1], batch_size=int(sys.argv[3])) as ingestor:
+    # A small page cache makes each batch spill to the file mid-transaction, so
+    # it holds the exclusive lock until commit, as large production loads do
+    ingestor.conn.execute("PRAGMA cache_size = 64")
+    ingestor.ingest(readings)
+"""
+
+
+def test_chat_readers_are_not_blocked_by_a_bulk_writer(engine, db_path):
+    from chatbot.engine import ChatEngine
+
+    chat = ChatEngine(DatabaseConnection(db_path, cache_size=0))
+    questions = [f"What is the temperature of cow-10{1 + i % 3}?" for i in range(30)]
+
+    def timed_answers():
+        latencies = []
+        for question in questions:
+            started = time.perf_counter()
+            result = chat.chat(question)
+            latencies.append(time.perf_counter() - started)
+            assert result.error is None and "currently has a temperature" in result.answer
+        return sorted(latencies)
+
+    baseline = timed_answers()
+    assert chat.db.execute_query("PRAGMA journal_mode").iloc[0, 0] == "wal"
+
+    # Each 20k-row batch holds the exclusive lock for most of a second
+    writer = subprocess.Popen([sys.executable, "-c", WRITER_SCRIPT, db_path, "60000", "20000"],
+                              cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        assert writer.stdout.readline().strip() == "writing"
+        time.sleep(0.5)
+        during = []
+        while writer.poll() is None:
+            during.extend(timed_answers())
+    finally:
+        writer.wait(timeout=120)
+    assert writer.returncode == 0
+    during.sort()
+
+    written = chat.db.execute_query("SELECT COUNT(*) AS n FROM cattle_inference WHERE device_id LIKE 'cow-9%'")
+    assert written.iloc[0]["n"] == 60000
+    # Readers see the last committed snapshot instead of waiting for commits;
+    # the only slowdown left is sharing the CPU with the writer process
+    assert len(during) >= len(questions)
+    assert during[len(during) // 2] < max(4 * baseline[len(baseline) // 2], 0.02)
+    assert during[-1] < 0.5
@@ -1,33 +1,136 @@
 """
-view.py - Export Cattle Inference Data to CSV
+view.py - Export Cattle Inference Data to CSV, Parquet or Arrow
 
 This script exports the entire cattle inference table with device information
-to a CSV file in the local directory.
+to a file in the local directory. The full history is streamed in chunks, so
+exports never need the whole table in memory; readings moved to the Parquet
+archive by database/archive.py are exported after the hot rows, newest day
+first.
 
 Usage:
     python view.py
 
 Output:
     - cattle_inference_export.csv (complete data with cow names)
+    - cattle_inference_export.parquet / .arrows (columnar, zstd-compressed)
     - cattle_devices_export.csv (device information)
+
+Parquet and Arrow output need pyarrow (pip install pyarrow).
 """
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import os
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
+from config import Config
+from database.engines import create_tuned_engine, get_reader_engine
 
-class CattleDataExporter:
+EXPORT_CHUNK_SIZE = 50000
+
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrows',  # Arrow IPC stream format
+}
+
+# Columns stored dictionary-encoded (pandas categorical) in columnar exports
+CATEGORICAL_COLUMNS = ('device_id', 'cow_id', 'cow_name', 'predicted_behavior')
+FLOAT32_COLUMNS = ('confidence', 'temperature', 'activity_level', 'AccX', 'AccY', 'AccZ')
+EXPORT_COLUMNS = ('id', 'device_id', 'cow_id', 'cow_name', 'timestamp', 'predicted_behavior', 'confidence',
+                  'temperature', 'location_lat', 'location_lng', 'activity_level', 'AccX', 'AccY', 'AccZ',
+                  'created_at')
+
+def export_arrow_schema():
+    """Compact Arrow schema for columnar inference exports"""
+    import pyarrow as pa
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('id', pa.int64()),
+        ('device_id', category),
+        ('cow_id', category),
+        ('cow_name', category),
+        ('timestamp', pa.timestamp('us')),
+        ('predicted_behavior', category),
+        ('confidence', pa.float32()),
+        ('temperature', pa.float32()),
+        ('location_lat', pa.float64()),
+        ('location_lng', pa.float64()),
+        ('activity_level', pa.float32()),
+        ('AccX', pa.float32()),
+        ('AccY', pa.float32()),
+        ('AccZ', pa.float32()),
+        ('created_at', pa.timestamp('us')),
+    ])
+
+class ExportSummary:
+    """Running statistics for display_summary, updated one chunk at a time"""
+    
     def __init__(self):
+        self.total = 0
+        self.columns = []
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.device_counts = Counter()
+        self.device_names = {}
+        self.behavior_counts = Counter()
+        # column -> [count, sum, min, max] over non-null values
+        self.stats = {}
+    
+    def _update_stat(self, column: str, values: pd.Series):
+        values = values.dropna()
+        if values.empty:
+            return
+        count, total, low, high = self.stats.get(column, [0, 0.0, float('inf'), float('-inf')])
+        self.stats[column] = [
+            count + len(values), total + float(values.sum()),
+            min(low, float(values.min())), max(high, float(values.max())),
+        ]
+    
+    def update(self, chunk: pd.DataFrame) -> 'ExportSummary':
+        """Fold one chunk of exported rows into the summary"""
+        if chunk.empty:
+            return self
+        self.total += len(chunk)
+        self.columns = list(chunk.columns)
+        timestamps = chunk['timestamp'].dropna().astype(str)
+        if not timestamps.empty:
+            low, high = timestamps.min(), timestamps.max()
+            self.min_timestamp = low if self.min_timestamp is None else min(self.min_timestamp, low)
+            self.max_timestamp = high if self.max_timestamp is None else max(self.max_timestamp, high)
+        self.device_counts.update(chunk['device_id'].value_counts().to_dict())
+        for device, name in chunk.drop_duplicates('device_id')[['device_id', 'cow_name']].itertuples(index=False):
+            self.device_names.setdefault(device, name)
+        self.behavior_counts.update(chunk['predicted_behavior'].value_counts().to_dict())
+        for column in ('temperature', 'activity_level', 'AccX', 'AccY', 'AccZ'):
+            self._update_stat(column, chunk[column])
+        return self
+    
+    def mean(self, column: str) -> float:
+        count, total, _, _ = self.stats.get(column, [0, 0.0, 0.0, 0.0])
+        return total / count if count else float('nan')
+    
+    def range(self, column: str):
+        _, _, low, high = self.stats.get(column, [0, 0.0, float('nan'), float('nan')])
+        return low, high
+
+class CattleDataExporter:
+    def __init__(self, database_path: str = None, archive_dir: str = None):
         # SQLite database path
-        self.database_path = os.path.join('database', 'cattle_monitoring.db')
+        self.database_path = database_path or os.path.join('database', 'cattle_monitoring.db')
+        # Parquet archive of old readings; None means beside the database file
+        self.archive_dir = archive_dir or Config.ARCHIVE_DIR
         self.engine = None
         self.setup_engine()
     
     def setup_engine(self):
         """Setup SQLAlchemy engine"""
         try:
-            self.engine = create_engine(f'sqlite:///{self.database_path}')
+            if os.path.exists(self.database_path):
+                # Read-only pool: exports never block (or wait for) an ingest in progress
+                self.engine = get_reader_engine(self.database_path)
+            else:
+                self.engine = create_tuned_engine(self.database_path)
             print(f"✅ Connected to database: {self.database_path}")
         except Exception as e:
             print(f"❌ Database connection error: {e}")
@@ -47,12 +150,58 @@ class CattleDataExporter:
             print(f"❌ Query execution error: {e}")
             return pd.DataFrame()
     
-    def export_inference_data(self, filename: str = None) -> str:
-        """Export complete inference data with cow information to CSV"""
+    def iter_query_chunks(self, query: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Stream query results as DataFrames of at most chunk_size rows"""
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(text(query))
+            columns = list(result.keys())
+            for partition in result.partitions(chunk_size):
+                yield pd.DataFrame(partition, columns=columns)
+    
+    def iter_archive_chunks(self, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Archived readings with device information, newest day first, in chunks of at most chunk_size rows"""
+        try:
+            from database.archive import ReadingArchive, default_archive_dir
+            from database.ingest import format_timestamp
+        except ImportError:  # no pyarrow, so nothing can have been archived
+            return
+        archive = ReadingArchive(self.archive_dir or default_archive_dir(self.database_path))
+        days = archive.days()
+        if not days:
+            return
+        devices = self.execute_query("SELECT device_id, cow_id, cow_name FROM cattle_devices")
+        for day in reversed(days):
+            frame = archive.read(day, day + timedelta(days=1))
+            # A compaction interrupted between writing a day and deleting it leaves rows in both tiers
+            bounds = {'start': format_timestamp(day), 'end': format_timestamp(day + timedelta(days=1))}
+            with self.engine.connect() as conn:
+                hot_ids = {row[0] for row in conn.execute(text(
+                    "SELECT id FROM cattle_inference WHERE timestamp >= :start AND timestamp < :end"), bounds)}
+            frame = frame[~frame['id'].isin(hot_ids)].merge(devices, on='device_id', how='left')
+            frame = frame.sort_values('timestamp', ascending=False, kind='stable')
+            for column in ('timestamp', 'created_at'):
+                # Same text format as the rows read from SQLite
+                frame[column] = frame[column].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+            frame = frame.reindex(columns=EXPORT_COLUMNS)
+            for offset in range(0, len(frame), chunk_size):
+                yield frame.iloc[offset:offset + chunk_size].reset_index(drop=True)
+    
+    def iter_export_chunks(self, query: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """The hot rows of query, then the archived readings"""
+        yield from self.iter_query_chunks(query, chunk_size)
+        yield from self.iter_archive_chunks(chunk_size)
+    
+    def export_inference_data(self, filename: str = None, format: str = 'csv',
+                              chunk_size: int = EXPORT_CHUNK_SIZE) -> str:
+        """Stream complete inference data with cow information to CSV, Parquet or Arrow"""
+        
+        if format not in EXPORT_FORMATS:
+            print(f"❌ Unknown export format: {format} (choose from {', '.join(EXPORT_FORMATS)})")
+            return None
         
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"cattle_inference_export_{timestamp}.csv"
+            filename = f"cattle_inference_export_{timestamp}{EXPORT_FORMATS[format]}"
         
         print("🔍 Querying inference data...")
         
@@ -79,28 +228,61 @@ class CattleDataExporter:
         ORDER BY ci.timestamp DESC
         """
         
-        df = self.execute_query(query)
+        summary = ExportSummary()
+        writer = None  # Parquet/Arrow writer, opened with the first chunk
+        try:
+            for chunk in self.iter_export_chunks(query, chunk_size):
+                if format == 'csv':
+                    first_chunk = summary.total == 0
+                    chunk.to_csv(filename, mode='w' if first_chunk else 'a',
+                                 header=first_chunk, index=False)
+                else:
+                    writer = self._write_columnar_chunk(writer, filename, format, chunk)
+                summary.update(chunk)
+        except Exception as e:
+            print(f"❌ Error exporting {format}: {e}")
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
         
-        if df.empty:
+        if summary.total == 0:
             print("❌ No data found in inference table")
             return None
         
-        # Save to CSV
-        try:
-            df.to_csv(filename, index=False)
-            print(f"✅ Inference data exported successfully!")
-            print(f"📁 File: {filename}")
-            print(f"📊 Records: {len(df)}")
-            print(f"📈 Columns: {len(df.columns)}")
-            
-            # Display summary
-            self.display_summary(df)
-            
-            return filename
-            
-        except Exception as e:
-            print(f"❌ Error saving CSV: {e}")
-            return None
+        print(f"✅ Inference data exported successfully!")
+        print(f"📁 File: {filename}")
+        print(f"📊 Records: {summary.total}")
+        print(f"📈 Columns: {len(summary.columns)}")
+        
+        # Display summary
+        self.display_summary(summary)
+        
+        return filename
+    
+    def _write_columnar_chunk(self, writer, filename: str, format: str, chunk: pd.DataFrame):
+        """Append a chunk to a Parquet/Arrow file, opening the writer on first use"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = export_arrow_schema()
+        chunk = chunk.copy()
+        for column in ('timestamp', 'created_at'):
+            chunk[column] = pd.to_datetime(chunk[column], format='ISO8601')
+        for column in CATEGORICAL_COLUMNS:
+            chunk[column] = chunk[column].astype('category')
+        for column in FLOAT32_COLUMNS:
+            chunk[column] = chunk[column].astype('float32')
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        
+        if writer is None:
+            if format == 'parquet':
+                writer = pq.ParquetWriter(filename, schema, compression='zstd')
+            else:
+                options = pa.ipc.IpcWriteOptions(compression='zstd')
+                writer = pa.ipc.new_stream(filename, schema, options=options)
+        writer.write_table(table)
+        return writer
     
     def export_devices_data(self, filename: str = None) -> str:
         """Export cattle devices data to CSV"""
@@ -130,46 +312,47 @@ class CattleDataExporter:
             print(f"❌ Error saving CSV: {e}")
             return None
     
-    def display_summary(self, df: pd.DataFrame):
-        """Display data summary"""
+    def display_summary(self, summary):
+        """Display data summary from an ExportSummary (or a DataFrame)"""
+        if isinstance(summary, pd.DataFrame):
+            summary = ExportSummary().update(summary)
+        
         print("\n📊 DATA SUMMARY:")
         print("=" * 50)
         
         # Basic info
-        print(f"Total Records: {len(df)}")
-        print(f"Date Range: {df['timestamp'].min()} to {df['timestamp'].max()}")
+        print(f"Total Records: {summary.total}")
+        print(f"Date Range: {summary.min_timestamp} to {summary.max_timestamp}")
         
         # Devices summary
-        device_counts = df['device_id'].value_counts()
         print(f"\n🐄 Records per Device:")
-        for device, count in device_counts.items():
-            cow_name = df[df['device_id'] == device]['cow_name'].iloc[0]
+        for device, count in summary.device_counts.most_common():
+            cow_name = summary.device_names.get(device)
             print(f"  {device} ({cow_name}): {count} records")
         
         # Behavior distribution
-        behavior_counts = df['predicted_behavior'].value_counts()
         print(f"\n🎯 Behavior Distribution:")
-        for behavior, count in behavior_counts.items():
-            percentage = (count / len(df)) * 100
+        for behavior, count in summary.behavior_counts.most_common():
+            percentage = (count / summary.total) * 100
             print(f"  {behavior}: {count} ({percentage:.1f}%)")
         
         # Temperature stats
-        temp_stats = df['temperature'].describe()
+        temp_min, temp_max = summary.range('temperature')
         print(f"\n🌡️ Temperature Statistics:")
-        print(f"  Average: {temp_stats['mean']:.2f}°C")
-        print(f"  Range: {temp_stats['min']:.1f}°C - {temp_stats['max']:.1f}°C")
+        print(f"  Average: {summary.mean('temperature'):.2f}°C")
+        print(f"  Range: {temp_min:.1f}°C - {temp_max:.1f}°C")
         
         # Activity level stats
-        activity_stats = df['activity_level'].describe()
+        activity_min, activity_max = summary.range('activity_level')
         print(f"\n📈 Activity Level Statistics:")
-        print(f"  Average: {activity_stats['mean']:.2f}")
-        print(f"  Range: {activity_stats['min']:.2f} - {activity_stats['max']:.2f}")
+        print(f"  Average: {summary.mean('activity_level'):.2f}")
+        print(f"  Range: {activity_min:.2f} - {activity_max:.2f}")
         
         # Accelerometer stats
         print(f"\n📊 Accelerometer Data Ranges:")
-        print(f"  AccX: {df['AccX'].min():.3f}g to {df['AccX'].max():.3f}g")
-        print(f"  AccY: {df['AccY'].min():.3f}g to {df['AccY'].max():.3f}g") 
-        print(f"  AccZ: {df['AccZ'].min():.3f}g to {df['AccZ'].max():.3f}g")
+        for axis in ('AccX', 'AccY', 'AccZ'):
+            low, high = summary.range(axis)
+            print(f"  {axis}: {low:.3f}g to {high:.3f}g")
     
     def export_latest_data_only(self, filename: str = None) -> str:
         """Export only the latest reading for each device"""
@@ -194,13 +377,8 @@ class CattleDataExporter:
             ci.AccX,
             ci.AccY,
             ci.AccZ
-        FROM cattle_inference ci
+        FROM cattle_latest ci
         LEFT JOIN cattle_devices cd ON ci.device_id = cd.device_id
-        WHERE ci.timestamp = (
-            SELECT MAX(timestamp) 
-            FROM cattle_inference 
-            WHERE device_id = ci.device_id
-        )
         ORDER BY ci.device_id
         """
         
@@ -268,9 +446,10 @@ def main():
     print("2. Export LATEST data only (current status)")
     print("3. Export devices information")
     print("4. Export everything")
+    print("5. Export ALL inference data as Parquet")
     
     try:
-        choice = input("\nSelect option (1-4) or press Enter for option 1: ")
+        choice = input("\nSelect option (1-5) or press Enter for option 1: ")
         
         if choice == "2":
             # Latest data only
@@ -295,6 +474,10 @@ def main():
             if latest_file:
                 print(f"   📊 Latest: {latest_file}")
             
+        elif choice == "5":
+            # Columnar export of the complete history
+            filename = exporter.export_inference_data(format='parquet')
+            
         else:
             # Default: All inference data
             filename = exporter.export_inference_data()